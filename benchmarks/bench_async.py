@@ -0,0 +1,95 @@
+"""Compares item GET throughput of one process for the sync and async resources.
+
+Every mongo call waits ``--latency`` seconds on an in-memory stand-in collection.
+The sync resource is called through WSGI from ``--threads`` worker threads, like
+uwsgi threads in one process.  The async resource is served by ``ASGIApp`` on a
+single event loop with ``concurrency`` requests in flight.
+
+Usage: python benchmarks/bench_async.py [--requests N] [--latency SECONDS] [--threads N]
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os.path
+import time
+
+from bson import ObjectId
+from flask import Flask
+from werkzeug.test import EnvironBuilder
+import yaml
+
+from flask_ramlschema.async_views import ASGIApp, AsyncRAMLResource
+from flask_ramlschema.views import RAMLResource
+
+from memory_collection import AsyncMemoryCollection, MemoryCollection
+
+here = os.path.dirname(os.path.abspath(__file__))
+collection_raml_file = os.path.join(here, "../raml/resources/cats-collection.raml")
+item_raml_file = os.path.join(here, "../raml/resources/cats-item.raml")
+
+CONCURRENCY = [1, 10, 50, 200]
+
+def load_raml(raml_file):
+    with open(raml_file) as raml_handle:
+        return yaml.safe_load(raml_handle.read())
+
+def make_documents(count):
+    return [{"_id":ObjectId(), "name":"cat {0}".format(num), "breed":"tabby"}
+            for num in range(count)]
+
+def make_app(resource_class, mongo_collection):
+    flask_app = Flask("bench_async")
+    resource_class(load_raml(collection_raml_file), load_raml(item_raml_file),
+                   url_path="/cats", flask_app=flask_app, mongo_collection=mongo_collection)
+    return flask_app
+
+def run_sync(documents, requests, latency, threads):
+    flask_app = make_app(RAMLResource, MemoryCollection(documents, latency=latency))
+    paths = ["/cats/{0}".format(documents[num % len(documents)]["_id"]) for num in range(requests)]
+    def call(path):
+        environ = EnvironBuilder(path=path).get_environ()
+        body = flask_app.wsgi_app(environ, lambda status, headers: None)
+        return b"".join(body)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, paths))
+    return requests / (time.perf_counter() - start)
+
+def run_async(documents, requests, latency, concurrency):
+    flask_app = make_app(AsyncRAMLResource, AsyncMemoryCollection(documents, latency=latency))
+    asgi_app = ASGIApp(flask_app)
+    paths = ["/cats/{0}".format(documents[num % len(documents)]["_id"]) for num in range(requests)]
+
+    async def call(path, semaphore):
+        async with semaphore:
+            async def receive():
+                return {"type":"http.request", "body":b"", "more_body":False}
+            async def send(message):
+                pass
+            scope = {"type":"http", "method":"GET", "path":path, "query_string":b"", "headers":[]}
+            await asgi_app(scope, receive, send)
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(call(path, semaphore) for path in paths))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    documents = make_documents(1000)
+    print("{0:<28} {1:>12}".format("mode", "requests/s"))
+    rate = run_sync(documents, args.requests, args.latency, args.threads)
+    print("{0:<28} {1:>12.0f}".format("sync/threads={0}".format(args.threads), rate))
+    for concurrency in CONCURRENCY:
+        rate = run_async(documents, args.requests, args.latency, concurrency)
+        print("{0:<28} {1:>12.0f}".format("async/concurrency={0}".format(concurrency), rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compares create throughput of single document POSTs and the bulk endpoint.
+
+Usage: python benchmarks/bench_bulk.py [--documents N] [--batch-size N ...]
+"""
+import argparse
+import json
+import os.path
+import time
+
+from flask import Flask
+import yaml
+
+from flask_ramlschema.views import RAMLResource
+
+from memory_collection import MemoryCollection
+
+here = os.path.dirname(os.path.abspath(__file__))
+collection_raml_file = os.path.join(here, "../raml/resources/cats-collection.raml")
+item_raml_file = os.path.join(here, "../raml/resources/cats-item.raml")
+
+def load_raml(raml_file):
+    with open(raml_file) as raml_handle:
+        return yaml.safe_load(raml_handle.read())
+
+def make_client(mongo_collection):
+    flask_app = Flask("bench_bulk")
+    RAMLResource(load_raml(collection_raml_file), load_raml(item_raml_file),
+                 url_path="/cats", flask_app=flask_app, bulk_route=True,
+                 mongo_collection=mongo_collection)
+    return flask_app.test_client()
+
+def make_documents(count):
+    return [{"name":"cat {0}".format(num), "breed":"tabby"} for num in range(count)]
+
+def single_creates(test_client, documents):
+    for document in documents:
+        test_client.post("/cats", data=json.dumps(document))
+
+def bulk_creates(test_client, documents, batch_size):
+    for start in range(0, len(documents), batch_size):
+        operations = [{"op":"create", "document":document}
+                      for document in documents[start:start + batch_size]]
+        test_client.post("/cats/_bulk", data=json.dumps(operations))
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+    documents = make_documents(args.documents)
+    print("{0:<16} {1:>14}".format("mode", "documents/s"))
+    seconds = timed(single_creates, make_client(MemoryCollection()), documents)
+    print("{0:<16} {1:>14.0f}".format("single", args.documents / seconds))
+    for batch_size in args.batch_size:
+        seconds = timed(bulk_creates, make_client(MemoryCollection()), documents, batch_size)
+        print("{0:<16} {1:>14.0f}".format("bulk/{0}".format(batch_size), args.documents / seconds))
+
+if __name__ == "__main__":
+    main()
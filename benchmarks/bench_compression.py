@@ -0,0 +1,53 @@
+"""Compares the CPU time and size of list pages compressed at each level of each encoding.
+
+Usage: python benchmarks/bench_compression.py [--number N] [--page-sizes N ...]
+"""
+import argparse
+import datetime
+import timeit
+
+from bson import ObjectId
+
+from flask_ramlschema.compression import available_encodings, codecs
+from flask_ramlschema.serialization import get_serializer
+
+LEVELS = {
+    "gzip": [1, 3, 6, 9],
+    "br": [1, 4, 6, 9, 11],
+    "zstd": [1, 3, 6, 12, 19],
+}
+
+def make_document(num):
+    return {"_id":ObjectId(), "name":"cat {0}".format(num), "breed":"tabby",
+            "created":datetime.datetime(2020, 1, 1), "tags":["indoor", "friendly"],
+            "owner":{"name":"Sam", "city":"Berlin"}, "age":num % 20}
+
+def run(number, page_sizes):
+    serializer = get_serializer()
+    results = []
+    for page_size in page_sizes:
+        page_wrapper = {"page":1, "per_page":page_size, "total_entries":page_size,
+                        "items":[make_document(num) for num in range(page_size)]}
+        body = serializer.dumps_page(page_wrapper)
+        results.append((page_size, "identity", 0, 0.0, len(body), len(body)))
+        for encoding in available_encodings():
+            for level in LEVELS[encoding]:
+                codec = codecs[encoding](level)
+                seconds = timeit.timeit(lambda: codec.compress(body), number=number)
+                results.append((page_size, encoding, level, seconds / number * 1e6,
+                                len(body), len(codec.compress(body))))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[25, 100])
+    args = parser.parse_args()
+    print("{0:>5} {1:<8} {2:>5} {3:>12} {4:>9} {5:>9} {6:>6}".format(
+        "page", "encoding", "level", "usec/page", "bytes", "sent", "ratio"))
+    for page_size, encoding, level, usec, size, compressed_size in run(args.number, args.page_sizes):
+        print("{0:>5} {1:<8} {2:>5} {3:>12.1f} {4:>9} {5:>9} {6:>6.2f}".format(
+            page_size, encoding, level, usec, size, compressed_size, size / compressed_size))
+
+if __name__ == "__main__":
+    main()
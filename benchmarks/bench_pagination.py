@@ -0,0 +1,81 @@
+"""Compares page latency at increasing depth for skip and keyset pagination.
+
+Runs against an in-memory stand-in collection by default, or a local mongod
+with ``--mongo-uri``.
+
+Usage: python benchmarks/bench_pagination.py [--documents N] [--number N] [--mongo-uri URI]
+"""
+import argparse
+import timeit
+
+from bson import ObjectId
+import pymongo
+
+from flask_ramlschema.pagination import encode_cursor_token, get_keyset_query, get_page
+
+from memory_collection import MemoryCollection
+
+DEPTHS = [1, 10, 100, 1000, 4000]
+PER_PAGE = 25
+
+
+class PageRequest(object):
+    def __init__(self, **args):
+        self.args = args
+
+def make_documents(count):
+    return [{"_id":ObjectId(), "name":"cat {0}".format(num), "breed":"tabby"}
+            for num in range(count)]
+
+def get_collection(args):
+    if args.mongo_uri:
+        collection = pymongo.MongoClient(args.mongo_uri)["flask-ramlschema-bench"].cats
+        collection.drop()
+        collection.insert_many(make_documents(args.documents))
+        return collection
+    return MemoryCollection(make_documents(args.documents))
+
+def skip_page(collection, page_num):
+    page_request = PageRequest(page=page_num, per_page=PER_PAGE)
+    return get_page(collection.find(), page_request)
+
+def keyset_page(collection, token):
+    page_request = PageRequest(cursor=token, per_page=PER_PAGE)
+    find_cursor = collection.find(get_keyset_query(page_request))
+    return get_page(find_cursor, page_request, keyset=True)
+
+def get_token(collection, page_num):
+    """Returns the ``next`` token a client would hold before requesting ``page_num``."""
+    if page_num == 1:
+        return None
+    skip_num = PER_PAGE * (page_num - 1) - 1
+    last_document = next(iter(
+        collection.find().sort("_id", pymongo.DESCENDING).skip(skip_num).limit(1)))
+    return encode_cursor_token(last_document, "next", "_id", pymongo.DESCENDING, 1)
+
+def run(collection, number, depths):
+    results = []
+    # Builds the stand-in's sorted index outside the timings
+    get_token(collection, 2)
+    for page_num in depths:
+        token = get_token(collection, page_num)
+        skip_seconds = timeit.timeit(lambda: skip_page(collection, page_num), number=number)
+        keyset_seconds = timeit.timeit(lambda: keyset_page(collection, token), number=number)
+        results.append((page_num, skip_seconds / number * 1e3, keyset_seconds / number * 1e3))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--mongo-uri", default=None)
+    args = parser.parse_args()
+    collection = get_collection(args)
+    max_page = args.documents // PER_PAGE
+    depths = [depth for depth in DEPTHS if depth <= max_page]
+    print("{0:>8} {1:>12} {2:>12}".format("page", "skip ms", "keyset ms"))
+    for page_num, skip_msec, keyset_msec in run(collection, args.number, depths):
+        print("{0:>8} {1:>12.3f} {2:>12.3f}".format(page_num, skip_msec, keyset_msec))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Measures the request pipeline of ``RAMLResource`` for every endpoint of the cats resources.
+
+Each scenario gets a fresh resource over the same seeded documents, in the
+``MemoryCollection`` stand-in or, with ``--mongo-uri``, a scratch collection of a
+running mongod.  Requests are sent through the Flask test client, or with
+``--driver wsgi`` over HTTP to a threaded WSGI server.  The medians of
+``--repeat`` runs of the throughput, latency percentiles and memory allocated per
+request are printed, ``--save`` writes them as a JSON baseline and ``--baseline``
+flags scenarios that got slower than a saved one, exiting with status 1.
+
+Usage: python benchmarks/bench_requests.py [--number N] [--repeat N] [--driver client|wsgi]
+    [--threads N] [--mongo-uri URI] [--scenarios NAME ...] [--save PATH]
+    [--baseline PATH] [--tolerance FRACTION]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import http.client
+import json
+import os.path
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+from bson import ObjectId
+from flask import Flask
+from werkzeug.serving import WSGIRequestHandler, make_server
+import yaml
+
+from flask_ramlschema.errors import register_error_handlers
+from flask_ramlschema.views import RAMLResource
+
+from memory_collection import MemoryCollection
+
+here = os.path.dirname(os.path.abspath(__file__))
+collection_raml_file = os.path.join(here, "../raml/resources/cats-collection.raml")
+item_raml_file = os.path.join(here, "../raml/resources/cats-item.raml")
+
+BREEDS = ["tabby", "siamese", "persian", "sphynx", "bengal"]
+
+# Metrics compared with a baseline, and whether a higher value is better.  p99 is
+# left out, a few slow requests move it too much to compare runs.
+COMPARED_METRICS = {
+    "requests_per_second": True,
+    "p50_ms": False,
+    "p90_ms": False,
+    "alloc_kib": False,
+}
+
+
+def load_raml(raml_file):
+    with open(raml_file) as raml_handle:
+        return yaml.safe_load(raml_handle.read())
+
+def make_documents(count, seed):
+    rand = random.Random(seed)
+    return [{"_id":ObjectId(bytes(rand.getrandbits(8) for num in range(12))),
+             "name":"cat {0}".format(num), "breed":rand.choice(BREEDS)}
+            for num in range(count)]
+
+
+class Scenario(object):
+    """Requests for one endpoint, built before they are timed.
+
+    :param status int: Status every response should have.
+    :param needs_documents int: (Optional) Documents needed beyond ``--documents``,
+        as a multiple of the number of requests, for scenarios that use one up each.
+    """
+    def __init__(self, name, status, make_requests, needs_documents=0):
+        self.name = name
+        self.status = status
+        self.make_requests = make_requests
+        self.needs_documents = needs_documents
+
+def list_requests(per_page, page):
+    def make_requests(documents, count):
+        path = "/cats?per_page={0}&page={1}".format(per_page, page)
+        return [("GET", path, None)] * count
+    return make_requests
+
+def item_requests(documents, count):
+    return [("GET", "/cats/{0}".format(documents[num % len(documents)]["_id"]), None)
+            for num in range(count)]
+
+def create_requests(body):
+    def make_requests(documents, count):
+        return [("POST", "/cats", json.dumps(body))] * count
+    return make_requests
+
+def update_requests(documents, count):
+    return [("POST", "/cats/{0}".format(documents[num % len(documents)]["_id"]),
+             json.dumps({"name":"cat {0}".format(num)})) for num in range(count)]
+
+def delete_requests(documents, count):
+    return [("DELETE", "/cats/{0}".format(documents[num]["_id"]), None) for num in range(count)]
+
+def static_requests(path):
+    def make_requests(documents, count):
+        return [("GET", path, None)] * count
+    return make_requests
+
+SCENARIOS = [
+    Scenario("list_page1_per10", 200, list_requests(10, 1)),
+    Scenario("list_page1_per100", 200, list_requests(100, 1)),
+    Scenario("list_page50_per10", 200, list_requests(10, 50)),
+    Scenario("item_get", 200, item_requests),
+    Scenario("create_valid", 200, create_requests({"name":"muffins", "breed":"tabby"})),
+    Scenario("create_invalid", 422, create_requests({"name":1})),
+    Scenario("update", 204, update_requests),
+    Scenario("delete", 204, delete_requests, needs_documents=1),
+    Scenario("new_schema", 200, static_requests("/cats-new-schema.json")),
+    Scenario("update_schema", 200, static_requests("/cats-update-schema.json")),
+]
+
+
+class MongoBackend(object):
+    """Scratch collection of a running mongod, filled again for every scenario."""
+    def __init__(self, mongo_uri):
+        import pymongo
+        self.client = pymongo.MongoClient(mongo_uri)
+        self.collection = self.client["flask-ramlschema-bench"]["cats"]
+
+    def make_collection(self, documents):
+        self.collection.drop()
+        self.collection.insert_many([dict(document) for document in documents])
+        return self.collection
+
+    def close(self):
+        self.collection.drop()
+        self.client.close()
+
+class MemoryBackend(object):
+    def make_collection(self, documents):
+        return MemoryCollection([dict(document) for document in documents])
+
+    def close(self):
+        pass
+
+
+def make_app(mongo_collection):
+    flask_app = Flask("bench_requests")
+    register_error_handlers(flask_app)
+    RAMLResource(load_raml(collection_raml_file), load_raml(item_raml_file),
+                 url_path="/cats", flask_app=flask_app, mongo_collection=mongo_collection)
+    return flask_app
+
+
+class ClientDriver(object):
+    """Sends requests through the Flask test client, in the calling thread."""
+    def __init__(self, flask_app):
+        self.test_client = flask_app.test_client()
+
+    def send(self, method, path, body):
+        response = self.test_client.open(path, method=method, data=body)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # Keep-alive, so connections are not opened again for every request
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class WSGIDriver(object):
+    """Sends requests over HTTP to a threaded WSGI server, one connection per thread."""
+    def __init__(self, flask_app):
+        self.server = make_server("127.0.0.1", 0, flask_app, threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def send(self, method, path, body):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(
+                "127.0.0.1", self.server.server_port)
+        headers = {"Content-Type":"application/json"} if body is not None else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+DRIVERS = {"client": ClientDriver, "wsgi": WSGIDriver}
+
+
+def time_requests(driver, requests, threads):
+    """Sends ``requests`` from ``threads`` threads, returning their seconds, statuses
+    and the wall clock seconds."""
+    def send(request):
+        start = time.perf_counter()
+        status = driver.send(*request)
+        return time.perf_counter() - start, status
+    start = time.perf_counter()
+    if threads == 1:
+        results = [send(request) for request in requests]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(send, requests))
+    return results, time.perf_counter() - start
+
+def measure_allocations(driver, requests):
+    """Returns the KiB allocated at peak, and the blocks left allocated, per request."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        blocks_before = sys.getallocatedblocks()
+        for request in requests:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            driver.send(*request)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        blocks = sys.getallocatedblocks() - blocks_before
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks) / 1024, blocks / len(requests)
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_scenario(scenario, backend, driver_class, document_count, seed, number, warmup,
+                 threads, alloc_number):
+    total = warmup + number + alloc_number
+    documents = make_documents(document_count + scenario.needs_documents * total, seed)
+    flask_app = make_app(backend.make_collection(documents))
+    driver = driver_class(flask_app)
+    try:
+        requests = scenario.make_requests(documents, total)
+        for request in requests[:warmup]:
+            driver.send(*request)
+        results, seconds = time_requests(driver, requests[warmup:warmup + number], threads)
+        # Allocations are traced in process, a server's other threads would be counted too
+        alloc_kib, net_blocks = measure_allocations(ClientDriver(flask_app),
+                                                    requests[warmup + number:])
+    finally:
+        driver.close()
+    latencies = sorted(latency for latency, status in results)
+    return {
+        "requests":number,
+        "requests_per_second":number / seconds,
+        "p50_ms":percentile(latencies, 0.5) * 1e3,
+        "p90_ms":percentile(latencies, 0.9) * 1e3,
+        "p99_ms":percentile(latencies, 0.99) * 1e3,
+        "alloc_kib":alloc_kib,
+        "net_blocks":net_blocks,
+        "unexpected_statuses":sum(1 for latency, status in results if status != scenario.status),
+    }
+
+def run_repeated(repeat, *args):
+    """Runs a scenario ``repeat`` times, returning the median of every metric."""
+    runs = [run_scenario(*args) for num in range(repeat)]
+    metrics = dict((metric, statistics.median(run[metric] for run in runs)) for metric in runs[0])
+    metrics["unexpected_statuses"] = sum(run["unexpected_statuses"] for run in runs)
+    metrics["repeat"] = repeat
+    return metrics
+
+def compare(results, baseline, tolerance):
+    """Returns ``(scenario, metric, baseline value, value)`` for every metric that got
+    worse than ``baseline`` by more than ``tolerance``, as a fraction."""
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        baseline_metrics = baseline.get(name)
+        if baseline_metrics is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = baseline_metrics.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def get_environment(args):
+    with open(os.path.join(here, "../version")) as version_handle:
+        version = version_handle.read().strip()
+    return {
+        "date":datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python":platform.python_version(),
+        "implementation":platform.python_implementation(),
+        "platform":platform.platform(),
+        "flask_ramlschema":version,
+        "driver":args.driver,
+        "backend":"mongod" if args.mongo_uri else "memory",
+        "threads":args.threads,
+        "number":args.number,
+        "repeat":args.repeat,
+        "documents":args.documents,
+        "seed":args.seed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--alloc-number", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="client")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--scenarios", nargs="+", choices=[scenario.name for scenario in SCENARIOS])
+    parser.add_argument("--save")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    if args.threads > 1 and args.driver == "client":
+        parser.error("--threads needs --driver wsgi")
+    environment = get_environment(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_handle:
+            baseline = json.load(baseline_handle)
+        for setting in ("driver", "backend", "threads"):
+            if baseline["environment"].get(setting) != environment[setting]:
+                parser.error("the baseline was measured with {0} {1}, not {2}".format(
+                    setting, baseline["environment"].get(setting), environment[setting]))
+    backend = MongoBackend(args.mongo_uri) if args.mongo_uri else MemoryBackend()
+    results = {}
+    print("{0:<20} {1:>10} {2:>8} {3:>8} {4:>8} {5:>10} {6:>8} {7:>6}".format(
+        "scenario", "req/s", "p50 ms", "p90 ms", "p99 ms", "alloc KiB", "blocks", "errors"))
+    try:
+        for scenario in SCENARIOS:
+            if args.scenarios and scenario.name not in args.scenarios:
+                continue
+            metrics = run_repeated(args.repeat, scenario, backend, DRIVERS[args.driver],
+                                   args.documents, args.seed, args.number, args.warmup,
+                                   args.threads, args.alloc_number)
+            results[scenario.name] = metrics
+            print("{0:<20} {1:>10.0f} {2:>8.3f} {3:>8.3f} {4:>8.3f} {5:>10.1f} {6:>8.1f} {7:>6}".format(
+                scenario.name, metrics["requests_per_second"], metrics["p50_ms"],
+                metrics["p90_ms"], metrics["p99_ms"], metrics["alloc_kib"],
+                metrics["net_blocks"], metrics["unexpected_statuses"]))
+    finally:
+        backend.close()
+    if args.save:
+        with open(args.save, "w") as baseline_handle:
+            json.dump({"environment":environment, "results":results},
+                      baseline_handle, indent=2, sort_keys=True)
+    if baseline is not None:
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for name, metric, old, new in regressions:
+            print("REGRESSION {0} {1}: {2:.3f} -> {3:.3f} ({4:+.0%})".format(
+                name, metric, old, new, (new - old) / old))
+        if regressions:
+            sys.exit(1)
+        print("No regressions over {0:.0%} against {1}".format(args.tolerance, args.baseline))
+    if any(metrics["unexpected_statuses"] for metrics in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compares response encoding: the old mutate-then-encode path and each serializer.
+
+Usage: python benchmarks/bench_serialization.py [--number N] [--page-sizes N ...]
+"""
+import argparse
+import datetime
+import timeit
+
+from bson import ObjectId
+
+from flask_ramlschema.json_encoder import JSONEncoder
+from flask_ramlschema.serialization import get_serializer, orjson
+
+def small_document():
+    return {"_id":ObjectId(), "name":"muffins", "breed":"tabby"}
+
+def wide_document():
+    document = small_document()
+    document["created"] = datetime.datetime(2020, 1, 1)
+    for num in range(40):
+        document["field_{0}".format(num)] = num
+    return document
+
+def nested_document():
+    document = small_document()
+    document["owner"] = {"_id":ObjectId(), "name":"Sam", "address":{"city":"Berlin", "zip":"10115"}}
+    document["vets"] = [{"name":"vet {0}".format(num), "visits":list(range(10))} for num in range(5)]
+    return document
+
+def mutate_and_encode(page_wrapper):
+    # The behaviour before serializers: copy the items, rename in place, encode
+    items = []
+    for document in page_wrapper["items"]:
+        document = dict(document)
+        document["id"] = document["_id"]
+        del document["_id"]
+        items.append(document)
+    page_wrapper = dict(page_wrapper, items=items)
+    return JSONEncoder().encode(page_wrapper).encode("utf-8")
+
+def run(number, page_sizes):
+    strategies = {"mutate": mutate_and_encode}
+    for name in ("stdlib", "orjson"):
+        if name == "orjson" and orjson is None:
+            continue
+        strategies[name] = get_serializer(name).dumps_page
+    shapes = {"small": small_document, "wide": wide_document, "nested": nested_document}
+    results = {}
+    for shape_name, make_document in shapes.items():
+        for page_size in page_sizes:
+            page_wrapper = {"page":1, "per_page":page_size, "total_entries":page_size,
+                            "items":[make_document() for num in range(page_size)]}
+            for strategy_name, func in strategies.items():
+                seconds = timeit.timeit(lambda: func(page_wrapper), number=number)
+                key = "{0}/{1}/{2}".format(shape_name, page_size, strategy_name)
+                results[key] = seconds / number * 1e6
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[1, 25, 100])
+    args = parser.parse_args()
+    for name, usec in run(args.number, args.page_sizes).items():
+        print("{0:<24} {1:>10.2f} usec/page".format(name, usec))
+
+if __name__ == "__main__":
+    main()
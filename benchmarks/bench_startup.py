@@ -0,0 +1,68 @@
+"""Compares the time to create many resources from RAML files and from a compiled artifact.
+
+Routes are not added, werkzeug's rule compilation costs the same with every strategy.
+
+Usage: python benchmarks/bench_startup.py [--resources N] [--repeat N]
+"""
+import argparse
+import os.path
+import tempfile
+import time
+from unittest import mock
+
+import yaml
+
+from flask_ramlschema.raml import compile_api, load_artifact, write_artifact
+from flask_ramlschema.views import RAMLResource
+
+here = os.path.dirname(os.path.abspath(__file__))
+raml_dir = os.path.join(here, "../raml")
+api_raml_file = os.path.join(raml_dir, "api.raml")
+collection_raml_file = os.path.join(raml_dir, "resources/cats-collection.raml")
+item_raml_file = os.path.join(raml_dir, "resources/cats-item.raml")
+
+
+class PurePythonResource(RAMLResource):
+    # The behaviour before the C loader and artifacts
+    @classmethod
+    def load_raml_file(cls, raml_file_path, artifact=None):
+        with open(raml_file_path, "r") as raml_handle:
+            return yaml.load(raml_handle.read(), Loader=yaml.SafeLoader)
+
+def create_resources(resource_class, count, **kwargs):
+    mongo_collection = mock.MagicMock()
+    for num in range(count):
+        resource_class.from_files(
+            collection_raml_file, item_raml_file, mongo_collection=mongo_collection, **kwargs)
+
+def best_seconds(func, repeat):
+    timings = []
+    for num in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resources", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        artifact_path = os.path.join(temp_dir, "api.ramlc")
+        write_artifact(compile_api(api_raml_file, generated_validators=True), artifact_path)
+        strategies = [
+            ("yaml/pure-python", lambda: create_resources(PurePythonResource, args.resources)),
+            ("yaml/libyaml", lambda: create_resources(RAMLResource, args.resources)),
+            ("artifact", lambda: create_resources(
+                RAMLResource, args.resources, artifact=load_artifact(artifact_path))),
+            ("artifact/generated", lambda: create_resources(
+                RAMLResource, args.resources, artifact=load_artifact(artifact_path),
+                generated_validators=True)),
+        ]
+        for name, func in strategies:
+            seconds = best_seconds(func, args.repeat)
+            print("{0:<22} {1:>10.1f} ms for {2} resources".format(name, seconds * 1e3, args.resources))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compares peak memory of materialized and streaming list/export responses.
+
+Usage: python benchmarks/bench_streaming.py [--documents N ...]
+"""
+import argparse
+import tracemalloc
+
+from bson import ObjectId
+
+from flask_ramlschema.json_encoder import JSONEncoder
+from flask_ramlschema.pagination import get_page
+from flask_ramlschema.streaming import iter_ndjson, iter_page_json
+
+from memory_collection import MemoryCollection
+
+
+class PageRequest(object):
+    def __init__(self, **args):
+        self.args = args
+
+def make_documents(count):
+    return [{"_id":ObjectId(), "name":"cat {0}".format(num), "breed":"tabby",
+             "description":"a fluffy cat " * 20}
+            for num in range(count)]
+
+def materialized_page(collection, per_page):
+    page = get_page(collection.find(), PageRequest(per_page=per_page), max_per_page=per_page)
+    return len(JSONEncoder().encode(page))
+
+def streamed_page(collection, per_page):
+    page = get_page(collection.find(), PageRequest(per_page=per_page), stream=True,
+                    max_per_page=per_page)
+    return sum(len(fragment) for fragment in iter_page_json(page))
+
+def materialized_export(collection, per_page):
+    documents = list(collection.find())
+    for document in documents:
+        document["id"] = document.pop("_id")
+    encoder = JSONEncoder()
+    return len("\n".join(encoder.encode(document) for document in documents))
+
+def streamed_export(collection, per_page):
+    return sum(len(fragment) for fragment in iter_ndjson(collection.find()))
+
+def peak_kib(func, *args):
+    tracemalloc.start()
+    func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+    strategies = [
+        ("page/materialized", materialized_page),
+        ("page/streamed", streamed_page),
+        ("export/materialized", materialized_export),
+        ("export/streamed", streamed_export),
+    ]
+    print("{0:<22} {1:>10} {2:>14}".format("strategy", "documents", "peak KiB"))
+    for count in args.documents:
+        collection = MemoryCollection(make_documents(count))
+        # Builds the stand-in's sorted index outside the measurements
+        list(collection.find().sort("_id", -1).limit(1))
+        for name, func in strategies:
+            print("{0:<22} {1:>10} {2:>14.1f}".format(name, count, peak_kib(func, collection, count)))
+
+if __name__ == "__main__":
+    main()
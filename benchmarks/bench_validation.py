@@ -0,0 +1,55 @@
+"""Compares request body validation strategies for the example cats schemas.
+
+Usage: python benchmarks/bench_validation.py [--number N]
+"""
+import argparse
+import json
+import os.path
+import timeit
+
+from jsonschema import Draft4Validator
+import yaml
+
+from flask_ramlschema.validation import GeneratedValidator, SchemaValidator
+
+here = os.path.dirname(os.path.abspath(__file__))
+collection_raml_file = os.path.join(here, "../raml/resources/cats-collection.raml")
+
+def load_new_item_schema():
+    with open(collection_raml_file) as raml_handle:
+        raml = yaml.safe_load(raml_handle.read())
+    return json.loads(raml["type"]["collection"]["newItemSchema"])
+
+def per_request_validator(schema, body):
+    # The behaviour before validators were cached
+    return [error.message for error in Draft4Validator(schema).iter_errors(body)]
+
+def run(number):
+    schema = load_new_item_schema()
+    cached = SchemaValidator(schema)
+    generated = GeneratedValidator(schema)
+    bodies = {
+        "valid": {"name": "muffins", "breed": "tabby"},
+        "invalid": {"name": 1},
+    }
+    results = {}
+    for body_name, body in bodies.items():
+        strategies = {
+            "per_request": lambda: per_request_validator(schema, body),
+            "cached": lambda: list(cached.iter_errors(body)),
+            "generated": lambda: list(generated.iter_errors(body)),
+        }
+        for strategy_name, func in strategies.items():
+            seconds = timeit.timeit(func, number=number)
+            results["{0}/{1}".format(body_name, strategy_name)] = seconds / number * 1e6
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+    for name, usec in sorted(run(args.number).items()):
+        print("{0:<24} {1:>10.2f} usec/validation".format(name, usec))
+
+if __name__ == "__main__":
+    main()
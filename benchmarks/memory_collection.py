@@ -0,0 +1,341 @@
+"""In-memory stand-in for a pymongo collection, used by the benchmarks.
+
+Only the parts of the pymongo API the library uses are implemented.  Sorted
+cursors walk a sorted "index" like mongod does: ``skip`` walks and discards
+entries one by one, while a range filter on the first sort key starts the
+walk with a binary search.
+
+``latency`` simulates the network round trip of each call, ``AsyncMemoryCollection``
+waits for it without blocking the event loop.
+"""
+import asyncio
+import bisect
+import copy
+import time
+
+from bson import ObjectId
+import pymongo
+
+
+def get_field(document, field_path):
+    value = document
+    for field_name in field_path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(field_name)
+    return value
+
+def match(document, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(match(document, branch) for branch in condition):
+                return False
+            continue
+        value = get_field(document, key)
+        if isinstance(condition, dict) and condition and all(
+                operator.startswith("$") for operator in condition):
+            for operator, operand in condition.items():
+                if not _OPERATORS[operator](value, operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+_OPERATORS = {
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+}
+
+def _range_start(query, field):
+    """Returns ``(lower, upper)`` bounds of ``field`` implied by ``query``."""
+    lower = upper = None
+    branches = query["$or"] if "$or" in query else [query]
+    lowers = []
+    uppers = []
+    for branch in branches:
+        condition = branch.get(field)
+        if condition is None:
+            return None, None
+        if isinstance(condition, dict):
+            lowers.append(condition.get("$gt", condition.get("$gte")))
+            uppers.append(condition.get("$lt", condition.get("$lte")))
+        else:
+            lowers.append(condition)
+            uppers.append(condition)
+    if None not in lowers:
+        lower = min(lowers)
+    if None not in uppers:
+        upper = max(uppers)
+    return lower, upper
+
+
+class InsertOneResult(object):
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult(object):
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+        self.modified_count = matched_count
+
+
+class BulkWriteResult(object):
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.deleted_count = 0
+
+
+def apply_update(document, update):
+    for field, value in update.get("$set", {}).items():
+        document[field] = value
+    for field, value in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + value
+
+
+class MemoryCursor(object):
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.query = query
+        self._sort = [("_id", pymongo.ASCENDING)]
+        self._skip = 0
+        self._limit = 0
+        self.examined = 0
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            key_or_list = [(key_or_list, direction or pymongo.ASCENDING)]
+        self._sort = list(key_or_list)
+        return self
+
+    def skip(self, skip):
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def count(self):
+        self.collection.round_trip()
+        if not self.query:
+            return len(self.collection.documents)
+        return sum(1 for document in self.collection.documents if match(document, self.query))
+
+    def __iter__(self):
+        self.collection.round_trip()
+        return self._iter_documents()
+
+    def _iter_documents(self):
+        index = self.collection.get_index(self._sort)
+        first_field, first_order = self._sort[0]
+        lower, upper = _range_start(self.query, first_field)
+        if first_order == pymongo.ASCENDING:
+            start = 0 if lower is None else bisect.bisect_left(index.keys, lower)
+            positions = range(start, len(index.entries))
+        else:
+            start = len(index.entries) if upper is None else bisect.bisect_right(index.keys, upper)
+            positions = range(start - 1, -1, -1)
+        skipped = 0
+        returned = 0
+        entries = index.entries
+        for position in positions:
+            self.examined += 1
+            document = entries[position]
+            if not match(document, self.query):
+                continue
+            if skipped < self._skip:
+                skipped += 1
+                continue
+            yield copy.copy(document)
+            returned += 1
+            if self._limit and returned >= self._limit:
+                return
+
+
+class _Index(object):
+    def __init__(self, documents, sort_spec):
+        def sort_key(document):
+            return tuple(get_field(document, field) for field, order in sort_spec)
+        # Secondary keys that sort in the opposite direction are not supported
+        self.entries = sorted(documents, key=sort_key)
+        self.keys = [get_field(document, sort_spec[0][0]) for document in self.entries]
+
+
+class MemoryCollection(object):
+    def __init__(self, documents=(), name="cats", latency=0):
+        self.name = name
+        self.full_name = "memory." + name
+        self.documents = list(documents)
+        self.latency = latency
+        self._indexes = {}
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_index(self, sort_spec):
+        key = tuple((field, abs(order)) for field, order in sort_spec)
+        index = self._indexes.get(key)
+        if index is None:
+            index = _Index(self.documents, sort_spec)
+            self._indexes[key] = index
+        return index
+
+    def find(self, query=None, projection=None):
+        return MemoryCursor(self, query or {})
+
+    def _find_position(self, query):
+        for position, document in enumerate(self.documents):
+            if match(document, query):
+                return position
+        return None
+
+    def find_one(self, query=None, projection=None):
+        for document in self.find(query).limit(1):
+            return document
+        return None
+
+    def insert_one(self, document):
+        self.round_trip()
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        self.documents.append(document)
+        self._indexes.clear()
+        return InsertOneResult(document["_id"])
+
+    def insert_many(self, documents, ordered=True):
+        for document in documents:
+            self.insert_one(document)
+
+    def update_one(self, query, update):
+        self.round_trip()
+        position = self._find_position(query)
+        if position is None:
+            return UpdateResult(0)
+        apply_update(self.documents[position], update)
+        self._indexes.clear()
+        return UpdateResult(1)
+
+    def replace_one(self, query, document):
+        self.round_trip()
+        position = self._find_position(query)
+        if position is None:
+            return UpdateResult(0)
+        document["_id"] = self.documents[position]["_id"]
+        self.documents[position] = document
+        self._indexes.clear()
+        return UpdateResult(1)
+
+    def delete_one(self, query):
+        self.round_trip()
+        position = self._find_position(query)
+        if position is not None:
+            del self.documents[position]
+            self._indexes.clear()
+
+    def find_one_and_replace(self, query, document):
+        existing = self.find_one(query)
+        self.replace_one(query, document)
+        return existing
+
+    def find_one_and_delete(self, query):
+        existing = self.find_one(query)
+        self.delete_one(query)
+        return existing
+
+    def bulk_write(self, requests, ordered=True):
+        result = BulkWriteResult()
+        for write_op in requests:
+            if isinstance(write_op, pymongo.InsertOne):
+                self.insert_one(write_op._doc)
+                result.inserted_count += 1
+            elif isinstance(write_op, pymongo.UpdateOne):
+                result.matched_count += self.update_one(write_op._filter, write_op._doc).matched_count
+            elif isinstance(write_op, pymongo.ReplaceOne):
+                result.matched_count += self.replace_one(write_op._filter, write_op._doc).matched_count
+            elif isinstance(write_op, pymongo.DeleteOne):
+                self.delete_one(write_op._filter)
+                result.deleted_count += 1
+        return result
+
+    def count_documents(self, query):
+        return self.find(query).count()
+
+    def estimated_document_count(self):
+        self.round_trip()
+        return len(self.documents)
+
+
+class AsyncMemoryCursor(object):
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.cursor = MemoryCursor(collection.memory_collection, query)
+
+    def sort(self, key_or_list, direction=None):
+        self.cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip):
+        self.cursor.skip(skip)
+        return self
+
+    def limit(self, limit):
+        self.cursor.limit(limit)
+        return self
+
+    async def to_list(self, length=None):
+        await self.collection.round_trip()
+        documents = list(self.cursor._iter_documents())
+        return documents if length is None else documents[:length]
+
+
+class AsyncMemoryCollection(object):
+    """Async, motor style, interface over a ``MemoryCollection``."""
+    def __init__(self, documents=(), name="cats", latency=0):
+        self.memory_collection = MemoryCollection(documents, name)
+        self.name = name
+        self.full_name = self.memory_collection.full_name
+        self.latency = latency
+
+    async def round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    def find(self, query=None, projection=None):
+        return AsyncMemoryCursor(self, query or {})
+
+    async def find_one(self, query=None, projection=None):
+        await self.round_trip()
+        return self.memory_collection.find_one(query, projection)
+
+    async def count_documents(self, query):
+        await self.round_trip()
+        return self.memory_collection.count_documents(query)
+
+    async def estimated_document_count(self):
+        await self.round_trip()
+        return len(self.memory_collection.documents)
+
+    async def insert_one(self, document):
+        await self.round_trip()
+        return self.memory_collection.insert_one(document)
+
+    async def update_one(self, query, update):
+        await self.round_trip()
+        return self.memory_collection.update_one(query, update)
+
+    async def find_one_and_replace(self, query, document):
+        await self.round_trip()
+        return self.memory_collection.find_one_and_replace(query, document)
+
+    async def find_one_and_delete(self, query):
+        await self.round_trip()
+        return self.memory_collection.find_one_and_delete(query)
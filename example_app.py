@@ -1,12 +1,14 @@
 from flask import Flask
+from flask_ramlschema.connections import MongoClientManager
 from flask_ramlschema.views import RAMLResource
 from flask_ramlschema.errors import register_error_handlers
-from pymongo.mongo_client import MongoClient
 
 flask_app = Flask("test_app")
 register_error_handlers(flask_app)
 
-mongo_client = MongoClient("127.0.0.1", connect=False)
+# Each uwsgi worker creates its own client the first time it queries mongo
+mongo_manager = MongoClientManager("127.0.0.1", max_pool_size=50, wait_queue_timeout_ms=2000)
+mongo_manager.add_route(flask_app)
 
 collection_raml_file = "raml/resources/cats-collection.raml"
 item_raml_file = "raml/resources/cats-item.raml"
@@ -14,7 +16,8 @@ item_raml_file = "raml/resources/cats-item.raml"
 resource = RAMLResource.from_files(
     collection_raml_file, item_raml_file, 
     url_path = "/cats", flask_app = flask_app,
-    mongo_collection = mongo_client["flask-ramlschema-test"].cats
+    mongo_collection_func = mongo_manager.collection_func("flask-ramlschema-test"),
+    mongo_collection_name = "cats", collection_scope = "resource"
     )
 
 
@@ -0,0 +1,416 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import io
+import sys
+import time
+
+from bson.objectid import ObjectId
+from flask import abort, request, Response
+import pymongo
+
+from .filtering import get_missing_indexes
+from .metrics import timed_function
+from .pagination import PageQuery, get_aggregate_page_async, get_count_arg, get_page_async
+from .views import RAMLResource
+
+
+async def resolve(value):
+    """Awaits ``value`` if it is awaitable, so hooks can be sync or async."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class AsyncRAMLResource(RAMLResource):
+    """``RAMLResource`` for async mongo drivers like `motor <https://motor.readthedocs.io/>`_.
+
+    Parses the same RAML and has the same hooks, the ones that touch mongo
+    (``create_view``, ``list_view``, ``item_view``, ``delete_view`` and
+    ``find_one_or_404``) are coroutines.  The ``*_allowed`` hooks can be sync or async.
+    Counts use ``count_documents`` with ``list_query``, since async cursors can not
+    count themselves.  Indexes for ``filterFields`` are not checked at startup, await
+    ``check_indexes`` once the event loop runs.  ``stream_lists``, ``export_route``,
+    ``bulk_route``, ``change_feed``, ``single_flight`` and ``write_behind`` are not
+    supported.
+
+    Serve it with ``ASGIApp`` to keep many requests in flight on one event loop, or
+    with Flask's async views, which need ``flask[async]``.
+
+    Example:
+    .. code-block:: python
+
+        from flask import Flask
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from flask_ramlschema.async_views import ASGIApp, AsyncRAMLResource
+
+        flask_app = Flask("test_app")
+        mongo_client = AsyncIOMotorClient("127.0.0.1")
+        resource = AsyncRAMLResource.from_files(
+            "cats-collection.raml", "cats-item.raml",
+            url_path = "/cats", flask_app = flask_app,
+            mongo_collection = mongo_client["flask-ramlschema-test"].cats
+            )
+        asgi_app = ASGIApp(flask_app)
+    """
+    unsupported_options = ("stream_lists", "export_route", "bulk_route", "change_feed",
+                           "single_flight", "write_behind")
+
+    def __init__(self, *args, **kwargs):
+        for option in self.unsupported_options:
+            if kwargs.get(option):
+                raise ValueError("{0} is not supported by AsyncRAMLResource".format(option))
+        super().__init__(*args, **kwargs)
+
+    async def dispatch_request(self, **kwargs):
+        method = getattr(self, request.method.lower(), None)
+        if method is None and request.method == "HEAD":
+            method = self.get
+        if method is None:
+            abort(405)
+        return await method(**kwargs)
+
+    async def find_one_or_404(self, query, projection=None):
+        document = await self.mongo_collection.find_one(query, projection)
+        if not document:
+            abort(404)
+        return document
+
+    async def get(self, item_id):
+        if item_id is None:
+            return await self._list_view()
+        else:
+            return await self._item_view(item_id)
+
+    async def post(self, item_id):
+        if self.collection_type == "read-only-collection":
+            abort(405)
+        else:
+            if item_id is None:
+                return await self._create_view()
+            else:
+                return await self._update_view(item_id)
+
+    async def delete(self, item_id):
+        if self.collection_type == "read-only-collection":
+            abort(405)
+        elif item_id is None:
+            abort(404)
+        return await self._delete_view(item_id)
+
+    async def create_view(self, document):
+        result = await self.mongo_collection.insert_one(document)
+        document["id"] = str(result.inserted_id)
+
+    async def _create_view(self):
+        request_dict = self.get_request_json(self.new_item_schema)
+        document = request_dict
+        if not await resolve(self.create_allowed(document)):
+            abort(401)
+            return
+        await self.create_view(document)
+        if "id" in document:
+            self.invalidate_item(document["id"])
+        self.record_change()
+        response = self.json_response(document)
+        return response
+
+    def startup_index_check(self, create=False):
+        # Async drivers need a running event loop, await check_indexes at startup instead
+        pass
+
+    async def check_indexes(self, create=False):
+        mongo_collection = self.mongo_collection
+        missing = get_missing_indexes(
+            await mongo_collection.index_information(), self.required_indexes())
+        for keys in missing:
+            if create:
+                self.logger.info("Creating index {0} on {1}".format(keys, mongo_collection.full_name))
+                await mongo_collection.create_index([(field, pymongo.ASCENDING) for field in keys])
+            else:
+                self.warn_missing_index(mongo_collection, keys)
+        return missing
+
+    def startup_sortable_fields(self):
+        # Like the index check, await refresh_sortable_fields once the event loop runs
+        pass
+
+    async def refresh_sortable_fields(self):
+        mongo_collection = self._get_mongo_collection(self.mongo_collection_name)
+        index_information = await mongo_collection.index_information()
+        self.sortable_fields = set(["_id"] + self.sort_fields)
+        self.sortable_fields.update(index["key"][0][0] for index in index_information.values())
+
+    async def list_view(self):
+        if self.page_engine == "aggregate":
+            return PageQuery(self.list_query(), self.list_projection())
+        find_cursor = self.mongo_collection.find(self.list_query(), self.list_projection())
+        return find_cursor
+
+    async def _list_view(self):
+        if not await resolve(self.list_allowed()):
+            abort(401)
+            return
+        list_etag = self.get_list_etag()
+        if list_etag is not None and self.not_modified(list_etag):
+            return self.not_modified_response(list_etag)
+        self.check_sort_arg()
+        find_cursor = await self.list_view()
+        counter = self.count_entries
+        if self.metrics is not None:
+            counter = timed_function("mongo_count", counter)
+        start = time.perf_counter()
+        with self.timed("mongo_find"):
+            if isinstance(find_cursor, PageQuery):
+                page = await self.get_query_page(find_cursor)
+            else:
+                page = await get_page_async(find_cursor, keyset=self.keyset_pagination,
+                                            counter=counter, max_per_page=self.max_per_page,
+                                            rename_id=False)
+        if self.diagnostics is not None and self.aggregates_page(find_cursor):
+            self.record_list_query(time.perf_counter() - start, explain=False)
+        response = self.page_response(page)
+        if self.etags:
+            response = self.conditional_response(response, list_etag)
+        return response
+
+    async def get_query_page(self, page_query):
+        mongo_collection = page_query.mongo_collection or self.mongo_collection
+        if self.keyset_pagination and "page" not in request.args:
+            find_cursor = mongo_collection.find(page_query.query, page_query.projection)
+            return await get_page_async(find_cursor, keyset=True, max_per_page=self.max_per_page,
+                                        rename_id=False)
+        count = get_count_arg(request)
+        total_entries = None
+        if count and self.count_strategy == "estimated" and not page_query.query:
+            total_entries = await mongo_collection.estimated_document_count()
+            count = False
+        elif count and self.count_strategy == "cached":
+            count_key = {"collection":mongo_collection.full_name, "query":page_query.query}
+            total_entries = await self.count_cache.get_async(
+                count_key, lambda: mongo_collection.count_documents(page_query.query))
+            count = False
+        return await get_aggregate_page_async(
+            mongo_collection, page_query.query, page_query.projection, count=count,
+            total_entries=total_entries, max_per_page=self.max_per_page)
+
+    async def count_entries(self, find_cursor):
+        if not get_count_arg(request):
+            return None
+        query = self.list_query()
+        if self.count_strategy == "estimated" and not query:
+            return await self.mongo_collection.estimated_document_count()
+        if self.count_strategy == "cached":
+            count_key = {"collection":self.mongo_collection.full_name, "query":query}
+            return await self.count_cache.get_async(
+                count_key, lambda: self.mongo_collection.count_documents(query))
+        return await self.mongo_collection.count_documents(query)
+
+    async def item_view(self, document_id):
+        object_id = ObjectId(document_id)
+        return await self.find_one_or_404({"_id":object_id}, self.item_projection())
+
+    async def _item_view(self, document_id):
+        if not await resolve(self.item_view_allowed(document_id)):
+            abort(401)
+            return
+        response = self.cached_item_response(document_id)
+        if response is not None:
+            return response
+        generation = self.read_generation
+        document = await self.item_view(document_id)
+        response = self.item_response(document_id, document)
+        self.store_item_response(document_id, response, generation)
+        return response
+
+    async def _update_view(self, document_id):
+        object_id = ObjectId(document_id)
+        if self.atomic_updates and not self.needs_existing_document():
+            return await self._atomic_update_view(object_id)
+        existing_document = await self.find_one_or_404({"_id":object_id})
+        request_dict = self.get_request_json(self.update_item_schema)
+        update_document = request_dict
+        if not await resolve(self.update_allowed(update_document, existing_document)):
+            abort(401)
+            return
+        query, document = self.build_replacement(object_id, update_document, existing_document)
+        replaced_document = await self.mongo_collection.find_one_and_replace(query, document)
+        self.invalidate_item(document_id)
+        if self.version_field and replaced_document is None:
+            abort(409)
+        self.record_change()
+        response = Response()
+        response.status_code = 204
+        return response
+
+    async def _atomic_update_view(self, object_id):
+        update_document = self.get_request_json(self.update_item_schema)
+        query, update = self.build_atomic_update(object_id, update_document)
+        if not update:
+            await self.find_one_or_404(query, {"_id":1})
+        else:
+            result = await self.mongo_collection.update_one(query, update)
+            if result.matched_count == 0:
+                if len(query) > 1 and await self.mongo_collection.find_one(
+                        {"_id":object_id}, {"_id":1}):
+                    abort(409)
+                abort(404)
+            self.invalidate_item(str(object_id))
+            self.record_change()
+        response = Response()
+        response.status_code = 204
+        return response
+
+    async def delete_view(self, document_id):
+        if not await resolve(self.delete_allowed(document_id)):
+            abort(401)
+            return
+        object_id = ObjectId(document_id)
+        document = await self.mongo_collection.find_one_and_delete({"_id":object_id})
+        if not document:
+            abort(404)
+
+    async def _delete_view(self, document_id):
+        try:
+            await self.delete_view(document_id)
+        finally:
+            self.invalidate_item(document_id)
+        self.record_change()
+        response = Response()
+        response.status_code = 204
+        return response
+
+
+def build_environ(scope, body):
+    """Returns the WSGI environ for an ASGI http ``scope`` and its request ``body``."""
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": "HTTP/{0}".format(scope.get("http_version", "1.1")),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        if name != "CONTENT_TYPE":
+            name = "HTTP_" + name
+        if name in environ:
+            value = environ[name] + "," + value
+        environ[name] = value
+    return environ
+
+
+class ASGIApp(object):
+    """Serves ``flask_app`` as an ASGI application.
+
+    Coroutine views, like those of ``AsyncRAMLResource``, are awaited on the server's
+    event loop, so one process keeps many mongo queries in flight.  Other views run
+    in the loop's default executor.  Request bodies and responses are buffered.
+
+    :param flask_app flask.Flask: App the resources were added to.
+    :param max_body_size int: (Optional) Request bodies over this many bytes get a 413
+        response without being buffered, from their ``Content-Length`` or as soon as
+        they are received.  Resources check their own ``max_body_size`` too.
+    """
+    def __init__(self, flask_app, max_body_size=None):
+        self.flask_app = flask_app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type: {0}".format(scope["type"]))
+        body = await self.receive_body(scope, receive)
+        if body is None:
+            status_code, headers, response_body = 413, [], b""
+        else:
+            environ = build_environ(scope, body)
+            status_code, headers, response_body = await self.handle(environ)
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": response_body})
+
+    async def receive_body(self, scope, receive):
+        """Returns the request body, or ``None`` when it is over ``max_body_size`` bytes."""
+        max_body_size = self.max_body_size
+        if max_body_size is not None:
+            for name, value in scope.get("headers", []):
+                if name.lower() == b"content-length" and value.isdigit() and int(value) > max_body_size:
+                    return None
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            if max_body_size is not None and len(body) > max_body_size:
+                return None
+            more_body = message.get("more_body", False)
+        return bytes(body)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle(self, environ):
+        """Dispatches ``environ`` like ``flask.Flask.full_dispatch_request``.
+
+        ``before_request`` functions run first, and ``OPTIONS`` requests get the
+        automatic response of routes that provide it.
+        """
+        flask_app = self.flask_app
+        with flask_app.request_context(environ):
+            try:
+                try:
+                    rv = flask_app.preprocess_request()
+                    if rv is None:
+                        rv = await self.dispatch_request()
+                except Exception as error:
+                    rv = flask_app.handle_user_exception(error)
+            except Exception as error:
+                rv = flask_app.handle_exception(error)
+            response = flask_app.finalize_request(rv)
+            headers = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                       for name, value in response.headers.items()]
+            return response.status_code, headers, b"".join(response.iter_encoded())
+
+    async def dispatch_request(self):
+        """Calls the view of the request like ``flask.Flask.dispatch_request``, awaiting coroutines."""
+        flask_app = self.flask_app
+        if request.routing_exception is not None:
+            raise request.routing_exception
+        rule = request.url_rule
+        if getattr(rule, "provide_automatic_options", False) and request.method == "OPTIONS":
+            return flask_app.make_default_options_response()
+        view_func = flask_app.view_functions[rule.endpoint]
+        if inspect.iscoroutinefunction(view_func):
+            return await view_func(**request.view_args)
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(context.run, view_func, **request.view_args))
@@ -0,0 +1,81 @@
+import json
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+from .errors import ValidationError
+
+BULK_OPS = ("create", "update", "delete")
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson")
+
+
+def parse_operations(body, mimetype=None, loads=json.loads):
+    """Decodes a bulk request body into a list of operations.
+
+    :param body bytes: JSON array of operations, or one operation per line when
+        ``mimetype`` is an NDJSON mimetype.
+    :param mimetype str: (Optional) Mimetype of the request body.
+    :param loads function: (Optional) Decodes JSON from bytes, like ``Serializer.loads``.
+    """
+    try:
+        if mimetype in NDJSON_MIMETYPES:
+            return [loads(line) for line in body.splitlines() if line.strip()]
+        operations = loads(body)
+    except ValueError as error:
+        raise ValidationError([{"message":str(error)}], status_code=400,
+                              description="Invalid bulk request")
+    if not isinstance(operations, list):
+        raise ValidationError([{"message":"bulk request body must be an array"}],
+                              status_code=400, description="Invalid bulk request")
+    return operations
+
+
+class UndecodableOperation(object):
+    """Stands for an NDJSON line that is not valid JSON, it fails on its own."""
+    def __init__(self, message):
+        self.message = message
+
+def iter_ndjson_operations(lines, loads=json.loads):
+    """Decodes each line of an NDJSON bulk body as it is received.
+
+    Lines that are not valid JSON are yielded as ``UndecodableOperation``, earlier
+    operations may already be written when they are reached.
+
+    :param lines iterable: Lines of the body, like the output of ``ingestion.iter_lines``.
+    """
+    for line in lines:
+        try:
+            yield loads(line)
+        except ValueError as error:
+            yield UndecodableOperation("invalid JSON: {0}".format(error))
+
+def get_operation_errors(operation):
+    """Returns errors in the shape of ``operation``, before its document is validated.
+
+    Operations look like ``{"op": "create", "document": {...}}``,
+    ``{"op": "update", "id": "...", "document": {...}}`` or ``{"op": "delete", "id": "..."}``.
+    """
+    if isinstance(operation, UndecodableOperation):
+        return [{"message":operation.message}]
+    if not isinstance(operation, dict):
+        return [{"message":"operation must be an object"}]
+    op = operation.get("op")
+    if op not in BULK_OPS:
+        return [{"message":"op must be one of {0}".format(", ".join(BULK_OPS))}]
+    errors = []
+    if op != "delete" and not isinstance(operation.get("document"), dict):
+        errors.append({"message":"{0} requires a document".format(op)})
+    if op != "create":
+        try:
+            ObjectId(operation.get("id"))
+        except (InvalidId, TypeError):
+            errors.append({"message":"{0} requires a valid id".format(op)})
+    return errors
+
+def operation_result(index, operation, status, **fields):
+    result = {"index":index, "status":status}
+    if isinstance(operation, dict) and operation.get("op") in BULK_OPS:
+        result["op"] = operation["op"]
+    result.update(fields)
+    return result
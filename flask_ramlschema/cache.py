@@ -0,0 +1,87 @@
+import collections
+import threading
+import time
+
+
+class CacheBackend(object):
+    """Interface of the item cache used by ``RAMLResource(item_cache=...)``.
+
+    Keys are strings and values are ``(body, etag, last_modified, variants)`` tuples:
+    the encoded body (bytes), its ETag and its ``Last-Modified`` datetime, either of
+    which can be ``None``, and a dictionary of the body compressed with
+    ``compression``, by encoding name like ``gzip``, to bytes.  Values are stored
+    again when a variant is added.  An out-of-process store implements these methods
+    and serializes the values, all of them are picklable.
+    """
+    def get(self, key):
+        """Returns the value stored for ``key``, or ``None``."""
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def stats(self):
+        """Returns a dictionary of counters, like ``hits``, ``misses`` and ``evictions``."""
+        raise NotImplementedError()
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache whose entries expire after ``ttl`` seconds.
+
+    :param max_entries int: (Optional) Number of entries kept, the least recently
+        used entry is evicted when the cache is full.
+    :param ttl float: (Optional) Seconds an entry is served after it was stored.
+    """
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits":0, "misses":0, "evictions":0, "expirations":0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,75 @@
+import threading
+
+
+class Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Runs one call at a time per key, concurrent calls with the same key share its result.
+
+    Calls made while no call with their key is running start a new one, so results
+    are never older than the call they share.  Pass one instance to resources with
+    ``RAMLResource(single_flight=...)``, it only coalesces requests of one process.
+
+    :param timeout float: (Optional) Seconds a call waits for the running one before
+        running on its own, ``None`` waits as long as it takes.
+    """
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls":0, "shared":0, "timeouts":0, "errors":0}
+
+    def do(self, key, func):
+        """Returns the result of ``func``, or of the running call with ``key``.
+
+        An exception raised by ``func`` is raised in every call sharing it.
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        if not leader:
+            if flight.done.wait(self.timeout):
+                with self._lock:
+                    self._stats["shared"] += 1
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return func()
+        try:
+            flight.value = func()
+        except BaseException as error:
+            flight.error = error
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self):
+        """Returns the number of ``calls``, of calls that ``shared`` a running call's
+        result, of waits that timed out and of calls that raised."""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
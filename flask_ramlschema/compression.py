@@ -0,0 +1,212 @@
+import functools
+import inspect
+import threading
+import zlib
+
+from flask import make_response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+# Compressed responses are only sent for these statuses, others are small or empty
+COMPRESSIBLE_STATUSES = frozenset([200, 201])
+
+
+class Codec(object):
+    """Compresses bodies in one ``Content-Encoding``, see ``codecs``."""
+    name = None
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        raise NotImplementedError()
+
+    def iter_compress(self, chunks):
+        """Yields ``chunks`` compressed, flushing after each one so it can be sent right away."""
+        raise NotImplementedError()
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def compressobj(self):
+        # wbits of 31 writes a gzip header and trailer
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        compressor = self.compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    def iter_compress(self, chunks):
+        compressor = self.compressobj()
+        for chunk in chunks:
+            compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+class BrotliCodec(Codec):
+    name = "br"
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def iter_compress(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            compressed = compressor.process(chunk) + compressor.flush()
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def iter_compress(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            compressed = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+codecs = {
+    "gzip": GzipCodec,
+    "br": BrotliCodec,
+    "zstd": ZstdCodec,
+}
+
+def available_encodings():
+    """Returns the encodings whose libraries are installed, in the default order of preference."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+class Compression(object):
+    """Compresses responses in the best encoding the client accepts.
+
+    Pass an instance to resources with ``RAMLResource(compression=...)``.  Brotli
+    needs the ``brotli`` package and zstd the ``zstandard`` package.  Compressed
+    responses get a weak ETag, since their bytes differ from the uncompressed body.
+
+    :param min_size int: (Optional) Bodies smaller than this many bytes are sent
+        uncompressed.  Streamed bodies are always compressed.
+    :param levels dict: (Optional) Compression level by encoding, merged with ``DEFAULT_LEVELS``.
+    :param encodings list: (Optional) Encodings to offer, in order of preference when
+        the client accepts several equally.  Defaults to ``available_encodings()``.
+    """
+    def __init__(self, min_size=1024, levels=None, encodings=None):
+        self.min_size = min_size
+        self.levels = dict(DEFAULT_LEVELS)
+        if levels:
+            self.levels.update(levels)
+        if encodings is None:
+            encodings = available_encodings()
+        for encoding in encodings:
+            if encoding not in codecs:
+                raise ValueError("Unsupported encoding: {0}".format(encoding))
+            if encoding in available_encodings():
+                continue
+            raise ValueError("{0} needs the {1} package".format(
+                encoding, "brotli" if encoding == "br" else "zstandard"))
+        self.encodings = list(encodings)
+        self.codecs = dict((encoding, codecs[encoding](self.levels[encoding]))
+                           for encoding in self.encodings)
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def negotiate(self, request):
+        """Returns the ``Codec`` for the request's ``Accept-Encoding``, or ``None``."""
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return None
+        return self.codecs[encoding]
+
+    def compress_response(self, response, codec, variants=None):
+        """Compresses ``response`` in place with ``codec``, returning it.
+
+        :param codec Codec: Codec from ``negotiate``, ``None`` leaves the body as is.
+        :param variants dict: (Optional) Compressed bodies by encoding for a body that
+            does not change, like a schema.  A compressed body found in it is sent
+            without compressing again, new ones are added to it.
+        """
+        if response.status_code == 304:
+            response.vary.add("Accept-Encoding")
+        if response.status_code not in COMPRESSIBLE_STATUSES or response.direct_passthrough:
+            return response
+        response.vary.add("Accept-Encoding")
+        if codec is None or "Content-Encoding" in response.headers:
+            return response
+        if response.is_streamed:
+            response.response = codec.iter_compress(response.iter_encoded())
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            compressed = None
+            if variants is not None:
+                compressed = variants.get(codec.name)
+            if compressed is None:
+                compressed = codec.compress(body)
+                if variants is not None:
+                    variants[codec.name] = compressed
+            response.set_data(compressed)
+        response.headers["Content-Encoding"] = codec.name
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def variants(self, etag):
+        """Returns the compressed bodies by encoding of the unchanging body with ``etag``.
+
+        Pass it to ``compress_response`` so each body is compressed once per encoding.
+        """
+        with self._lock:
+            return self._variants.setdefault(etag, {})
+
+    def wrap(self, view_func, timer=None):
+        """Wraps ``view_func`` to compress its responses.
+
+        :param timer function: (Optional) Returns a context manager timing the compression.
+        """
+        if inspect.iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def compressed_view(*args, **kwargs):
+                response = make_response(await view_func(*args, **kwargs))
+                return self.timed_compress(response, timer)
+        else:
+            @functools.wraps(view_func)
+            def compressed_view(*args, **kwargs):
+                response = make_response(view_func(*args, **kwargs))
+                return self.timed_compress(response, timer)
+        return compressed_view
+
+    def timed_compress(self, response, timer=None):
+        if timer is None:
+            return self.compress_response(response, self.negotiate(request))
+        with timer():
+            return self.compress_response(response, self.negotiate(request))
+
@@ -0,0 +1,52 @@
+import hashlib
+import threading
+
+
+def body_etag(body):
+    """Returns a strong ETag for the encoded response ``body``."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def key_etag(*parts):
+    """Returns a strong ETag for a representation identified by ``parts``."""
+    key = "\x00".join(str(part) for part in parts)
+    return body_etag(key)
+
+
+class ChangeCounter(object):
+    """Counts writes per collection, so list ETags can be built without querying.
+
+    This counter lives in the process, it only sees writes made through resources
+    in the same process.  Use ``MongoChangeCounter`` when several processes write.
+    """
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, collection_name):
+        return self._counts.get(collection_name, 0)
+
+    def increment(self, collection_name):
+        with self._lock:
+            self._counts[collection_name] = self._counts.get(collection_name, 0) + 1
+
+
+class MongoChangeCounter(object):
+    """Counts writes per collection in ``counters_collection``, shared by every process.
+
+    :param counters_collection pymongo.Collection: Collection holding one counter
+        document per counted collection.
+    """
+    def __init__(self, counters_collection):
+        self.counters_collection = counters_collection
+
+    def get(self, collection_name):
+        counter = self.counters_collection.find_one({"_id":collection_name})
+        if counter is None:
+            return 0
+        return counter["count"]
+
+    def increment(self, collection_name):
+        self.counters_collection.update_one(
+            {"_id":collection_name}, {"$inc":{"count":1}}, upsert=True)
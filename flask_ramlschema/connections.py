@@ -0,0 +1,191 @@
+import os
+import threading
+
+from flask import Response
+import pymongo
+from pymongo import monitoring
+
+from .serialization import StdlibSerializer
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connection pool events of the clients created by a ``MongoClientManager``."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def _update(self, event, **changes):
+        address = "{0}:{1}".format(*event.address)
+        with self._lock:
+            server = self._servers.get(address)
+            if server is None:
+                server = self._servers[address] = {
+                    "open":0, "checked_out":0, "max_checked_out":0, "waiting":0,
+                    "created":0, "closed":0, "checkouts":0, "checkout_failures":0,
+                    "cleared":0,
+                }
+            for name, change in changes.items():
+                server[name] += change
+            server["max_checked_out"] = max(server["max_checked_out"], server["checked_out"])
+
+    def pool_created(self, event):
+        self._update(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event, open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        self._update(event, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._update(event, waiting=-1, checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._update(event, checked_out=-1)
+
+    def snapshot(self):
+        """Returns the counters of every server by address."""
+        with self._lock:
+            return dict((address, dict(server)) for address, server in self._servers.items())
+
+    def reset(self):
+        with self._lock:
+            self._servers.clear()
+
+
+class MongoClientManager(object):
+    """Creates one mongo client per process, the first time it is used.
+
+    Clients are never shared across ``fork``: a process forked from one that used
+    the client, like a uwsgi worker forked from the master, creates its own.  Pass
+    ``collection_func`` to resources as their ``mongo_collection_func``.
+
+    Example:
+    .. code-block:: python
+
+        mongo_manager = MongoClientManager("127.0.0.1", max_pool_size=50)
+        resource = RAMLResource.from_files(
+            "cats-collection.raml", "cats-item.raml",
+            url_path = "/cats", flask_app = flask_app,
+            mongo_collection_func = mongo_manager.collection_func("flask-ramlschema-test"),
+            mongo_collection_name = "cats"
+            )
+
+    :param host str: (Optional) Host or ``mongodb://`` URI, passed to the client.
+    :param max_pool_size int: (Optional) Connections per server.
+    :param min_pool_size int: (Optional) Connections kept open per server.
+    :param max_idle_time_ms int: (Optional) Idle connections are closed after this long.
+    :param wait_queue_timeout_ms int: (Optional) How long a request waits for a
+        connection when the pool is exhausted, waiting forever by default.
+    :param connect_timeout_ms int: (Optional) Timeout of new connections.
+    :param server_selection_timeout_ms int: (Optional) How long operations wait for
+        a usable server.
+    :param client_class type: (Optional) Client to create, like motor's
+        ``AsyncIOMotorClient``.  Defaults to ``pymongo.MongoClient``.
+    :param client_kwargs: Other options passed to the client.
+    """
+    def __init__(self, host=None, max_pool_size=100, min_pool_size=0, max_idle_time_ms=None,
+                 wait_queue_timeout_ms=None, connect_timeout_ms=20000,
+                 server_selection_timeout_ms=30000, client_class=None, **client_kwargs):
+        self.host = host
+        self.client_kwargs = dict(
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            maxIdleTimeMS=max_idle_time_ms,
+            waitQueueTimeoutMS=wait_queue_timeout_ms,
+            connectTimeoutMS=connect_timeout_ms,
+            serverSelectionTimeoutMS=server_selection_timeout_ms,
+        )
+        self.client_kwargs.update(client_kwargs)
+        if client_class is None:
+            client_class = pymongo.MongoClient
+        self.client_class = client_class
+        self.pool_stats = PoolStats()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._collections = {}
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's client and its sockets belong to the parent, drop them unclosed
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._collections = {}
+        self.pool_stats.reset()
+
+    def get_client(self):
+        """Returns the client of the current process, creating it on first use."""
+        pid = os.getpid()
+        client = self._client
+        if client is not None and self._pid == pid:
+            return client
+        with self._lock:
+            if self._client is None or self._pid != pid:
+                kwargs = dict(self.client_kwargs)
+                kwargs["event_listeners"] = list(kwargs.get("event_listeners") or []) + [self.pool_stats]
+                self._client = self.client_class(self.host, **kwargs)
+                self._pid = pid
+                self._collections = {}
+            return self._client
+
+    def get_collection(self, database_name, collection_name):
+        """Returns a collection of the current process's client, one handle per collection."""
+        client = self.get_client()
+        key = (database_name, collection_name)
+        collection = self._collections.get(key)
+        if collection is None:
+            collection = client[database_name][collection_name]
+            self._collections[key] = collection
+        return collection
+
+    def collection_func(self, database_name):
+        """Returns a ``mongo_collection_func`` for the collections of ``database_name``."""
+        def get_collection(collection_name):
+            return self.get_collection(database_name, collection_name)
+        return get_collection
+
+    def stats(self):
+        """Returns the pool options and the pool counters of every server."""
+        return {
+            "pid":os.getpid(),
+            "connected":self._client is not None and self._pid == os.getpid(),
+            "max_pool_size":self.client_kwargs["maxPoolSize"],
+            "min_pool_size":self.client_kwargs["minPoolSize"],
+            "servers":self.pool_stats.snapshot(),
+        }
+
+    def stats_view(self):
+        return Response(StdlibSerializer().dumps(self.stats()), mimetype="application/json")
+
+    def add_route(self, flask_app, url_path="/_diagnostics/mongo-pool"):
+        """Exposes ``stats`` of the worker serving the request as JSON at ``url_path``."""
+        flask_app.add_url_rule(url_path, endpoint="ramlschema_mongo_pool",
+                               view_func=self.stats_view, methods=["GET"])
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._collections = {}
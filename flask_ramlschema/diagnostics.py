@@ -0,0 +1,359 @@
+import functools
+import inspect
+import logging
+import random
+import threading
+import time
+
+from flask import Response
+
+from .serialization import StdlibSerializer
+
+# Collection methods whose first argument is a filter
+FILTER_OPERATIONS = frozenset([
+    "find_one", "count_documents", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_replace", "find_one_and_update",
+    "find_one_and_delete",
+])
+
+logger = logging.getLogger(__name__)
+
+
+def filter_shape(query):
+    """Returns the shape of a mongo filter: its fields and the kind of each condition.
+
+    Values are left out, so ``{"age": {"$gte": 3}}`` and ``{"age": {"$gte": 9}}``
+    have the same shape ``(("age", "range"),)``.
+    """
+    shape = []
+    for field, condition in (query or {}).items():
+        if field in ("$and", "$or", "$nor"):
+            shape.append((field, tuple(filter_shape(clause) for clause in condition)))
+            continue
+        kind = "eq"
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            operators = set(condition)
+            if operators <= set(["$eq"]):
+                kind = "eq"
+            elif operators <= set(["$in", "$eq"]):
+                kind = "in"
+            else:
+                kind = "range"
+        shape.append((field, kind))
+    return tuple(sorted(shape, key=repr))
+
+def sort_shape(sort):
+    """Normalizes a sort given as a field name, or a list of ``(field, direction)`` pairs."""
+    if not sort:
+        return ()
+    if isinstance(sort, str):
+        return ((sort, 1),)
+    return tuple((field, direction) for field, direction in sort)
+
+def iter_plan_stages(plan):
+    """Yields the name of every stage in an ``explain`` plan."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            for stage in iter_plan_stages(value):
+                yield stage
+    elif isinstance(plan, list):
+        for value in plan:
+            for stage in iter_plan_stages(value):
+                yield stage
+
+def get_plan_problems(explain_output):
+    """Returns whether the winning plan of ``explain_output`` scans the collection, and
+    whether it sorts in memory."""
+    query_planner = explain_output.get("queryPlanner", {})
+    stages = set(iter_plan_stages(query_planner.get("winningPlan", {})))
+    return "COLLSCAN" in stages, "SORT" in stages
+
+def suggest_index(shape, sort):
+    """Suggests an index for a query ``shape`` and ``sort``.
+
+    Follows the equality, sort, range rule: equality fields first, then the sort
+    fields, then fields with range conditions.
+    """
+    equality = [field for field, kind in shape if kind in ("eq", "in") and not field.startswith("$")]
+    ranges = [field for field, kind in shape if kind == "range"]
+    keys = [(field, 1) for field in equality]
+    for field, direction in sort:
+        if field not in equality:
+            keys.append((field, direction))
+    for field in ranges:
+        if field not in equality and field not in [key for key, direction in keys]:
+            keys.append((field, 1))
+    if not keys or keys == [("_id", 1)] or keys == [("_id", -1)]:
+        return None
+    return keys
+
+
+class ShapeStats(object):
+    def __init__(self, collection_name, operation, shape, sort, projection):
+        self.collection_name = collection_name
+        self.operation = operation
+        self.shape = shape
+        self.sort = sort
+        self.projection = projection
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow_count = 0
+        self.explained = 0
+        self.collection_scan = False
+        self.in_memory_sort = False
+
+    def to_dict(self):
+        problem = self.collection_scan or self.in_memory_sort
+        return {
+            "collection":self.collection_name,
+            "operation":self.operation,
+            "filter":[list(condition) for condition in self.shape],
+            "sort":[list(key) for key in self.sort],
+            "projection":list(self.projection),
+            "count":self.count,
+            "avg_ms":self.total_seconds / self.count * 1e3,
+            "max_ms":self.max_seconds * 1e3,
+            "slow_count":self.slow_count,
+            "explained":self.explained,
+            "collection_scan":self.collection_scan,
+            "in_memory_sort":self.in_memory_sort,
+            "suggested_index":suggest_index(self.shape, self.sort) if problem else None,
+        }
+
+
+class QueryDiagnostics(object):
+    """Records the shape of every mongo query made by resources, with their latency.
+
+    Pass one instance to every resource with ``RAMLResource(diagnostics=...)``.
+    Values are never recorded, only the filter fields and the kind of their
+    conditions, the sort and the projected fields.
+
+    :param slow_ms float: (Optional) Calls taking at least this many milliseconds are slow.
+    :param explain_sample_rate float: (Optional) Fraction of slow calls whose query is
+        explained, to find collection scans and in memory sorts.  Explaining runs the
+        query planner again, ``0`` disables it.
+    :param max_shapes int: (Optional) Shapes beyond this number are not recorded.
+    """
+    def __init__(self, slow_ms=100, explain_sample_rate=0.0, max_shapes=1000):
+        self.slow_ms = slow_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.max_shapes = max_shapes
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+    def record(self, collection_name, operation, query, sort=None, projection=None,
+               seconds=0.0, explain_func=None):
+        """Records one call.
+
+        :param explain_func function: (Optional) Returns the ``explain`` output of the
+            call, called for sampled slow calls.
+        """
+        shape = filter_shape(query)
+        sort = sort_shape(sort)
+        projection = tuple(sorted(projection or ()))
+        key = (collection_name, operation, shape, sort, projection)
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    return
+                stats = ShapeStats(collection_name, operation, shape, sort, projection)
+                self._shapes[key] = stats
+            stats.count += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            slow = seconds * 1e3 >= self.slow_ms
+            if slow:
+                stats.slow_count += 1
+        if slow and explain_func is not None and random.random() < self.explain_sample_rate:
+            try:
+                collection_scan, in_memory_sort = get_plan_problems(explain_func())
+            except Exception:
+                logger.warning("Could not explain a {0} on {1}".format(operation, collection_name),
+                               exc_info=True)
+                return
+            with self._lock:
+                stats.explained += 1
+                stats.collection_scan = stats.collection_scan or collection_scan
+                stats.in_memory_sort = stats.in_memory_sort or in_memory_sort
+
+    def report(self):
+        """Returns the recorded shapes, the ones with problems or slow calls first."""
+        with self._lock:
+            shapes = [stats.to_dict() for stats in self._shapes.values()]
+        shapes.sort(key=lambda shape: (
+            not (shape["collection_scan"] or shape["in_memory_sort"]),
+            -shape["slow_count"], -shape["max_ms"]))
+        return shapes
+
+    def suggested_indexes(self):
+        """Returns ``(collection, keys)`` for every index suggested by the report."""
+        suggestions = []
+        for shape in self.report():
+            suggestion = (shape["collection"], shape["suggested_index"])
+            if shape["suggested_index"] and suggestion not in suggestions:
+                suggestions.append(suggestion)
+        return suggestions
+
+    def report_view(self):
+        report = {"shapes":self.report(), "suggested_indexes":[
+            {"collection":collection, "keys":keys} for collection, keys in self.suggested_indexes()]}
+        return Response(StdlibSerializer().dumps(report), mimetype="application/json")
+
+    def add_route(self, flask_app, url_path="/_diagnostics/queries"):
+        """Exposes the report as JSON at ``url_path`` of ``flask_app``."""
+        flask_app.add_url_rule(url_path, endpoint="ramlschema_query_diagnostics",
+                               view_func=self.report_view, methods=["GET"])
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+class DiagnosticCollection(object):
+    """Proxy of a mongo collection recording the shape of filtered operations.
+
+    ``find`` returns a ``RecordedCursor``, recorded with its sort once it is read.
+    Aggregations and calls on other collections, like the counters and tombstones
+    of a ``sync.ChangeFeed``, are not recorded.
+    """
+    def __init__(self, collection, diagnostics):
+        self.collection = collection
+        self.diagnostics = diagnostics
+
+    def __getattr__(self, name):
+        value = getattr(self.collection, name)
+        if name == "find":
+            return self.recorded_find(value)
+        if name in FILTER_OPERATIONS:
+            return self.recorded_operation(name, value)
+        return value
+
+    def recorded_find(self, method):
+        collection = self.collection
+        diagnostics = self.diagnostics
+        @functools.wraps(method)
+        def recorded(*args, **kwargs):
+            query = args[0] if args else kwargs.get("filter")
+            projection = args[1] if len(args) > 1 else kwargs.get("projection")
+            return RecordedCursor(method(*args, **kwargs), collection, diagnostics, query, projection)
+        return recorded
+
+    def recorded_operation(self, operation, method):
+        collection = self.collection
+        diagnostics = self.diagnostics
+        @functools.wraps(method)
+        def recorded(*args, **kwargs):
+            query = args[0] if args else kwargs.get("filter")
+            projection = None
+            if operation == "find_one":
+                projection = args[1] if len(args) > 1 else kwargs.get("projection")
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            if inspect.isawaitable(result):
+                return recorded_await(result, diagnostics, collection, operation, query,
+                                      projection, start)
+            diagnostics.record(collection.full_name, operation, query, projection=projection,
+                               seconds=time.perf_counter() - start,
+                               explain_func=lambda: collection.find(query).explain())
+            return result
+        return recorded
+
+class RecordedCursor(object):
+    """Proxy of a ``find`` cursor, recorded with its sort when it is exhausted or closed.
+
+    Only the time spent fetching documents is recorded, not the time the caller
+    spends between them.  Documents read with ``to_list``, from async drivers, are
+    recorded without explaining them.
+    """
+    def __init__(self, cursor, collection, diagnostics, query, projection):
+        self.cursor = cursor
+        self.collection = collection
+        self.diagnostics = diagnostics
+        self.query = query
+        self.projection = projection
+        self.sort_spec = None
+        self.limit_count = None
+        self.seconds = 0.0
+        self.recorded = False
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def sort(self, key_or_list, direction=None):
+        if direction is None:
+            self.sort_spec = key_or_list
+            self.cursor = self.cursor.sort(key_or_list)
+        else:
+            self.sort_spec = [(key_or_list, direction)]
+            self.cursor = self.cursor.sort(key_or_list, direction)
+        return self
+
+    def limit(self, limit):
+        self.limit_count = limit
+        self.cursor = self.cursor.limit(limit)
+        return self
+
+    def skip(self, skip):
+        self.cursor = self.cursor.skip(skip)
+        return self
+
+    def batch_size(self, batch_size):
+        self.cursor = self.cursor.batch_size(batch_size)
+        return self
+
+    def __iter__(self):
+        return self.iter_documents()
+
+    def iter_documents(self):
+        iterator = iter(self.cursor)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    document = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.seconds += time.perf_counter() - start
+                yield document
+        finally:
+            self.record(explain=True)
+
+    async def to_list(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self.cursor.to_list(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.record(explain=False)
+
+    def record(self, explain):
+        if self.recorded:
+            return
+        self.recorded = True
+        explain_func = None
+        if explain:
+            explain_func = self.explain_query
+        self.diagnostics.record(self.collection.full_name, "find", self.query, sort=self.sort_spec,
+                                projection=self.projection, seconds=self.seconds,
+                                explain_func=explain_func)
+
+    def explain_query(self):
+        find_cursor = self.collection.find(self.query, self.projection)
+        if self.sort_spec:
+            find_cursor = find_cursor.sort(self.sort_spec)
+        if self.limit_count:
+            find_cursor = find_cursor.limit(self.limit_count)
+        return find_cursor.explain()
+
+async def recorded_await(awaitable, diagnostics, collection, operation, query, projection, start):
+    try:
+        return await awaitable
+    finally:
+        # Explaining would need another await, async calls only record latency
+        diagnostics.record(collection.full_name, operation, query, projection=projection,
+                           seconds=time.perf_counter() - start)
@@ -3,11 +3,22 @@ import json
 from flask import Response
 
 class ValidationError(Exception):
+    """Error returned to the client as JSON by ``handle_validation_error``.
+
+    :param error_count int: (Optional) Number of errors found when ``errors`` only
+        holds some of them, the body then says it is truncated.  Validation stops
+        early, so it is a lower bound of the errors in the request.
+    """
     def __init__(self, errors, status_code=422, 
-                 description="Validation Error"):
+                 description="Validation Error", error_count=None):
         self.errors = errors
         self.status_code = status_code
         self.description = description
+        self.error_count = error_count
+
+    @property
+    def truncated(self):
+        return self.error_count is not None and self.error_count > len(self.errors)
 
     def to_dict(self):
         error_dict = {
@@ -15,11 +26,14 @@ class ValidationError(Exception):
             "status_code":self.status_code,
             "description":self.description
         }
+        if self.truncated:
+            error_dict["truncated"] = True
+            error_dict["error_count"] = self.error_count
         return error_dict
 
 def handle_validation_error(error):
     error_json = json.dumps(error.to_dict())
-    response = Response(response=error_json, status=422)
+    response = Response(response=error_json, status=error.status_code)
     return response
 
 def register_error_handlers(flask_app):
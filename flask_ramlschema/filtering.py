@@ -0,0 +1,191 @@
+import re
+
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+
+from .errors import ValidationError
+
+# Query parameters used by pagination, projections and counting
+RESERVED_ARGS = frozenset(["page", "per_page", "sort_by", "order", "count", "fields", "cursor"])
+
+FILTER_OPERATORS = {
+    "eq": "$eq",
+    "ne": "$ne",
+    "in": "$in",
+    "gt": "$gt",
+    "gte": "$gte",
+    "lt": "$lt",
+    "lte": "$lte",
+}
+
+RANGE_OPERATORS = frozenset(["gt", "gte", "lt", "lte"])
+
+_filter_arg_re = re.compile(r"^([^\[\]]+)(?:\[(\w+)\])?$")
+
+
+def parse_field_list(fields_param):
+    """Splits a comma separated RAML parameter like ``filterFields`` into mongo field names.
+
+    ``id`` is returned as ``_id``.
+    """
+    if not fields_param:
+        return []
+    fields = []
+    for field in fields_param.split(","):
+        field = field.strip()
+        if field:
+            fields.append("_id" if field == "id" else field)
+    return fields
+
+def get_properties(*schemas):
+    """Returns the top level property schemas of ``schemas``, the first schema declaring one wins."""
+    properties = {}
+    for schema in schemas:
+        if schema:
+            for name, property_schema in schema.get("properties", {}).items():
+                properties.setdefault(name, property_schema)
+    return properties
+
+def get_filter_query(args, filter_fields, properties=None):
+    """Builds a mongo query from the filter parameters in ``args``.
+
+    Parameters look like ``breed=tabby``, ``breed[in]=tabby,siamese`` or ``age[gte]=3``,
+    the operators are ``eq``, ``ne``, ``in``, ``gt``, ``gte``, ``lt`` and ``lte``.  Values
+    are converted to the type of the field's schema in ``properties``.  Parameters for
+    fields that are neither in ``filter_fields`` nor ``properties`` are ignored, invalid
+    filters raise ``errors.ValidationError``.
+
+    :param args werkzeug.datastructures.MultiDict: Query parameters of the request.
+    :param filter_fields list: Mongo field names clients can filter on.
+    :param properties dict: (Optional) Schemas of the fields by name.
+    """
+    if properties is None:
+        properties = {}
+    query = {}
+    errors = []
+    for arg_name in args:
+        if arg_name in RESERVED_ARGS:
+            continue
+        match = _filter_arg_re.match(arg_name)
+        if match is None:
+            continue
+        field, operator = match.groups()
+        if field == "id":
+            field = "_id"
+        if field not in filter_fields:
+            if field in properties or field == "_id":
+                errors.append({"message":"{0} can not be filtered".format(match.group(1))})
+            continue
+        if operator is None:
+            operator = "eq"
+        if operator not in FILTER_OPERATORS:
+            errors.append({"message":"unknown filter operator: {0}".format(operator)})
+            continue
+        property_schema = properties.get(field, {})
+        if operator in RANGE_OPERATORS and get_types(field, property_schema) == ["boolean"]:
+            errors.append({"message":"{0} can not be filtered by range".format(match.group(1))})
+            continue
+        try:
+            values = [convert_value(field, value, property_schema)
+                      for arg_value in args.getlist(arg_name)
+                      for value in split_values(operator, arg_value)]
+        except ValueError as error:
+            errors.append({"message":"invalid value for {0}: {1}".format(arg_name, error)})
+            continue
+        if operator == "eq" and len(values) > 1:
+            operator = "in"
+        field_query = query.setdefault(field, {})
+        if operator == "in":
+            field_query["$in"] = values
+        else:
+            field_query[FILTER_OPERATORS[operator]] = values[-1]
+    if errors:
+        raise ValidationError(errors, status_code=400, description="Invalid filters")
+    for field, field_query in query.items():
+        if list(field_query) == ["$eq"]:
+            query[field] = field_query["$eq"]
+    return query
+
+def split_values(operator, arg_value):
+    if operator == "in":
+        return arg_value.split(",")
+    return [arg_value]
+
+def get_types(field, property_schema):
+    if field == "_id":
+        return ["objectid"]
+    types = property_schema.get("type", "string")
+    if isinstance(types, str):
+        types = [types]
+    return types
+
+def convert_value(field, value, property_schema):
+    """Converts the query parameter ``value`` to the type declared by ``property_schema``.
+
+    Raises ``ValueError`` when it is not valid for any of the types.
+    """
+    for type_name in get_types(field, property_schema):
+        try:
+            converted = _converters[type_name](value)
+        except (KeyError, ValueError, InvalidId):
+            continue
+        if "enum" in property_schema and converted not in property_schema["enum"]:
+            continue
+        return converted
+    raise ValueError("{0!r} is not a valid {1}".format(
+        value, " or ".join(get_types(field, property_schema))))
+
+def convert_boolean(value):
+    if value not in ("true", "false"):
+        raise ValueError(value)
+    return value == "true"
+
+def convert_null(value):
+    if value != "null":
+        raise ValueError(value)
+    return None
+
+_converters = {
+    "objectid": ObjectId,
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": convert_boolean,
+    "null": convert_null,
+}
+
+
+def get_required_indexes(filter_fields, sort_fields):
+    """Returns the index keys needed by every filter and sort combination.
+
+    Equality and range filters on a field sorted by another need an index starting
+    with the filtered field followed by the sort field.  ``_id`` is always indexed.
+    """
+    if not sort_fields:
+        sort_fields = ["_id"]
+    required = []
+    for sort_field in sort_fields:
+        if sort_field != "_id":
+            required.append([sort_field])
+        for filter_field in filter_fields:
+            if filter_field == "_id":
+                continue
+            if filter_field == sort_field:
+                required.append([filter_field])
+            else:
+                required.append([filter_field, sort_field])
+    unique = []
+    for keys in required:
+        if keys not in unique:
+            unique.append(keys)
+    return unique
+
+def get_missing_indexes(index_information, required_indexes):
+    """Returns the keys in ``required_indexes`` that no index in ``index_information`` starts with.
+
+    :param index_information dict: Result of ``pymongo.Collection.index_information``.
+    """
+    index_keys = [[field for field, direction in index["key"]]
+                  for index in index_information.values()]
+    return [keys for keys in required_indexes
+            if not any(existing[:len(keys)] == keys for existing in index_keys)]
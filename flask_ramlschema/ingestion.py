@@ -0,0 +1,83 @@
+from flask import abort
+
+# Mongo can not store documents over 16MiB, larger bodies can never be written
+DEFAULT_MAX_BODY_SIZE = 16 * 1024 * 1024
+
+DEFAULT_MAX_BULK_BODY_SIZE = 64 * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+
+def check_content_length(request, max_body_size):
+    """Aborts with 413 when the request declares a ``Content-Length`` over ``max_body_size``."""
+    if max_body_size is None or request.content_length is None:
+        return
+    if request.content_length > max_body_size:
+        abort(413)
+
+def iter_body_chunks(request, max_body_size=None, chunk_size=CHUNK_SIZE):
+    """Yields the request body as it is received, in chunks of at most ``chunk_size`` bytes.
+
+    Aborts with 413 from ``Content-Length`` before reading anything, or as soon as
+    more than ``max_body_size`` bytes were received.  A body already read with
+    ``request.get_data()``, like by a ``before_request`` function, is yielded from
+    the request's cache instead of the drained stream.
+
+    :param request flask.Request: Request whose stream has not been read.
+    :param max_body_size int: (Optional) Maximum size of the body in bytes.
+    """
+    check_content_length(request, max_body_size)
+    # Set by werkzeug when get_data, or json, read the stream
+    cached_body = getattr(request, "_cached_data", None)
+    if cached_body is not None:
+        if max_body_size is not None and len(cached_body) > max_body_size:
+            abort(413)
+        if cached_body:
+            yield cached_body
+        return
+    stream = request.stream
+    received = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        received += len(chunk)
+        if max_body_size is not None and received > max_body_size:
+            abort(413)
+        yield chunk
+
+def read_body(request, max_body_size=None, chunk_size=CHUNK_SIZE):
+    """Reads the request body into a ``bytearray``, see ``iter_body_chunks``.
+
+    The body is not copied or decoded after it is read, JSON decoders parse it directly.
+    """
+    body = bytearray()
+    for chunk in iter_body_chunks(request, max_body_size, chunk_size):
+        body += chunk
+    return body
+
+def iter_lines(chunks, max_line_size=None):
+    """Yields the non blank lines of a body received as ``chunks``, without their newline.
+
+    Only one line is buffered at a time, lines over ``max_line_size`` bytes abort
+    with 413 without waiting for their end.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            if max_line_size is not None and end - start > max_line_size:
+                abort(413)
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                yield line
+        del buffer[:start]
+        if max_line_size is not None and len(buffer) > max_line_size:
+            abort(413)
+    if buffer.strip():
+        yield bytes(buffer)
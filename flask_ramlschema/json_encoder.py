@@ -1,12 +1,39 @@
+import base64
 import datetime
 import json
+import uuid
 
 from bson import ObjectId
+from bson.binary import Binary
+from bson.dbref import DBRef
+from bson.decimal128 import Decimal128
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+
+def bson_default(object_value):
+    """Converts BSON types that JSON has no type for, raising ``TypeError`` for others."""
+    if isinstance(object_value, ObjectId):
+        return str(object_value)
+    elif isinstance(object_value, datetime.datetime):
+        return int(object_value.timestamp())
+    elif isinstance(object_value, (Decimal128, uuid.UUID)):
+        return str(object_value)
+    elif isinstance(object_value, (Binary, bytes)):
+        return base64.b64encode(object_value).decode("ascii")
+    elif isinstance(object_value, Timestamp):
+        return object_value.time
+    elif isinstance(object_value, Regex):
+        return object_value.pattern
+    elif isinstance(object_value, DBRef):
+        return {"$ref":object_value.collection, "$id":object_value.id}
+    raise TypeError("Object of type {0} is not JSON serializable".format(
+        type(object_value).__name__))
+
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, object_value):
-        if isinstance(object_value, ObjectId):
-            return str(object_value)
-        elif isinstance(object_value, datetime.datetime):
-            return int(object_value.timestamp())
-        return json.JSONEncoder.default(self, object_value)
\ No newline at end of file
+        try:
+            return bson_default(object_value)
+        except TypeError:
+            return json.JSONEncoder.default(self, object_value)
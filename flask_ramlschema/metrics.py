@@ -0,0 +1,286 @@
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+
+from flask import g, make_response, request, Response
+from werkzeug.exceptions import HTTPException
+
+from .errors import ValidationError
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Collection methods timed as their own phase, cursors are timed by the views using them
+TIMED_OPERATIONS = frozenset([
+    "find_one", "count_documents", "estimated_document_count", "insert_one", "insert_many",
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_replace", "find_one_and_update", "find_one_and_delete", "bulk_write",
+    "aggregate", "distinct",
+])
+
+logger = logging.getLogger(__name__)
+
+
+class NullTimer(object):
+    """Context manager doing nothing, used for phases when instrumentation is disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+null_timer = NullTimer()
+
+
+class RequestTimings(object):
+    """Time spent in each phase of a request.
+
+    Phases can nest, a phase's time excludes the phases timed inside it, so the
+    phases never add up to more than the request.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self._stack = []
+
+    def timer(self, phase):
+        return PhaseTimer(self, phase)
+
+    def enter(self):
+        self._stack.append(0.0)
+
+    def exit(self, phase, seconds):
+        nested_seconds = self._stack.pop()
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds - nested_seconds
+        if self._stack:
+            self._stack[-1] += seconds
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total_seconds):
+        """Returns the value of the ``Server-Timing`` header, in milliseconds."""
+        metrics = ["{0};dur={1:.3f}".format(phase, seconds * 1e3)
+                   for phase, seconds in self.phases.items()]
+        metrics.append("total;dur={0:.3f}".format(total_seconds * 1e3))
+        return ", ".join(metrics)
+
+
+class PhaseTimer(object):
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.timings.enter()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timings.exit(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+def get_timings():
+    """Returns the ``RequestTimings`` of the current request, or ``None`` when it is not instrumented."""
+    return g.get("ramlschema_timings")
+
+def phase_timer(phase):
+    """Returns a context manager timing ``phase`` of the current request."""
+    timings = g.get("ramlschema_timings")
+    if timings is None:
+        return null_timer
+    return timings.timer(phase)
+
+def timed_function(phase, func):
+    """Wraps ``func`` so each call is timed as ``phase``, awaiting the result when it is awaitable."""
+    @functools.wraps(func)
+    def timed_func(*args, **kwargs):
+        timer = phase_timer(phase)
+        timer.__enter__()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            timer.__exit__(None, None, None)
+            raise
+        if inspect.isawaitable(result):
+            return timed_await(result, timer)
+        timer.__exit__(None, None, None)
+        return result
+    return timed_func
+
+async def timed_await(awaitable, timer):
+    try:
+        return await awaitable
+    finally:
+        timer.__exit__(None, None, None)
+
+
+class TimedCollection(object):
+    """Proxy of a mongo collection timing each operation as a ``mongo_<operation>`` phase."""
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        value = getattr(self.collection, name)
+        if name in TIMED_OPERATIONS:
+            return timed_function("mongo_" + name, value)
+        return value
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for bucket_count in self.counts:
+            total += bucket_count
+            yield total
+
+
+class Metrics(object):
+    """Collects per request timings into latency histograms per endpoint.
+
+    Pass one instance to every resource with ``RAMLResource(metrics=...)``.
+
+    :param buckets tuple: (Optional) Upper bounds of the histogram buckets in seconds.
+    :param server_timing bool: (Optional) Add a ``Server-Timing`` header to responses.
+    :param forward function: (Optional) Called after every request with the endpoint,
+        method, status code, total seconds and a dictionary of seconds per phase, to
+        send the timings to another metrics system.
+    :param prefix str: (Optional) Prefix of the exposed metric names.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, server_timing=True, forward=None,
+                 prefix="ramlschema"):
+        self.buckets = tuple(buckets)
+        self.server_timing = server_timing
+        self.forward = forward
+        self.prefix = prefix
+        self._requests = {}
+        self._phases = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, view_func, endpoint):
+        """Wraps ``view_func`` to time its requests as ``endpoint``."""
+        if inspect.iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def instrumented_view(*args, **kwargs):
+                g.ramlschema_timings = RequestTimings()
+                try:
+                    response = make_response(await view_func(*args, **kwargs))
+                except BaseException as error:
+                    self.finish(endpoint, get_error_status(error))
+                    raise
+                return self.finish(endpoint, response.status_code, response)
+        else:
+            @functools.wraps(view_func)
+            def instrumented_view(*args, **kwargs):
+                g.ramlschema_timings = RequestTimings()
+                try:
+                    response = make_response(view_func(*args, **kwargs))
+                except BaseException as error:
+                    self.finish(endpoint, get_error_status(error))
+                    raise
+                return self.finish(endpoint, response.status_code, response)
+        return instrumented_view
+
+    def finish(self, endpoint, status, response=None):
+        timings = g.pop("ramlschema_timings")
+        total_seconds = timings.total()
+        if response is not None and self.server_timing:
+            response.headers["Server-Timing"] = timings.server_timing(total_seconds)
+        self.record(endpoint, request.method, status, total_seconds, timings.phases)
+        return response
+
+    def record(self, endpoint, method, status, total_seconds, phases):
+        with self._lock:
+            request_key = (endpoint, method)
+            if request_key not in self._requests:
+                self._requests[request_key] = Histogram(self.buckets)
+            self._requests[request_key].observe(total_seconds)
+            response_key = (endpoint, method, status)
+            self._responses[response_key] = self._responses.get(response_key, 0) + 1
+            for phase, seconds in phases.items():
+                phase_key = (endpoint, phase)
+                if phase_key not in self._phases:
+                    self._phases[phase_key] = Histogram(self.buckets)
+                self._phases[phase_key].observe(seconds)
+        if self.forward is not None:
+            try:
+                self.forward(endpoint, method, status, total_seconds, dict(phases))
+            except Exception:
+                logger.exception("Forwarding request metrics failed")
+
+    def exposition(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            self._histogram_lines(
+                lines, "request_duration_seconds", "Request latency by endpoint and method.",
+                ("endpoint", "method"), self._requests)
+            self._histogram_lines(
+                lines, "phase_duration_seconds", "Time spent in each phase of a request.",
+                ("endpoint", "phase"), self._phases)
+            name = "{0}_responses_total".format(self.prefix)
+            lines.append("# HELP {0} Responses by endpoint, method and status.".format(name))
+            lines.append("# TYPE {0} counter".format(name))
+            for key, count in sorted(self._responses.items()):
+                labels = format_labels(("endpoint", "method", "status"), key)
+                lines.append("{0}{{{1}}} {2}".format(name, labels, count))
+        return "\n".join(lines) + "\n"
+
+    def _histogram_lines(self, lines, name, help_text, label_names, histograms):
+        name = "{0}_{1}".format(self.prefix, name)
+        lines.append("# HELP {0} {1}".format(name, help_text))
+        lines.append("# TYPE {0} histogram".format(name))
+        for key, histogram in sorted(histograms.items()):
+            labels = format_labels(label_names, key)
+            bounds = [format_float(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.cumulative_counts()):
+                lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(name, labels, bound, count))
+            lines.append("{0}_sum{{{1}}} {2}".format(name, labels, format_float(histogram.sum)))
+            lines.append("{0}_count{{{1}}} {2}".format(name, labels, histogram.count))
+
+    def metrics_view(self):
+        return Response(self.exposition(), mimetype="text/plain; version=0.0.4")
+
+    def add_route(self, flask_app, url_path="/metrics"):
+        """Exposes the metrics at ``url_path`` of ``flask_app``."""
+        flask_app.add_url_rule(url_path, endpoint="ramlschema_metrics",
+                               view_func=self.metrics_view, methods=["GET"])
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._phases.clear()
+            self._responses.clear()
+
+
+def get_error_status(error):
+    if isinstance(error, HTTPException) and error.code is not None:
+        return error.code
+    if isinstance(error, ValidationError):
+        return error.status_code
+    return 500
+
+def format_labels(label_names, label_values):
+    return ",".join('{0}="{1}"'.format(name, escape_label(value))
+                    for name, value in zip(label_names, label_values))
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_float(value):
+    return repr(float(value))
@@ -1,42 +1,244 @@
+import base64
+import binascii
 import math
+import threading
+import time
 
+import bson.json_util
 from flask import request
 import pymongo
 
 
-def get_page(find_cursor, page_request=None):
+def get_page(find_cursor, page_request=None, keyset=False, counter=None, stream=False,
+             max_per_page=100, rename_id=True):
+    """Returns the requested page of ``find_cursor`` as a dictionary.
+
+    :param keyset bool: (Optional) Page with ``next``/``prev`` cursor tokens and range
+        queries instead of ``skip``.  Requests that pass ``page`` are still paged by number.
+        The range query for the token is built by ``get_keyset_query``, it must be part
+        of the filter used to create ``find_cursor``.
+    :param counter function: (Optional) Called with ``find_cursor`` to get the total
+        number of entries, defaults to ``count_entries``.  When it returns ``None`` the
+        page has a ``has_more`` flag instead of ``total_pages`` and ``total_entries``.
+    :param stream bool: (Optional) Leave ``items`` as an iterator over ``find_cursor``
+        instead of a list, see ``create_page``.
+    :param max_per_page int: (Optional) Largest ``per_page`` clients can ask for.
+    :param rename_id bool: (Optional) Rename ``_id`` to ``id`` in the items, pass
+        ``False`` when they are encoded with ``Serializer.dumps_page``.
+    """
     if page_request is None:
         page_request = request
-    page_num, per_page, sort_by, order, order_arg = get_pagination_args(page_request)
-    page = create_page(find_cursor, page_num, per_page, sort_by, order, order_arg)
+    if keyset and "page" not in page_request.args:
+        return get_keyset_page(find_cursor, page_request, max_per_page=max_per_page,
+                               rename_id=rename_id)
+    if counter is None:
+        counter = count_entries
+    page_num, per_page, sort_by, order, order_arg = get_pagination_args(
+        page_request, max_per_page=max_per_page)
+    page = create_page(find_cursor, page_num, per_page, sort_by, order, order_arg,
+                       counter=counter, stream=stream, rename_id=rename_id)
     return page
 
-def create_page(find_cursor, page_num, per_page, sort_by, order, order_arg):
-    total_entries = find_cursor.count()
+async def get_page_async(find_cursor, page_request=None, keyset=False, counter=None,
+                         max_per_page=100, rename_id=True):
+    """Like ``get_page``, for cursors of async drivers like motor.
+
+    Documents are read with ``find_cursor.to_list``.  Async cursors can not count
+    themselves, so ``counter`` is a coroutine function and without it the page has
+    a ``has_more`` flag instead of totals.  Streaming is not supported.
+    """
+    if page_request is None:
+        page_request = request
+    if keyset and "page" not in page_request.args:
+        token, per_page, sort_by, order, order_arg = get_keyset_args(page_request, max_per_page)
+        find_cursor.sort(get_keyset_sort(token, sort_by, order)).limit(per_page + 1)
+        items = await find_cursor.to_list(per_page + 1)
+        return finish_keyset_page(items, token, per_page, sort_by, order, order_arg, rename_id)
+    page_num, per_page, sort_by, order, order_arg = get_pagination_args(
+        page_request, max_per_page=max_per_page)
+    total_entries = None
+    if counter is not None:
+        total_entries = await counter(find_cursor)
+    page_wrapper, limit = create_page_wrapper(
+        page_num, per_page, sort_by, order_arg, total_entries)
+    find_cursor.sort(sort_by, order).skip(per_page*(page_num-1)).limit(limit)
+    items = await find_cursor.to_list(limit)
+    return finish_page(page_wrapper, items, rename_id)
+
+def count_entries(find_cursor):
+    return find_cursor.count()
+
+def create_page(find_cursor, page_num, per_page, sort_by, order, order_arg,
+                counter=count_entries, stream=False, rename_id=True):
+    """Builds the page dictionary for ``find_cursor``.
+
+    When ``stream`` is set, ``items`` is an iterator over the documents as they are
+    read from the cursor, so only the cursor's current batch is held in memory.
+    Without a total count, ``has_more`` is only set once the iterator is exhausted.
+    """
+    total_entries = counter(find_cursor)
+    page_wrapper, limit = create_page_wrapper(
+        page_num, per_page, sort_by, order_arg, total_entries)
+    find_cursor.sort(sort_by, order).skip(per_page*(page_num-1)).limit(limit)
+    if stream:
+        page_wrapper["items"] = iter_page_items(find_cursor, per_page, page_wrapper, rename_id)
+        return page_wrapper
+    return finish_page(page_wrapper, list(find_cursor), rename_id)
+
+def create_page_wrapper(page_num, per_page, sort_by, order_arg, total_entries):
+    """Returns the page dictionary without ``items``, and how many documents to fetch.
+
+    Without ``total_entries`` one extra document is fetched, it tells whether there
+    is a next page without counting.
+    """
     page_wrapper = {}
     page_wrapper["page"] = page_num
     page_wrapper["per_page"] = per_page
-    page_wrapper["total_pages"] = int(math.ceil(total_entries / float(page_wrapper["per_page"])))
-    page_wrapper["total_entries"] = total_entries
+    if total_entries is not None:
+        page_wrapper["total_pages"] = int(math.ceil(total_entries / float(page_wrapper["per_page"])))
+        page_wrapper["total_entries"] = total_entries
     page_wrapper["sort_by"] = sort_by
     page_wrapper["order"] = order_arg
+    if total_entries is None:
+        if page_num < 1:
+            raise ValueError("invalid page number: {0}".format(page_num))
+        return page_wrapper, per_page + 1
     if page_wrapper["page"] > page_wrapper["total_pages"] or page_wrapper["page"] < 1:
         if total_entries != 0 or page_wrapper["page"] != 1:
-            raise ValueError("invalid page number: {0]".format(page_wrapper["page"]))
-    skip_num = per_page*(page_num-1)
-    find_cursor.sort(sort_by, order).skip(skip_num).limit(per_page)
-    items = list(find_cursor)
-    for mongo_doc in items:
-        mongo_doc["id"] = mongo_doc["_id"]
-        del mongo_doc["_id"]
+            raise ValueError("invalid page number: {0}".format(page_wrapper["page"]))
+    return page_wrapper, per_page
+
+def finish_page(page_wrapper, items, rename_id=True):
+    """Adds the fetched ``items`` to ``page_wrapper`` from ``create_page_wrapper``.
+
+    :param rename_id bool: (Optional) Rename ``_id`` to ``id`` in ``items``, documents
+        from ``get_aggregate_page`` are renamed by mongo, and documents encoded with
+        ``Serializer.dumps_page`` as they are encoded.
+    """
+    per_page = page_wrapper["per_page"]
+    if "total_entries" not in page_wrapper:
+        page_wrapper["has_more"] = len(items) > per_page
+        items = items[:per_page]
+    if rename_id:
+        for mongo_doc in items:
+            mongo_doc["id"] = mongo_doc["_id"]
+            del mongo_doc["_id"]
     page_wrapper["items"] = items
     return page_wrapper
 
+class PageQuery(object):
+    """What to list, for ``list_view`` overrides paged by ``get_aggregate_page``.
+
+    :param query dict: (Optional) Mongo filter, every document by default.
+    :param projection dict: (Optional) Inclusion projection, every field by default.
+    :param mongo_collection pymongo.collection.Collection: (Optional) Collection to
+        query, defaults to the resource's collection.
+    """
+    def __init__(self, query=None, projection=None, mongo_collection=None):
+        self.query = query or {}
+        self.projection = projection
+        self.mongo_collection = mongo_collection
+
+def get_rename_stages(projection=None):
+    """Returns the pipeline stages applying ``projection`` and renaming ``_id`` to ``id``."""
+    if projection is None or not any(projection.values()):
+        # Exclusion projections can not add fields
+        project = dict(projection or {})
+        project["_id"] = 0
+        return [{"$addFields":{"id":"$_id"}}, {"$project":project}]
+    project = dict((field, value) for field, value in projection.items() if field != "_id")
+    # Like find, _id is returned whether or not the projection includes it
+    project["id"] = "$_id"
+    project["_id"] = 0
+    return [{"$project":project}]
+
+def get_page_pipeline(query, projection, sort_by, order, skip, limit, count=True):
+    """Returns an aggregation pipeline answering a list page in one round trip.
+
+    Its only document holds the page's documents in ``items``, already projected
+    and renamed, and when ``count`` is set the number of documents matching
+    ``query`` in ``total``.
+    """
+    items = [{"$sort":{sort_by:order}}]
+    if skip:
+        items.append({"$skip":skip})
+    items.append({"$limit":limit})
+    items.extend(get_rename_stages(projection))
+    facet = {"items":items}
+    if count:
+        facet["total"] = [{"$count":"count"}]
+    return [{"$match":query}, {"$facet":facet}]
+
+def get_page_pipeline_args(page_request, max_per_page, count, total_entries):
+    page_num, per_page, sort_by, order, order_arg = get_pagination_args(
+        page_request, max_per_page=max_per_page)
+    if page_num < 1:
+        raise ValueError("invalid page number: {0}".format(page_num))
+    # Without a total an extra document tells whether there is a next page
+    limit = per_page if count or total_entries is not None else per_page + 1
+    return page_num, per_page, sort_by, order, order_arg, limit
+
+def finish_aggregate_page(result, page_num, per_page, sort_by, order_arg, count, total_entries):
+    if count:
+        total_entries = result["total"][0]["count"] if result["total"] else 0
+    page_wrapper = create_page_wrapper(page_num, per_page, sort_by, order_arg, total_entries)[0]
+    return finish_page(page_wrapper, result["items"], rename_id=False)
+
+def get_aggregate_page(mongo_collection, query=None, projection=None, page_request=None,
+                       count=True, total_entries=None, max_per_page=100):
+    """Returns the requested page like ``get_page``, with one ``$facet`` aggregation.
+
+    The total count and the page's documents come back in the same round trip,
+    projected and with ``_id`` renamed to ``id`` by mongo.  The page must fit in one
+    16MB document.
+
+    :param count bool: (Optional) Count the documents matching ``query`` in the
+        pipeline.  Without a count, or ``total_entries``, the page has a ``has_more`` flag.
+    :param total_entries int: (Optional) Total already known, like a cached count.
+    """
+    if page_request is None:
+        page_request = request
+    page_num, per_page, sort_by, order, order_arg, limit = get_page_pipeline_args(
+        page_request, max_per_page, count, total_entries)
+    pipeline = get_page_pipeline(query or {}, projection, sort_by, order,
+                                 per_page*(page_num-1), limit, count=count)
+    result = next(iter(mongo_collection.aggregate(pipeline)))
+    return finish_aggregate_page(result, page_num, per_page, sort_by, order_arg, count,
+                                 total_entries)
+
+async def get_aggregate_page_async(mongo_collection, query=None, projection=None,
+                                   page_request=None, count=True, total_entries=None,
+                                   max_per_page=100):
+    """Like ``get_aggregate_page``, for async drivers like motor."""
+    if page_request is None:
+        page_request = request
+    page_num, per_page, sort_by, order, order_arg, limit = get_page_pipeline_args(
+        page_request, max_per_page, count, total_entries)
+    pipeline = get_page_pipeline(query or {}, projection, sort_by, order,
+                                 per_page*(page_num-1), limit, count=count)
+    results = await mongo_collection.aggregate(pipeline).to_list(1)
+    return finish_aggregate_page(results[0], page_num, per_page, sort_by, order_arg, count,
+                                 total_entries)
+
+def iter_page_items(find_cursor, per_page, page_wrapper, rename_id=True):
+    returned = 0
+    for mongo_doc in find_cursor:
+        if returned == per_page:
+            page_wrapper["has_more"] = True
+            return
+        if rename_id:
+            mongo_doc["id"] = mongo_doc["_id"]
+            del mongo_doc["_id"]
+        returned += 1
+        yield mongo_doc
+    if "total_entries" not in page_wrapper:
+        page_wrapper["has_more"] = False
+
 def get_pagination_args(request, max_per_page=100):
     page_num = int(request.args.get("page", 1))
     per_page = int(request.args.get("per_page", 25))
     if per_page > max_per_page:
-        raise ValueError("per_page cannot be greated than 100")
+        raise ValueError("per_page cannot be greated than {0}".format(max_per_page))
 
     sort_by = request.args.get("sort_by", "id")
     if sort_by == "id":
@@ -49,4 +251,198 @@ def get_pagination_args(request, max_per_page=100):
     else:
         order = pymongo.ASCENDING
 
-    return page_num, per_page, sort_by, order, order_arg
\ No newline at end of file
+    return page_num, per_page, sort_by, order, order_arg
+
+def get_count_arg(request):
+    """Returns ``False`` when the client asked to skip the total count with ``count=none``."""
+    return request.args.get("count") != "none"
+
+def get_keyset_page(find_cursor, page_request=None, max_per_page=100, rename_id=True):
+    if page_request is None:
+        page_request = request
+    token, per_page, sort_by, order, order_arg = get_keyset_args(page_request, max_per_page)
+    return create_keyset_page(find_cursor, token, per_page, sort_by, order, order_arg, rename_id)
+
+def get_keyset_args(page_request, max_per_page=100):
+    page_num, per_page, sort_by, order, order_arg = get_pagination_args(
+        page_request, max_per_page=max_per_page)
+    token = get_cursor_token(page_request)
+    if token is not None:
+        sort_by = token["sort_by"]
+        order = token["order"]
+        order_arg = token["order_arg"]
+    return token, per_page, sort_by, order, order_arg
+
+def create_keyset_page(find_cursor, token, per_page, sort_by, order, order_arg, rename_id=True):
+    find_cursor.sort(get_keyset_sort(token, sort_by, order)).limit(per_page + 1)
+    return finish_keyset_page(list(find_cursor), token, per_page, sort_by, order, order_arg,
+                              rename_id)
+
+def get_keyset_sort(token, sort_by, order):
+    direction = "next" if token is None else token["direction"]
+    # Pages before the token are fetched in reverse order, then flipped back
+    sort_order = order if direction == "next" else -order
+    sort_spec = [(sort_by, sort_order)]
+    if sort_by != "_id":
+        sort_spec.append(("_id", sort_order))
+    return sort_spec
+
+def finish_keyset_page(items, token, per_page, sort_by, order, order_arg, rename_id=True):
+    """Builds the keyset page from up to ``per_page + 1`` documents fetched in ``get_keyset_sort`` order."""
+    direction = "next" if token is None else token["direction"]
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if direction == "prev":
+        items.reverse()
+
+    page_wrapper = {}
+    page_wrapper["per_page"] = per_page
+    page_wrapper["sort_by"] = sort_by
+    page_wrapper["order"] = order_arg
+    page_wrapper["next"] = None
+    page_wrapper["prev"] = None
+    if items:
+        if has_more or direction == "prev":
+            page_wrapper["next"] = encode_cursor_token(
+                items[-1], "next", sort_by, order, order_arg)
+        if (has_more and direction == "prev") or (token is not None and direction == "next"):
+            page_wrapper["prev"] = encode_cursor_token(
+                items[0], "prev", sort_by, order, order_arg)
+    if rename_id:
+        for mongo_doc in items:
+            mongo_doc["id"] = mongo_doc["_id"]
+            del mongo_doc["_id"]
+    page_wrapper["items"] = items
+    return page_wrapper
+
+def get_keyset_query(page_request=None):
+    """Returns the mongo filter selecting documents after the request's ``cursor`` token."""
+    if page_request is None:
+        page_request = request
+    token = get_cursor_token(page_request)
+    if token is None:
+        return {}
+    ascending = token["order"] == pymongo.ASCENDING
+    if ascending == (token["direction"] == "next"):
+        operator = "$gt"
+    else:
+        operator = "$lt"
+    sort_by = token["sort_by"]
+    if sort_by == "_id":
+        return {"_id":{operator:token["id"]}}
+    value = token["value"]
+    ties = {sort_by:value, "_id":{operator:token["id"]}}
+    # Missing and null values sort before every other value, but never match
+    # comparisons, so they are selected on their own
+    if value is None:
+        if operator == "$gt":
+            return {"$or":[{sort_by:{"$ne":None}}, ties]}
+        return ties
+    clauses = [{sort_by:{operator:value}}, ties]
+    if operator == "$lt":
+        clauses.append({sort_by:None})
+    return {"$or":clauses}
+
+def get_keyset_sort_field(page_request=None):
+    """Returns the field keyset pages of ``page_request`` are sorted by."""
+    if page_request is None:
+        page_request = request
+    token = get_cursor_token(page_request)
+    if token is not None:
+        return token["sort_by"]
+    sort_by = page_request.args.get("sort_by", "id")
+    if sort_by == "id":
+        sort_by = "_id"
+    return sort_by
+
+def get_cursor_token(page_request):
+    cursor_arg = page_request.args.get("cursor")
+    if not cursor_arg:
+        return None
+    return decode_cursor_token(cursor_arg)
+
+def encode_cursor_token(mongo_doc, direction, sort_by, order, order_arg):
+    token = {
+        "direction":direction,
+        "sort_by":sort_by,
+        "order":order,
+        "order_arg":order_arg,
+        "value":get_field(mongo_doc, sort_by),
+        "id":mongo_doc["_id"]
+    }
+    token_json = bson.json_util.dumps(token, sort_keys=True)
+    return base64.urlsafe_b64encode(token_json.encode("utf-8")).decode("ascii")
+
+def decode_cursor_token(cursor_arg):
+    try:
+        token_json = base64.urlsafe_b64decode(cursor_arg.encode("ascii"))
+        token = bson.json_util.loads(token_json.decode("utf-8"))
+        token["direction"], token["sort_by"], token["order"], token["id"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError("invalid cursor: {0}".format(cursor_arg))
+    if token["direction"] not in ("next", "prev"):
+        raise ValueError("invalid cursor: {0}".format(cursor_arg))
+    return token
+
+def get_field(mongo_doc, field_path):
+    value = mongo_doc
+    for field_name in field_path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(field_name)
+    return value
+
+
+class CountCache(object):
+    """Memoizes total entry counts per query for ``ttl`` seconds.
+
+    :param ttl float: Seconds a count is reused before the query is counted again.
+    :param max_entries int: (Optional) Number of queries to keep, the oldest
+        count is dropped when the cache is full.
+    """
+    def __init__(self, ttl, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, query, count_func):
+        """Returns the cached count for ``query``, calling ``count_func`` on a miss."""
+        key = bson.json_util.dumps(query, sort_keys=True)
+        entry = self._counts.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        generation = self._generation
+        total_entries = count_func()
+        self._store(key, total_entries, generation)
+        return total_entries
+
+    async def get_async(self, query, count_func):
+        """Like ``get``, for a ``count_func`` returning an awaitable."""
+        key = bson.json_util.dumps(query, sort_keys=True)
+        entry = self._counts.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        generation = self._generation
+        total_entries = await count_func()
+        self._store(key, total_entries, generation)
+        return total_entries
+
+    def _store(self, key, total_entries, generation):
+        with self._lock:
+            # A write invalidated the cache while counting, the count may be stale
+            if generation != self._generation:
+                return
+            if len(self._counts) >= self.max_entries and key not in self._counts:
+                oldest_key = min(self._counts, key=lambda cached_key: self._counts[cached_key][0])
+                del self._counts[oldest_key]
+            self._counts[key] = (time.monotonic() + self.ttl, total_entries)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._counts.clear()
+
+    def __len__(self):
+        return len(self._counts)
@@ -0,0 +1,50 @@
+from .errors import ValidationError
+
+
+def get_schema_fields(*schemas):
+    """Returns the names of the top level properties declared in ``schemas``."""
+    fields = set()
+    for schema in schemas:
+        if schema:
+            fields.update(schema.get("properties", {}))
+    return fields
+
+def parse_fields(fields_arg, allowed_fields=None):
+    """Converts a comma separated list of fields into a mongo projection.
+
+    ``id`` selects ``_id``, which mongo always returns.  Dotted paths select part
+    of a declared property.  Returns ``None`` for ``*``, meaning every field.
+
+    :param fields_arg str: Value like ``name,breed``.
+    :param allowed_fields set: (Optional) Fields clients can select, any field is
+        allowed when empty.  Raises ``errors.ValidationError`` for other fields.
+    """
+    fields_arg = fields_arg.strip()
+    if fields_arg == "*":
+        return None
+    projection = {}
+    errors = []
+    for field in fields_arg.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        if field == "id":
+            projection["_id"] = 1
+            continue
+        if allowed_fields and field.split(".")[0] not in allowed_fields:
+            errors.append({"message":"unknown field: {0}".format(field)})
+            continue
+        projection[field] = 1
+    if errors:
+        raise ValidationError(errors, status_code=400, description="Invalid fields")
+    return projection
+
+def get_projection(request, default_projection=None, allowed_fields=None):
+    """Returns the projection for the ``fields`` query parameter of ``request``.
+
+    Falls back to ``default_projection`` when the parameter is not set.
+    """
+    fields_arg = request.args.get("fields")
+    if fields_arg is None:
+        return default_projection
+    return parse_fields(fields_arg, allowed_fields)
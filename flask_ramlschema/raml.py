@@ -0,0 +1,327 @@
+import argparse
+import hashlib
+import json
+import logging
+import marshal
+import os
+import pickle
+import sys
+import threading
+
+import yaml
+try:
+    from yaml import CSafeLoader as BaseLoader
+except ImportError:
+    from yaml import SafeLoader as BaseLoader
+
+from .conditional import body_etag
+from .validation import (
+    GeneratedValidator, SchemaCompileError, compile_schema, load_compiled_schema, validator_cache
+)
+
+ARTIFACT_FORMAT = 1
+
+SCHEMA_PARAMS = ("newItemSchema", "updateItemSchema")
+
+YAML_EXTENSIONS = (".raml", ".yaml", ".yml")
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class RAMLLoader(BaseLoader):
+    """YAML loader for RAML, using libyaml when it is installed.
+
+    ``!include`` is resolved by ``include_func``, files loaded without one can not
+    include others.
+    """
+    include_func = None
+
+def construct_include(loader, node):
+    include_path = loader.construct_scalar(node)
+    if loader.include_func is None:
+        raise yaml.constructor.ConstructorError(
+            None, None, "can not !include {0} here".format(include_path), node.start_mark)
+    return loader.include_func(include_path)
+
+RAMLLoader.add_constructor("!include", construct_include)
+
+def load_yaml(data, include_func=None):
+    """Parses the RAML or YAML document in ``data``, a str or bytes."""
+    loader = RAMLLoader(data)
+    loader.include_func = include_func
+    try:
+        return loader.get_single_data()
+    finally:
+        loader.dispose()
+
+
+class APILoader(object):
+    """Loads an ``api.raml``, resolving ``!include`` relative to the including file.
+
+    Every file is read and parsed once, files included several times, or with the
+    same content, share one parsed document.  ``documents`` maps the sha256 of each
+    file's content to its parsed document, YAML files are parsed and others are
+    included as text.
+    """
+    def __init__(self):
+        self.documents = {}
+        self.file_hashes = {}
+        self._loading = set()
+
+    def load(self, file_path):
+        file_path = os.path.abspath(file_path)
+        if file_path in self.file_hashes:
+            return self.documents[self.file_hashes[file_path]]
+        if file_path in self._loading:
+            raise ValueError("{0} includes itself".format(file_path))
+        with open(file_path, "rb") as raml_handle:
+            data = raml_handle.read()
+        data_hash = content_hash(data)
+        if data_hash not in self.documents:
+            self._loading.add(file_path)
+            try:
+                self.documents[data_hash] = self.parse(file_path, data)
+            finally:
+                self._loading.discard(file_path)
+        self.file_hashes[file_path] = data_hash
+        return self.documents[data_hash]
+
+    def parse(self, file_path, data):
+        if not file_path.endswith(YAML_EXTENSIONS):
+            return data.decode("utf-8")
+        include_dir = os.path.dirname(file_path)
+        return load_yaml(data, lambda include_path: self.load(os.path.join(include_dir, include_path)))
+
+
+def parse_schemas(raml):
+    """Decodes the JSON schema strings in the resource types of a resource's ``raml``."""
+    if not isinstance(raml, dict) or not isinstance(raml.get("type"), dict):
+        return
+    for type_params in raml["type"].values():
+        if not isinstance(type_params, dict):
+            continue
+        for param in SCHEMA_PARAMS:
+            if isinstance(type_params.get(param), str):
+                type_params[param] = json.loads(type_params[param])
+
+def load_api(api_raml_path):
+    """Loads ``api_raml_path`` with its includes, decoding the schemas of every resource."""
+    api_loader = APILoader()
+    api = api_loader.load(api_raml_path)
+    for document in api_loader.documents.values():
+        parse_schemas(document)
+    return api
+
+def iter_resources(raml, parent_path=""):
+    """Yields ``(url_path, resource_raml)`` for the resources of an api, including nested ones."""
+    for key, value in raml.items():
+        if isinstance(key, str) and key.startswith("/") and isinstance(value, dict):
+            url_path = parent_path + key
+            yield url_path, value
+            for child in iter_resources(value, url_path):
+                yield child
+
+def iter_resource_pairs(api):
+    """Yields ``(url_path, collection_raml, item_raml)`` for every collection of ``api``.
+
+    The item of ``/cats`` is the resource at ``/cats/{id}``, whatever its parameter
+    is named.  Resources that are neither are logged and skipped.
+    """
+    resources = dict(iter_resources(api))
+    items = set()
+    for url_path, raml in resources.items():
+        if "{" in url_path:
+            continue
+        item_paths = [item_path for item_path in resources
+                      if item_path.startswith(url_path + "/{") and item_path.endswith("}")
+                      and "/" not in item_path[len(url_path) + 1:]]
+        if not item_paths:
+            logger.warning("Skipping {0}, it has no item resource".format(url_path))
+            continue
+        items.add(item_paths[0])
+        yield url_path, raml, resources[item_paths[0]]
+    for url_path in resources:
+        if "{" in url_path and url_path not in items:
+            logger.warning("Skipping {0}, it is not the item of a collection".format(url_path))
+
+
+class SchemaCache(object):
+    """Shares one schema dictionary, and its encoded bodies, between equal schemas.
+
+    ``validation.ValidatorCache`` is keyed by schema identity, so interned schemas
+    also share their validators.
+    """
+    def __init__(self):
+        self._schemas = {}
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def intern(self, schema):
+        """Returns the first schema seen that is equal to ``schema``."""
+        if schema is None:
+            return None
+        key = json.dumps(schema, sort_keys=True)
+        with self._lock:
+            return self._schemas.setdefault(key, schema)
+
+    def get_body(self, schema, serializer):
+        """Returns the body of ``schema`` encoded by ``serializer``, and its ETag."""
+        key = (id(schema), type(serializer))
+        entry = self._bodies.get(key)
+        # The schema is kept in the entry so its id can not be reused
+        if entry is None or entry[0] is not schema:
+            body = serializer.dumps(schema)
+            entry = (schema, body, body_etag(body))
+            with self._lock:
+                self._bodies[key] = entry
+        return entry[1], entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+            self._bodies.clear()
+
+
+schema_cache = SchemaCache()
+
+def iter_schemas(raml):
+    """Yields ``(type_name, param, schema)`` for the parsed schemas of a resource's ``raml``."""
+    if not isinstance(raml, dict) or not isinstance(raml.get("type"), dict):
+        return
+    for type_name, type_params in raml["type"].items():
+        if not isinstance(type_params, dict):
+            continue
+        for param in SCHEMA_PARAMS:
+            if isinstance(type_params.get(param), dict):
+                yield type_name, param, type_params[param]
+
+
+def compile_api(api_raml_path, generated_validators=False):
+    """Resolves ``api_raml_path`` and its includes into an artifact dictionary.
+
+    Schemas are stored decoded.  With ``generated_validators`` the code of a
+    ``validation.GeneratedValidator`` is stored for every schema that can be compiled.
+    Write the artifact with ``write_artifact``, or from a shell with
+    ``python -m flask_ramlschema.raml raml/api.raml -o build/api.ramlc``.
+    """
+    api_loader = APILoader()
+    api = api_loader.load(api_raml_path)
+    api_dir = os.path.dirname(os.path.abspath(api_raml_path))
+    validators = []
+    for data_hash, document in api_loader.documents.items():
+        parse_schemas(document)
+        if not generated_validators:
+            continue
+        for type_name, param, schema in iter_schemas(document):
+            try:
+                is_valid = compile_schema(schema)
+            except SchemaCompileError:
+                continue
+            validators.append({
+                "document":data_hash,
+                "type":type_name,
+                "param":param,
+                "code":marshal.dumps(is_valid.code),
+                "constants":is_valid.constants,
+            })
+    return {
+        "format":ARTIFACT_FORMAT,
+        "python":sys.implementation.cache_tag,
+        "api_hash":content_hash("\n".join(sorted(api_loader.documents)).encode("ascii")),
+        "api":api,
+        "files":dict((os.path.relpath(file_path, api_dir), data_hash)
+                     for file_path, data_hash in api_loader.file_hashes.items()),
+        "documents":api_loader.documents,
+        "validators":validators,
+    }
+
+def write_artifact(artifact, artifact_path):
+    with open(artifact_path, "wb") as artifact_handle:
+        pickle.dump(artifact, artifact_handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class RAMLArtifact(object):
+    """A compiled ``api.raml`` loaded with ``load_artifact``.
+
+    The artifact is a pickle, only load artifacts you built.
+    """
+    def __init__(self, artifact):
+        if artifact.get("format") != ARTIFACT_FORMAT:
+            raise ValueError("Unsupported RAML artifact format: {0}".format(artifact.get("format")))
+        self.api_hash = artifact["api_hash"]
+        self.api = artifact["api"]
+        self.files = artifact["files"]
+        self.documents = artifact["documents"]
+        for document in self.documents.values():
+            for type_name, param, schema in iter_schemas(document):
+                document["type"][type_name][param] = schema_cache.intern(schema)
+        # Generated code is only portable between identical python versions
+        if artifact["python"] == sys.implementation.cache_tag:
+            self.add_validators(artifact["validators"])
+
+    def add_validators(self, validators):
+        for compiled in validators:
+            schema = self.documents[compiled["document"]]["type"][compiled["type"]][compiled["param"]]
+            is_valid = load_compiled_schema(marshal.loads(compiled["code"]), compiled["constants"])
+            validator_cache.add(schema, GeneratedValidator(schema, is_valid), generated=True)
+
+    def is_current(self, api_raml_path):
+        """Returns whether ``api_raml_path`` and its includes are unchanged since compiling."""
+        api_dir = os.path.dirname(os.path.abspath(api_raml_path))
+        if os.path.basename(api_raml_path) not in self.files:
+            return False
+        for file_path, data_hash in self.files.items():
+            try:
+                with open(os.path.join(api_dir, file_path), "rb") as raml_handle:
+                    if content_hash(raml_handle.read()) != data_hash:
+                        return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def get_document(self, data):
+        """Returns the parsed document for a file's content, or ``None`` when it was not compiled."""
+        return self.documents.get(content_hash(data))
+
+
+_artifacts = {}
+_artifacts_lock = threading.Lock()
+
+def load_artifact(artifact_path):
+    """Loads the artifact at ``artifact_path`` once per process.
+
+    Returns ``None`` when there is no artifact at ``artifact_path``.
+    """
+    try:
+        modified = os.stat(artifact_path).st_mtime
+    except FileNotFoundError:
+        return None
+    key = (os.path.abspath(artifact_path), modified)
+    with _artifacts_lock:
+        if key not in _artifacts:
+            with open(artifact_path, "rb") as artifact_handle:
+                _artifacts[key] = RAMLArtifact(pickle.load(artifact_handle))
+            logger.info("Loaded RAML artifact {0} ({1})".format(artifact_path, _artifacts[key].api_hash))
+        return _artifacts[key]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compiles an api.raml into an artifact for RAMLResource")
+    parser.add_argument("api_raml", help="Path to the api.raml")
+    parser.add_argument("-o", "--output", help="Path of the artifact, defaults to the api.raml path with a .ramlc extension")
+    parser.add_argument("--generated-validators", action="store_true",
+                        help="Store generated validator code, the artifact then only speeds up the same python version")
+    args = parser.parse_args(argv)
+    output = args.output
+    if output is None:
+        output = os.path.splitext(args.api_raml)[0] + ".ramlc"
+    artifact = compile_api(args.api_raml, generated_validators=args.generated_validators)
+    write_artifact(artifact, output)
+    print("Wrote {0} ({1})".format(output, artifact["api_hash"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+
+from .json_encoder import JSONEncoder, bson_default
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def rename_id(document):
+    """Returns ``document`` with ``_id`` renamed to ``id``, without mutating it.
+
+    The copy is shallow, values are shared with ``document``.
+    """
+    if "_id" not in document:
+        return document
+    renamed = dict(document)
+    renamed["id"] = renamed.pop("_id")
+    return renamed
+
+
+class Serializer(object):
+    """Encodes responses and decodes request bodies, see ``get_serializer``.
+
+    ``dumps_document`` and ``dumps_page`` rename ``_id`` to ``id`` on shallow copies,
+    so documents read from mongo are never mutated.  Every ``dumps*`` method returns bytes.
+    """
+    name = None
+
+    def dumps(self, value):
+        raise NotImplementedError()
+
+    def loads(self, data):
+        """Decodes JSON from ``data``, bytes are parsed without decoding them to a str first."""
+        raise NotImplementedError()
+
+    def dumps_document(self, document):
+        return self.dumps(rename_id(document))
+
+    def dumps_page(self, page_wrapper):
+        """Encodes a page from ``pagination.get_page``, renaming ``_id`` in its items."""
+        page_wrapper = dict(page_wrapper)
+        page_wrapper["items"] = [rename_id(document) for document in page_wrapper["items"]]
+        return self.dumps(page_wrapper)
+
+
+class StdlibSerializer(Serializer):
+    """Serializer using the ``json`` module and ``json_encoder.JSONEncoder``."""
+    name = "stdlib"
+
+    def __init__(self):
+        self.encoder = JSONEncoder()
+
+    def dumps(self, value):
+        return self.encoder.encode(value).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonSerializer(Serializer):
+    """Serializer using the C-accelerated `orjson <https://github.com/ijl/orjson>`_.
+
+    Output is compact UTF-8 JSON, BSON types are encoded like ``JSONEncoder`` does.
+    """
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        self.option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, value):
+        return orjson.dumps(value, default=bson_default, option=self.option)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+serializers = {
+    "stdlib": StdlibSerializer,
+    "orjson": OrjsonSerializer,
+}
+
+def get_serializer(name="stdlib"):
+    """Returns a serializer by name: ``stdlib``, ``orjson``, or ``auto`` for the fastest installed one."""
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name not in serializers:
+        raise ValueError("Unknown serializer: {0}".format(name))
+    return serializers[name]()
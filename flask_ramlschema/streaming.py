@@ -0,0 +1,54 @@
+import itertools
+
+from .serialization import StdlibSerializer
+
+
+def iter_batches(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def iter_page_json(page_wrapper, serializer=None, batch_size=100):
+    """Yields ``page_wrapper`` encoded as JSON bytes, one fragment per batch of items.
+
+    :param page_wrapper dict: Page from ``pagination.get_page``, ``items`` can be
+        any iterable of documents.
+    :param serializer serialization.Serializer: (Optional) Serializer for keys and documents.
+    :param batch_size int: (Optional) Number of documents encoded into each fragment.
+    """
+    if serializer is None:
+        serializer = StdlibSerializer()
+    dumps = serializer.dumps
+    encoded_keys = set(["items"])
+    fragments = []
+    for key, value in page_wrapper.items():
+        if key == "items":
+            continue
+        encoded_keys.add(key)
+        fragments.append(dumps(key) + b": " + dumps(value))
+    fragments.append(b'"items": [')
+    yield b"{" + b", ".join(fragments)
+    separator = b""
+    for batch in iter_batches(page_wrapper["items"], batch_size):
+        yield separator + b", ".join(serializer.dumps_document(mongo_doc) for mongo_doc in batch)
+        separator = b", "
+    # Keys set while the items were read, like has_more
+    fragments = [b"]"]
+    for key, value in list(page_wrapper.items()):
+        if key not in encoded_keys:
+            fragments.append(b", " + dumps(key) + b": " + dumps(value))
+    fragments.append(b"}")
+    yield b"".join(fragments)
+
+def iter_ndjson(documents, serializer=None, batch_size=100):
+    """Yields ``documents`` as newline delimited JSON bytes, one fragment per batch.
+
+    ``_id`` is renamed to ``id`` like in list pages, the documents are not mutated.
+    """
+    if serializer is None:
+        serializer = StdlibSerializer()
+    for batch in iter_batches(documents, batch_size):
+        yield b"\n".join(serializer.dumps_document(mongo_doc) for mongo_doc in batch) + b"\n"
@@ -0,0 +1,155 @@
+import base64
+import binascii
+import datetime
+
+import bson.json_util
+import pymongo
+from pymongo import ReturnDocument, UpdateOne
+
+
+def encode_sync_token(sequence):
+    token_json = bson.json_util.dumps({"seq":sequence})
+    return base64.urlsafe_b64encode(token_json.encode("utf-8")).decode("ascii")
+
+def decode_sync_token(token_arg):
+    """Returns the sequence number of a token from ``encode_sync_token``, ``0`` without one."""
+    if not token_arg:
+        return 0
+    try:
+        token_json = base64.urlsafe_b64decode(token_arg.encode("ascii"))
+        sequence = bson.json_util.loads(token_json.decode("utf-8"))["seq"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError("invalid sync token: {0}".format(token_arg))
+    if not isinstance(sequence, int) or isinstance(sequence, bool) or sequence < 0:
+        raise ValueError("invalid sync token: {0}".format(token_arg))
+    return sequence
+
+
+class SyncTokenExpired(Exception):
+    """The tombstones a sync token needs were purged, the client must sync from the start."""
+
+
+class ChangeFeed(object):
+    """Numbers writes per collection so clients can fetch what changed since a sync token.
+
+    Every write through a resource stores the next sequence number of its collection
+    in ``sequence_field`` of the document, and every delete stores a tombstone with
+    one.  ``changes`` returns the documents and tombstones numbered after a token,
+    in order.  Pass one instance to resources with ``RAMLResource(change_feed=...)``.
+
+    Sequence numbers are taken from ``counters_collection`` before the write, a
+    write that takes longer than a later one can be numbered before changes a client
+    already fetched.  Writes that bypass the resource are not numbered, number the
+    documents written before the feed was enabled with ``backfill``.
+
+    :param counters_collection pymongo.Collection: Collection holding one sequence
+        document per collection, shared by every process.
+    :param tombstones_collection pymongo.Collection: Collection holding the ids of
+        deleted documents, see ``create_indexes`` and ``purge_tombstones``.
+    :param sequence_field str: (Optional) Field of documents holding their number.
+    """
+    def __init__(self, counters_collection, tombstones_collection, sequence_field="_seq"):
+        self.counters_collection = counters_collection
+        self.tombstones_collection = tombstones_collection
+        self.sequence_field = sequence_field
+
+    def create_indexes(self, mongo_collection):
+        """Creates the indexes ``changes`` reads ``mongo_collection`` and its tombstones with."""
+        mongo_collection.create_index([(self.sequence_field, pymongo.ASCENDING)])
+        self.tombstones_collection.create_index(
+            [("collection", pymongo.ASCENDING), (self.sequence_field, pymongo.ASCENDING)])
+
+    def next_sequences(self, collection_name, count=1):
+        """Reserves ``count`` sequence numbers of ``collection_name`` in one write."""
+        counter = self.counters_collection.find_one_and_update(
+            {"_id":collection_name}, {"$inc":{"seq":count}}, upsert=True,
+            return_document=ReturnDocument.AFTER)
+        return list(range(counter["seq"] - count + 1, counter["seq"] + 1))
+
+    def record_deletes(self, collection_name, object_ids, sequences=None):
+        """Stores a tombstone for every deleted document id."""
+        if not object_ids:
+            return
+        if sequences is None:
+            sequences = self.next_sequences(collection_name, len(object_ids))
+        deleted_at = datetime.datetime.now(datetime.timezone.utc)
+        self.tombstones_collection.insert_many([
+            {"collection":collection_name, "id":object_id, self.sequence_field:sequence,
+             "deleted_at":deleted_at}
+            for object_id, sequence in zip(object_ids, sequences)])
+
+    def changes(self, mongo_collection, collection_name, since=0, limit=100, projection=None):
+        """Returns the changes numbered after ``since``, at most ``limit`` of them.
+
+        The result has the changed documents in ``changes``, without their
+        ``sequence_field``, the ids of deleted ones in ``deleted``, the token for the
+        next request in ``next`` and whether more changes are waiting in ``has_more``.
+        A document changed several times is only returned once, in its last version.
+        Raises ``SyncTokenExpired`` when tombstones after ``since`` were purged.
+
+        :param projection dict: (Optional) Inclusion or exclusion projection of documents.
+        """
+        counter = self.counters_collection.find_one({"_id":collection_name}) or {}
+        if since < counter.get("purged", 0):
+            raise SyncTokenExpired(collection_name)
+        if projection is not None and any(projection.values()):
+            projection = dict(projection)
+            projection[self.sequence_field] = 1
+        query = {self.sequence_field:{"$gt":since}}
+        documents = list(mongo_collection.find(query, projection)
+                         .sort(self.sequence_field, pymongo.ASCENDING).limit(limit + 1))
+        tombstone_query = {"collection":collection_name, self.sequence_field:{"$gt":since}}
+        tombstones = list(self.tombstones_collection.find(
+                          tombstone_query, {"id":1, self.sequence_field:1})
+                          .sort(self.sequence_field, pymongo.ASCENDING).limit(limit + 1))
+        entries = [(document[self.sequence_field], True, document) for document in documents]
+        entries.extend((tombstone[self.sequence_field], False, tombstone) for tombstone in tombstones)
+        entries.sort(key=lambda entry: entry[0])
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        changed = []
+        deleted = []
+        for sequence, is_document, entry in entries:
+            if is_document:
+                entry = dict(entry)
+                del entry[self.sequence_field]
+                entry["id"] = entry.pop("_id")
+                changed.append(entry)
+            else:
+                deleted.append(entry["id"])
+        if entries:
+            since = entries[-1][0]
+        return {"changes":changed, "deleted":deleted, "next":encode_sync_token(since),
+                "has_more":has_more}
+
+    def purge_tombstones(self, collection_name, before):
+        """Deletes the tombstones of ``collection_name`` numbered before ``before``.
+
+        Tokens older than ``before`` are expired afterwards, since they would miss
+        the purged deletes.
+        """
+        self.counters_collection.update_one(
+            {"_id":collection_name}, {"$max":{"purged":before}}, upsert=True)
+        result = self.tombstones_collection.delete_many(
+            {"collection":collection_name, self.sequence_field:{"$lt":before}})
+        return result.deleted_count
+
+    def backfill(self, mongo_collection, collection_name, batch_size=1000):
+        """Numbers the documents of ``mongo_collection`` that have no sequence number yet.
+
+        Run it once after enabling the feed on a collection with documents, so clients
+        syncing from the start get them.  Returns how many documents were numbered.
+        """
+        numbered = 0
+        query = {self.sequence_field:{"$exists":False}}
+        while True:
+            object_ids = [document["_id"] for document in
+                          mongo_collection.find(query, {"_id":1}).limit(batch_size)]
+            if not object_ids:
+                return numbered
+            sequences = self.next_sequences(collection_name, len(object_ids))
+            mongo_collection.bulk_write([
+                UpdateOne({"_id":object_id, self.sequence_field:{"$exists":False}},
+                          {"$set":{self.sequence_field:sequence}})
+                for object_id, sequence in zip(object_ids, sequences)], ordered=False)
+            numbered += len(object_ids)
@@ -0,0 +1,378 @@
+import itertools
+import numbers
+import re
+import threading
+
+from jsonschema import Draft4Validator
+
+
+class SchemaCompileError(Exception):
+    """Raised when a schema uses keywords the code generator does not support."""
+
+
+class SchemaValidator(object):
+    """Validates instances against ``schema`` using a ``Draft4Validator`` built once.
+
+    :param schema dict: JSONSchema v4 that has been loaded into a python dictionary.
+    """
+    def __init__(self, schema):
+        self.schema = schema
+        self.draft4_validator = Draft4Validator(schema)
+
+    def iter_errors(self, instance):
+        """Yields the message of every validation error for ``instance``."""
+        for error in self.draft4_validator.iter_errors(instance):
+            yield error.message
+
+
+class GeneratedValidator(SchemaValidator):
+    """Validates instances using python code generated from ``schema``.
+
+    The generated function only answers whether ``instance`` is valid.  When it is
+    not, the errors are collected by ``Draft4Validator`` so that the error list is
+    exactly the same as with ``SchemaValidator``.
+
+    Raises ``SchemaCompileError`` if the schema cannot be compiled.
+
+    :param is_valid function: (Optional) Function already compiled from ``schema``,
+        like one from ``load_compiled_schema``.
+    """
+    def __init__(self, schema, is_valid=None):
+        super().__init__(schema)
+        if is_valid is None:
+            is_valid = compile_schema(schema)
+        self.is_valid = is_valid
+
+    def iter_errors(self, instance):
+        if self.is_valid(instance):
+            return iter(())
+        return super().iter_errors(instance)
+
+
+class ValidatorCache(object):
+    """Caches validators keyed by schema identity, shared by every resource."""
+    def __init__(self):
+        self._validators = {}
+        self._lock = threading.Lock()
+
+    def get(self, schema, generated=False):
+        """Returns a validator for ``schema``, building it on first use.
+
+        :param schema dict: JSONSchema v4 dictionary.  The same dictionary object
+            must be passed on every call for the cache to hit.
+        :param generated bool: (Optional) Use a ``GeneratedValidator`` when the schema
+            can be compiled, falling back to ``SchemaValidator`` otherwise.
+        """
+        key = (id(schema), generated)
+        entry = self._validators.get(key)
+        # The schema is kept in the entry so its id can not be reused
+        if entry is not None and entry[0] is schema:
+            return entry[1]
+        with self._lock:
+            entry = self._validators.get(key)
+            if entry is None or entry[0] is not schema:
+                entry = (schema, self._build_validator(schema, generated))
+                self._validators[key] = entry
+        return entry[1]
+
+    def _build_validator(self, schema, generated):
+        if generated:
+            try:
+                return GeneratedValidator(schema)
+            except SchemaCompileError:
+                pass
+        return SchemaValidator(schema)
+
+    def add(self, schema, validator, generated=False):
+        """Stores a validator built ahead of time, like the ones of a compiled RAML artifact."""
+        with self._lock:
+            self._validators[(id(schema), generated)] = (schema, validator)
+
+    def clear(self):
+        with self._lock:
+            self._validators.clear()
+
+    def __len__(self):
+        return len(self._validators)
+
+
+validator_cache = ValidatorCache()
+
+def get_validator(schema, generated=False):
+    return validator_cache.get(schema, generated=generated)
+
+
+VALIDATION_MODES = ("full", "capped", "fail-fast")
+
+def collect_errors(validator, instance, mode="full", max_errors=100):
+    """Returns the error messages for ``instance`` and the number of errors found.
+
+    Errors are generated lazily, so stopping early also stops validating.
+
+    :param mode str: (Optional) ``full`` returns every error, ``capped`` the first
+        ``max_errors`` and ``fail-fast`` the first one.  When ``capped`` stops early
+        one more error than returned is counted, the count is then a lower bound
+        rather than the total.
+    """
+    errors = validator.iter_errors(instance)
+    if mode == "full":
+        messages = list(errors)
+        return messages, len(messages)
+    limit = 1 if mode == "fail-fast" else max_errors
+    messages = list(itertools.islice(errors, limit))
+    error_count = len(messages)
+    if mode == "capped" and error_count == limit and next(errors, None) is not None:
+        error_count += 1
+    return messages, error_count
+
+_STRUCTURE_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+def get_structure_errors(instance, schema, check_type=True, check_required=False,
+                         max_depth=None, max_nodes=None):
+    """Returns the error messages of cheap checks run before evaluating ``schema``.
+
+    Checks the type and required properties of ``instance`` itself, then walks it
+    to reject bodies nested deeper than ``max_depth`` or holding more than
+    ``max_nodes`` values, stopping as soon as a limit is exceeded.  Messages never
+    include ``instance``, so their size does not depend on it.
+    """
+    types = schema.get("type")
+    if isinstance(types, str):
+        types = [types]
+    if check_type and types and all(type_name in _STRUCTURE_TYPES for type_name in types):
+        if not any(isinstance(instance, _STRUCTURE_TYPES[type_name]) and
+                   not (type_name != "boolean" and isinstance(instance, bool))
+                   for type_name in types):
+            return ["request body is not of type {0}".format(
+                ", ".join(repr(type_name) for type_name in types))]
+    if check_required and isinstance(instance, dict):
+        missing = [name for name in schema.get("required", []) if name not in instance]
+        if missing:
+            return ["{0!r} is a required property".format(name) for name in missing]
+    if max_depth is None and max_nodes is None:
+        return []
+    nodes = 0
+    stack = [(instance, 0)]
+    while stack:
+        value, depth = stack.pop()
+        nodes += 1
+        if max_nodes is not None and nodes > max_nodes:
+            return ["request body has more than {0} values".format(max_nodes)]
+        if isinstance(value, (dict, list)):
+            if max_depth is not None and depth > max_depth:
+                return ["request body is nested deeper than {0} levels".format(max_depth)]
+            children = value.values() if isinstance(value, dict) else value
+            stack.extend((child, depth + 1) for child in children)
+    return []
+
+
+# Keywords that never produce errors when no format checker is configured
+_ANNOTATION_KEYWORDS = frozenset([
+    "$schema", "id", "title", "description", "default", "format",
+    "example", "examples", "definitions",
+])
+
+_TYPE_CHECKS = {
+    "object": "isinstance({0}, dict)",
+    "array": "isinstance({0}, list)",
+    "string": "isinstance({0}, str)",
+    "integer": "(isinstance({0}, int) and not isinstance({0}, bool))",
+    "number": "(isinstance({0}, Number) and not isinstance({0}, bool))",
+    "boolean": "isinstance({0}, bool)",
+    "null": "{0} is None",
+}
+
+_ENUM_TYPES = (str, int, float, bool, type(None))
+
+
+def compile_schema(schema):
+    """Generates a python function returning whether an instance is valid against ``schema``.
+
+    Only a subset of Draft 4 is supported, anything else raises ``SchemaCompileError``.
+    The generated function may reject instances ``Draft4Validator`` accepts (for
+    example ``1.0`` for ``"integer"``), but never the other way around.
+    """
+    compiler = _SchemaCompiler()
+    return compiler.compile(schema)
+
+def load_compiled_schema(code, constants):
+    """Rebuilds a function from ``compile_schema`` out of its ``code`` and ``constants`` attributes.
+
+    ``code`` is the generated module's code object, ``constants`` the values it refers to.
+    """
+    namespace = {"Number": numbers.Number}
+    namespace.update(constants)
+    exec(code, namespace)
+    is_valid = namespace["is_valid"]
+    is_valid.code = code
+    is_valid.constants = constants
+    return is_valid
+
+
+class _SchemaCompiler(object):
+    def __init__(self):
+        self.lines = []
+        self.namespace = {"Number": numbers.Number}
+        self._var_count = 0
+        self._const_count = 0
+
+    def compile(self, schema):
+        self.lines.append("def is_valid(v0):")
+        self._compile_schema(schema, "v0", 1)
+        self.lines.append("    return True")
+        source = "\n".join(self.lines)
+        code = compile(source, "<schema {0}>".format(id(schema)), "exec")
+        exec(code, self.namespace)
+        is_valid = self.namespace["is_valid"]
+        is_valid.source = source
+        is_valid.code = code
+        is_valid.constants = dict((name, value) for name, value in self.namespace.items()
+                                  if name.startswith("C"))
+        return is_valid
+
+    def _new_var(self):
+        self._var_count += 1
+        return "v{0}".format(self._var_count)
+
+    def _constant(self, value):
+        self._const_count += 1
+        name = "C{0}".format(self._const_count)
+        self.namespace[name] = value
+        return name
+
+    def _emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def _fail_unless(self, indent, condition):
+        self._emit(indent, "if not ({0}):".format(condition))
+        self._emit(indent + 1, "return False")
+
+    def _compile_schema(self, schema, var, indent):
+        if not isinstance(schema, dict):
+            raise SchemaCompileError("schema must be an object")
+        for keyword, value in schema.items():
+            if keyword in _ANNOTATION_KEYWORDS:
+                continue
+            compile_keyword = getattr(self, "_keyword_" + keyword, None)
+            if compile_keyword is None:
+                raise SchemaCompileError("unsupported keyword: {0}".format(keyword))
+            compile_keyword(value, schema, var, indent)
+        # Keeps the generated block syntactically valid when it has no checks
+        self._emit(indent, "pass")
+
+    def _keyword_type(self, types, schema, var, indent):
+        if isinstance(types, str):
+            types = [types]
+        checks = []
+        for type_name in types:
+            if type_name not in _TYPE_CHECKS:
+                raise SchemaCompileError("unsupported type: {0!r}".format(type_name))
+            checks.append(_TYPE_CHECKS[type_name].format(var))
+        self._fail_unless(indent, " or ".join(checks))
+
+    def _keyword_properties(self, properties, schema, var, indent):
+        self._emit(indent, "if isinstance({0}, dict):".format(var))
+        for property_name, subschema in properties.items():
+            property_const = self._constant(property_name)
+            sub_var = self._new_var()
+            self._emit(indent + 1, "if {0} in {1}:".format(property_const, var))
+            self._emit(indent + 2, "{0} = {1}[{2}]".format(sub_var, var, property_const))
+            self._compile_schema(subschema, sub_var, indent + 2)
+        self._emit(indent + 1, "pass")
+
+    def _keyword_required(self, required, schema, var, indent):
+        required_const = self._constant(tuple(required))
+        self._emit(indent, "if isinstance({0}, dict):".format(var))
+        self._emit(indent + 1, "for key in {0}:".format(required_const))
+        self._emit(indent + 2, "if key not in {0}:".format(var))
+        self._emit(indent + 3, "return False")
+
+    def _keyword_additionalProperties(self, additional, schema, var, indent):
+        if "patternProperties" in schema:
+            raise SchemaCompileError("patternProperties is not supported")
+        known_const = self._constant(frozenset(schema.get("properties", {})))
+        if additional is True:
+            return
+        if additional is False:
+            self._emit(indent, "if isinstance({0}, dict):".format(var))
+            self._emit(indent + 1, "for key in {0}:".format(var))
+            self._emit(indent + 2, "if key not in {0}:".format(known_const))
+            self._emit(indent + 3, "return False")
+            return
+        key_var = self._new_var()
+        sub_var = self._new_var()
+        self._emit(indent, "if isinstance({0}, dict):".format(var))
+        self._emit(indent + 1, "for {0} in {1}:".format(key_var, var))
+        self._emit(indent + 2, "if {0} not in {1}:".format(key_var, known_const))
+        self._emit(indent + 3, "{0} = {1}[{2}]".format(sub_var, var, key_var))
+        self._compile_schema(additional, sub_var, indent + 3)
+
+    def _keyword_items(self, items, schema, var, indent):
+        if not isinstance(items, dict):
+            raise SchemaCompileError("only single schema items are supported")
+        sub_var = self._new_var()
+        self._emit(indent, "if isinstance({0}, list):".format(var))
+        self._emit(indent + 1, "for {0} in {1}:".format(sub_var, var))
+        self._compile_schema(items, sub_var, indent + 2)
+
+    def _keyword_enum(self, enum, schema, var, indent):
+        if not all(isinstance(value, _ENUM_TYPES) for value in enum):
+            raise SchemaCompileError("only scalar enum values are supported")
+        enum_const = self._constant(frozenset((type(value), value) for value in enum))
+        types_const = self._constant(_ENUM_TYPES)
+        self._fail_unless(indent, "isinstance({0}, {1}) and (type({0}), {0}) in {2}".format(
+            var, types_const, enum_const))
+
+    def _length_check(self, limit, var, indent, type_check, operator):
+        if not isinstance(limit, int):
+            raise SchemaCompileError("length limits must be integers")
+        self._emit(indent, "if {0} and len({1}) {2} {3!r}:".format(
+            type_check.format(var), var, operator, limit))
+        self._emit(indent + 1, "return False")
+
+    def _keyword_minLength(self, limit, schema, var, indent):
+        self._length_check(limit, var, indent, _TYPE_CHECKS["string"], "<")
+
+    def _keyword_maxLength(self, limit, schema, var, indent):
+        self._length_check(limit, var, indent, _TYPE_CHECKS["string"], ">")
+
+    def _keyword_minItems(self, limit, schema, var, indent):
+        self._length_check(limit, var, indent, _TYPE_CHECKS["array"], "<")
+
+    def _keyword_maxItems(self, limit, schema, var, indent):
+        self._length_check(limit, var, indent, _TYPE_CHECKS["array"], ">")
+
+    def _bound_check(self, bound, var, indent, operator):
+        if not isinstance(bound, (int, float)) or isinstance(bound, bool):
+            raise SchemaCompileError("bounds must be numbers")
+        self._emit(indent, "if {0} and {1} {2} {3!r}:".format(
+            _TYPE_CHECKS["number"].format(var), var, operator, bound))
+        self._emit(indent + 1, "return False")
+
+    def _keyword_minimum(self, minimum, schema, var, indent):
+        operator = "<=" if schema.get("exclusiveMinimum", False) else "<"
+        self._bound_check(minimum, var, indent, operator)
+
+    def _keyword_maximum(self, maximum, schema, var, indent):
+        operator = ">=" if schema.get("exclusiveMaximum", False) else ">"
+        self._bound_check(maximum, var, indent, operator)
+
+    def _keyword_exclusiveMinimum(self, exclusive, schema, var, indent):
+        if not isinstance(exclusive, bool):
+            raise SchemaCompileError("exclusiveMinimum must be a boolean")
+
+    def _keyword_exclusiveMaximum(self, exclusive, schema, var, indent):
+        if not isinstance(exclusive, bool):
+            raise SchemaCompileError("exclusiveMaximum must be a boolean")
+
+    def _keyword_pattern(self, pattern, schema, var, indent):
+        pattern_const = self._constant(re.compile(pattern))
+        self._emit(indent, "if {0} and not {1}.search({2}):".format(
+            _TYPE_CHECKS["string"].format(var), pattern_const, var))
+        self._emit(indent + 1, "return False")
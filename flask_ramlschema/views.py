@@ -1,17 +1,43 @@
+import concurrent.futures
 import json
 import logging
+import os
+import time
 
 from bson.objectid import ObjectId
 import bson.json_util
-from flask import abort, request, Response
+from flask import abort, g, has_request_context, request, Response, stream_with_context
 from flask.views import MethodView
-from jsonschema import Draft4Validator
 import pymongo
-import yaml
-
-from .errors import ValidationError, register_error_handlers
-from .json_encoder import JSONEncoder
-from .pagination import get_page
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .bulk import (
+    NDJSON_MIMETYPES, get_operation_errors, iter_ndjson_operations, operation_result,
+    parse_operations
+)
+from .compression import Compression
+from .conditional import body_etag, key_etag
+from .errors import ValidationError
+from .diagnostics import DiagnosticCollection
+from .filtering import (
+    get_filter_query, get_missing_indexes, get_properties, get_required_indexes, parse_field_list
+)
+from .ingestion import (
+    DEFAULT_MAX_BODY_SIZE, DEFAULT_MAX_BULK_BODY_SIZE, iter_body_chunks, iter_lines, read_body
+)
+from .metrics import TimedCollection, null_timer, phase_timer, timed_function
+from .pagination import (
+    CountCache, PageQuery, get_aggregate_page, get_count_arg, get_keyset_query,
+    get_keyset_sort_field, get_page, get_pagination_args
+)
+from .projection import get_projection, get_schema_fields, parse_fields
+from .raml import iter_resource_pairs, load_api, load_artifact, load_yaml, schema_cache
+from .serialization import StdlibSerializer, get_serializer
+from .streaming import iter_batches, iter_ndjson, iter_page_json
+from .sync import SyncTokenExpired, decode_sync_token
+from .writebehind import BufferFull, WriteFailed
+from .validation import VALIDATION_MODES, collect_errors, get_structure_errors, get_validator
 
 class APIView(MethodView):
     """Provides basic API utilities like validation and json decoding
@@ -60,6 +86,22 @@ class APIView(MethodView):
     You can generate jsonschema from example documents using `jsonschema.net <http://jsonschema.net/#/>`.
 
     """
+    generated_validators = False
+    serializer = StdlibSerializer()
+    metrics = None
+    diagnostics = None
+    max_body_size = None
+    compression = None
+    validation_mode = "full"
+    max_errors = 100
+    max_depth = None
+    max_nodes = None
+
+    def timed(self, phase):
+        """Returns a context manager timing ``phase`` of the request when ``metrics`` is set."""
+        if self.metrics is None:
+            return null_timer
+        return phase_timer(phase)
 
     def get_request_json(self, schema):
         """Reads the request body and decodes it as JSON, validating it against ``schema``.
@@ -69,22 +111,58 @@ class APIView(MethodView):
             ``errors.ValidationError`` is raised.  You can use ``errors.register_error_handlers``
             to register an error handler that will convert ``ValidationError`` instances into
             JSON responses.
+
+        Bodies over ``max_body_size`` bytes are rejected with 413, see ``read_request_body``.
         """
-        request_body = json.loads(request.data.decode("utf-8"))
-        errors = self.get_request_errors(request_body, schema)
+        with self.timed("read"):
+            request_data = self.read_request_body()
+        with self.timed("decode"):
+            request_body = self.serializer.loads(request_data)
+        with self.timed("validate"):
+            errors, error_count = self.find_request_errors(request_body, schema)
         if errors:
-            raise ValidationError(errors)
+            raise ValidationError(errors, error_count=error_count)
         return request_body
 
+    def read_request_body(self):
+        """Reads the request body, aborting with 413 once it is over ``max_body_size`` bytes.
+
+        The body is read from the request stream in chunks, so oversized bodies are
+        rejected from their ``Content-Length``, or after ``max_body_size`` bytes when
+        it is missing, without buffering the rest.
+        """
+        return read_body(request, self.max_body_size)
+
     def get_request_errors(self, request_body, schema):
-        validator = Draft4Validator(schema)
+        return self.find_request_errors(request_body, schema)[0]
+
+    def find_request_errors(self, request_body, schema):
+        """Returns the errors of ``request_body`` against ``schema``, and the number found.
+
+        ``validation_mode`` is ``full`` to return every error, ``capped`` for the first
+        ``max_errors`` or ``fail-fast`` for the first one, see ``validation.collect_errors``.
+        Before the schema is evaluated, bodies deeper than ``max_depth`` or with more
+        than ``max_nodes`` values are rejected.  Outside ``full`` mode so are bodies of
+        the wrong type, and in ``fail-fast`` mode bodies missing required properties.
+        """
+        mode = self.validation_mode
+        messages = get_structure_errors(
+            request_body, schema, check_type=mode != "full", check_required=mode == "fail-fast",
+            max_depth=self.max_depth, max_nodes=self.max_nodes)
+        if messages:
+            if mode == "fail-fast":
+                messages = messages[:1]
+            error_count = len(messages)
+        else:
+            validator = get_validator(schema, generated=self.generated_validators)
+            messages, error_count = collect_errors(validator, request_body, mode, self.max_errors)
         request_errors = []
-        for error in validator.iter_errors(request_body):
+        for message in messages:
             error_dict = {
-                "message":error.message
+                "message":message
             }
             request_errors.append(error_dict)
-        return request_errors
+        return request_errors, error_count
 
     def json_response(self, response_dict, response_obj=None, status=200):
         """Encodes ``response_dict`` as json, returning a response with the body set.
@@ -95,63 +173,285 @@ class APIView(MethodView):
         """
         if response_obj is None:
             response_obj = Response()
-        response_obj.data = JSONEncoder().encode(response_dict)
+        with self.timed("encode"):
+            response_obj.data = self.serializer.dumps(response_dict)
         response_obj.mimetype = "application/json"
         response_obj.status_code = 200
         return response_obj
 
+    def document_response(self, document):
+        """Like ``json_response``, but renames the mongo document's ``_id`` to ``id``.
+
+        ``document`` is not mutated, so it can be shared with a cache.
+        """
+        response_obj = Response()
+        with self.timed("encode"):
+            response_obj.data = self.serializer.dumps_document(document)
+        response_obj.mimetype = "application/json"
+        return response_obj
+
+    def page_response(self, page):
+        """Like ``json_response``, but renames ``_id`` to ``id`` in the items of ``page``
+        as they are encoded, see ``Serializer.dumps_page``.
+        """
+        response_obj = Response()
+        with self.timed("encode"):
+            response_obj.data = self.serializer.dumps_page(page)
+        response_obj.mimetype = "application/json"
+        return response_obj
+
+    def conditional_response(self, response_obj, etag=None, last_modified=None):
+        """Sets validators on ``response_obj`` and turns it into a 304 when the request matches.
+
+        :param response_obj flask.Response: Response to send when the client's copy is stale.
+        :param etag str: (Optional) Strong ETag, defaults to a hash of the response body.
+            Streamed responses without ``etag`` are returned unchanged.
+        :param last_modified datetime.datetime: (Optional) Value of ``Last-Modified``.
+        """
+        if etag is None:
+            if response_obj.is_streamed:
+                return response_obj
+            etag = body_etag(response_obj.get_data())
+        response_obj.set_etag(etag)
+        if last_modified is not None:
+            response_obj.last_modified = last_modified
+        return response_obj.make_conditional(request)
+
+    def not_modified(self, etag):
+        """Returns whether the request's ``If-None-Match`` matches ``etag``.
+
+        Comparison is weak, compressed responses send ``etag`` as a weak ETag.
+        """
+        return request.if_none_match.contains_weak(etag)
+
+    def not_modified_response(self, etag):
+        response_obj = Response(status=304)
+        response_obj.set_etag(etag)
+        return response_obj
+
+    def compress_response(self, response_obj, variants=None):
+        """Compresses ``response_obj`` for the request's ``Accept-Encoding`` when ``compression`` is set.
+
+        :param variants dict: (Optional) Compressed bodies by encoding, see
+            ``compression.Compression.compress_response``.
+        """
+        if self.compression is None:
+            return response_obj
+        with self.timed("compress"):
+            return self.compression.compress_response(
+                response_obj, self.compression.negotiate(request), variants)
+
+    def stream_response(self, fragments, mimetype="application/json"):
+        """Returns a streaming response that sends each string from ``fragments`` as it is produced.
+
+        :param fragments iterable: Strings making up the response body, like the output
+            of ``streaming.iter_page_json``.
+        :param mimetype str: (Optional) Mimetype of the response.
+        """
+        return Response(stream_with_context(fragments), mimetype=mimetype)
+
 class MongoView(APIView):
-    """Subclass of APIView that stores a connection to mongodb."""
+    """Subclass of APIView that stores a connection to mongodb.
+
+    The collection is resolved once and memoized, see ``collection_scope``.  Use
+    ``connections.MongoClientManager`` for a client per process with a configured pool.
+
+    :param collection_scope str: (Optional) How long a collection returned by
+        ``mongo_collection_func`` is reused: ``request`` (the default) for one request,
+        ``resource`` for the life of the process when the function does not depend on
+        the request, or ``None`` to call the function on every access.
+    """
+    collection_scopes = ("request", "resource", None)
+
     def __init__(self, *args, mongo_collection=None,
                  mongo_collection_func=None, mongo_collection_name=None,
-                 logger=None, **kwargs):
+                 logger=None, collection_scope="request", **kwargs):
         super().__init__(*args, **kwargs)
         if logger is None:
             logger = logging.getLogger(__name__)
         self.logger = logger
         self.mongo_collection_name = mongo_collection_name
         self._mongo_collection = mongo_collection
+        if collection_scope not in self.collection_scopes:
+            raise ValueError("collection_scope must be 'request', 'resource' or None")
+        self._resolved_collection = None
         if mongo_collection_func is not None:
             self._get_mongo_collection = mongo_collection_func
+            self.collection_scope = collection_scope
         else:
             if mongo_collection is None:
                 raise ValueError(
                     "Must specify either mongo_collection or mongo_collection_func"
                     )
             self._get_mongo_collection = self._default_get_mongo_collection
+            self.collection_scope = "resource"
 
     @property
     def mongo_collection(self):
-        return self._get_mongo_collection(self.mongo_collection_name)
+        """The collection, wrapped for ``diagnostics`` and ``metrics``, memoized for ``collection_scope``."""
+        if self.collection_scope == "resource":
+            resolved = self._resolved_collection
+            # Collections resolved before a fork belong to the parent's client
+            if resolved is None or resolved[0] != os.getpid():
+                resolved = (os.getpid(), self.resolve_mongo_collection())
+                self._resolved_collection = resolved
+            return resolved[1]
+        if self.collection_scope == "request" and has_request_context():
+            collections = g.setdefault("ramlschema_collections", {})
+            # The resource is kept in the entry so its id can not be reused
+            entry = collections.get(id(self))
+            if entry is None or entry[0] is not self:
+                entry = (self, self.resolve_mongo_collection())
+                collections[id(self)] = entry
+            return entry[1]
+        return self.resolve_mongo_collection()
+
+    def resolve_mongo_collection(self):
+        mongo_collection = self._get_mongo_collection(self.mongo_collection_name)
+        if self.diagnostics is not None:
+            mongo_collection = DiagnosticCollection(mongo_collection, self.diagnostics)
+        if self.metrics is not None:
+            return TimedCollection(mongo_collection)
+        return mongo_collection
 
     def _default_get_mongo_collection(self, mongo_collection_name):
         return self._mongo_collection
 
-    def find_one_or_404(self, query):
-        document = self.mongo_collection.find_one(query)
+    def find_one_or_404(self, query, projection=None):
+        document = self.mongo_collection.find_one(query, projection)
         if not document:
             abort(404)
         return document
 
 
 class RAMLResource(MongoView):
+    count_strategies = ("exact", "estimated", "cached")
+    page_engines = ("find", "aggregate")
+
     def __init__(self, collection_raml, item_raml, *args, 
-                 url_path=None, flask_app=None, **kwargs):
+                 url_path=None, flask_app=None, generated_validators=False,
+                 keyset_pagination=False, count_strategy="exact", count_cache_ttl=60,
+                 stream_lists=False, stream_batch_size=100, max_per_page=100,
+                 export_route=False, etags=False, etag_version_field=None,
+                 last_modified_field=None, change_counter=None, atomic_updates=False,
+                 version_field=None, bulk_route=False, bulk_batch_size=500, item_cache=None,
+                 serializer=None, metrics=None, index_check="warn", diagnostics=None,
+                 sort_allowlist=None, max_body_size=None,
+                 max_bulk_body_size=DEFAULT_MAX_BULK_BODY_SIZE, compression=None,
+                 validation_mode="full", max_errors=100, max_depth=None, max_nodes=None,
+                 page_engine="find", change_feed=None, single_flight=None, write_behind=None,
+                 **kwargs):
         super().__init__(*args, **kwargs)
+        if compression is True:
+            compression = Compression()
+        self.compression = compression or None
+        if validation_mode not in VALIDATION_MODES:
+            raise ValueError("validation_mode must be one of {0}".format(", ".join(VALIDATION_MODES)))
+        self.validation_mode = validation_mode
+        self.max_errors = max_errors
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.metrics = metrics
+        self.diagnostics = diagnostics
+        if serializer is not None:
+            if isinstance(serializer, str):
+                serializer = get_serializer(serializer)
+            self.serializer = serializer
+        self.generated_validators = generated_validators
+        self.keyset_pagination = keyset_pagination
+        self.stream_lists = stream_lists
+        self.stream_batch_size = stream_batch_size
+        self.max_per_page = max_per_page
+        self.export_route = export_route
+        if count_strategy not in self.count_strategies:
+            raise ValueError("count_strategy must be one of {0}".format(
+                ", ".join(self.count_strategies)))
+        self.count_strategy = count_strategy
+        if page_engine not in self.page_engines:
+            raise ValueError("page_engine must be one of {0}".format(", ".join(self.page_engines)))
+        self.page_engine = page_engine
+        self.count_cache = CountCache(count_cache_ttl)
+        self.etags = etags
+        self.etag_version_field = etag_version_field
+        self.last_modified_field = last_modified_field
+        self.change_counter = change_counter
+        self.atomic_updates = atomic_updates
+        self.version_field = version_field
+        self.bulk_route = bulk_route
+        self.bulk_batch_size = bulk_batch_size
+        self.item_cache = item_cache
+        self.change_feed = change_feed
+        self.single_flight = single_flight
+        self.write_behind = write_behind
+        self.read_generation = 0
+        self.max_bulk_body_size = max_bulk_body_size
         self.parse_raml(collection_raml, item_raml)
+        if max_body_size is not None:
+            self.max_body_size = max_body_size
+        elif self.max_body_size is None:
+            self.max_body_size = DEFAULT_MAX_BODY_SIZE
+        if (self.filter_fields or change_feed is not None) and index_check:
+            self.startup_index_check(create=index_check == "create")
+        self.sort_allowlist = sort_allowlist
+        self.sortable_fields = None
+        if sort_allowlist is not None:
+            if sort_allowlist not in ("declared", "indexed"):
+                raise ValueError("sort_allowlist must be 'declared' or 'indexed'")
+            self.sortable_fields = set(["_id"] + self.sort_fields)
+            if sort_allowlist == "indexed":
+                self.startup_sortable_fields()
         if url_path:
             if not flask_app:
                 raise ValueError("If setting url_path must also provide flask_app")
             self.add_routes(url_path, flask_app)
 
     @classmethod
-    def from_files(cls, collection_raml_path, item_raml_path, *args, **kwargs):
-        collection_raml = cls.load_raml_file(collection_raml_path)
-        item_raml = cls.load_raml_file(item_raml_path)
+    def from_files(cls, collection_raml_path, item_raml_path, *args, artifact=None, **kwargs):
+        """Creates a resource from RAML files.
+
+        :param artifact str: (Optional) Path of an artifact from ``raml.compile_api``.
+            Files found in it are not parsed again, others are parsed with the YAML loader.
+        """
+        if isinstance(artifact, str):
+            artifact = load_artifact(artifact)
+        collection_raml = cls.load_raml_file(collection_raml_path, artifact)
+        item_raml = cls.load_raml_file(item_raml_path, artifact)
         # Not using as_view here because it instaniates the class on every request
         resource = cls(collection_raml, item_raml, *args, **kwargs)
         return resource
 
+    @classmethod
+    def from_api(cls, api_raml_path, flask_app, *args, mongo_database=None, artifact=None,
+                 **kwargs):
+        """Creates a resource for every collection of an ``api.raml`` and adds its routes.
+
+        The api and its includes are parsed once, resources with equal schemas share
+        their validators and schema bodies.  Returns the resources by url path.
+
+        :param mongo_database pymongo.database.Database: (Optional) Database holding a
+            collection named after the last part of every url path.  Without it, pass
+            ``mongo_collection_func``, it is called with that name.
+        :param artifact str: (Optional) Path of an artifact from ``raml.compile_api``,
+            used when the RAML files did not change since it was compiled.
+        """
+        if isinstance(artifact, str):
+            artifact = load_artifact(artifact)
+        if artifact is not None and artifact.is_current(api_raml_path):
+            api = artifact.api
+        else:
+            api = load_api(api_raml_path)
+        resources = {}
+        for url_path, collection_raml, item_raml in iter_resource_pairs(api):
+            resource_name = url_path.split("/")[-1]
+            resource_kwargs = dict(kwargs)
+            if mongo_database is not None:
+                resource_kwargs["mongo_collection"] = mongo_database[resource_name]
+            else:
+                resource_kwargs["mongo_collection_name"] = resource_name
+            resources[url_path] = cls(collection_raml, item_raml, *args, url_path=url_path,
+                                      flask_app=flask_app, **resource_kwargs)
+        return resources
+
     def add_routes(self, url_path, flask_app):
         while url_path.endswith("/"):
             url_path = url_path[:-1]
@@ -167,7 +467,7 @@ class RAMLResource(MongoView):
         flask_app.add_url_rule(
             url_path_collection, 
             endpoint=collection_endpoint_name,
-            view_func=self.dispatch_request,
+            view_func=self.instrument(self.dispatch_request, collection_endpoint_name),
             methods=["GET", "POST"],
             defaults={"item_id":None}
             )
@@ -177,53 +477,149 @@ class RAMLResource(MongoView):
         flask_app.add_url_rule(
             url_path_item, 
             endpoint=item_endpoint_name, 
-            view_func=self.dispatch_request,
+            view_func=self.instrument(self.dispatch_request, item_endpoint_name),
             methods=["GET", "POST", "DELETE"]
             )
         url_path_new_schema = "{0}-new-schema.json".format(url_path)
         flask_app.add_url_rule(
             url_path_new_schema,
             endpoint=resource_name + "_new_schema",
-            view_func=self.new_schema_view,
+            view_func=self.instrument(self.new_schema_view, resource_name + "_new_schema"),
             methods=["GET"]
             )
         url_path_update_schema = "{0}-update-schema.json".format(url_path)
         flask_app.add_url_rule(
             url_path_update_schema,
             endpoint=resource_name + "_item_schema",
-            view_func=self.update_schema_view,
+            view_func=self.instrument(self.update_schema_view, resource_name + "_item_schema"),
             methods=["GET"]
             )
-
+        if self.export_route:
+            url_path_export = "{0}-export.ndjson".format(url_path)
+            flask_app.add_url_rule(
+                url_path_export,
+                endpoint=resource_name + "_export",
+                view_func=self.instrument(self._export_view, resource_name + "_export"),
+                methods=["GET"]
+                )
+        if self.bulk_route:
+            url_path_bulk = "{0}/_bulk".format(url_path)
+            self.logger.info("Adding url rule for {0} at {1}".format(
+                resource_name + "_bulk", url_path_bulk)
+                )
+            flask_app.add_url_rule(
+                url_path_bulk,
+                endpoint=resource_name + "_bulk",
+                view_func=self.instrument(self._bulk_view, resource_name + "_bulk"),
+                methods=["POST"]
+                )
+        if self.change_feed is not None:
+            url_path_changes = "{0}/_changes".format(url_path)
+            self.logger.info("Adding url rule for {0} at {1}".format(
+                resource_name + "_changes", url_path_changes)
+                )
+            flask_app.add_url_rule(
+                url_path_changes,
+                endpoint=resource_name + "_changes",
+                view_func=self.instrument(self._changes_view, resource_name + "_changes"),
+                methods=["GET"]
+                )
+
+
+    def instrument(self, view_func, endpoint):
+        """Wraps ``view_func`` to compress its responses with ``compression`` and time its
+        requests with ``metrics``, returning it unchanged when both are disabled."""
+        if self.compression is not None:
+            view_func = self.compression.wrap(view_func, lambda: self.timed("compress"))
+        if self.metrics is None:
+            return view_func
+        return self.metrics.instrument(view_func, endpoint)
 
     def parse_raml(self, collection_raml, item_raml):
+        self.new_item_schema = None
+        self.update_item_schema = None
         self.parse_raml_collection(collection_raml)
         self.parse_raml_item(item_raml)
+        self.allowed_fields = get_schema_fields(self.new_item_schema, self.update_item_schema)
+        self.properties = get_properties(self.new_item_schema, self.update_item_schema)
+        for field in self.filter_fields + self.sort_fields:
+            if self.allowed_fields and field != "_id" and field not in self.allowed_fields:
+                raise ValueError("{0} is not a property of the schemas".format(field))
+        # The schemas never change after startup, so their responses are encoded once
+        self.new_schema_body, self.new_schema_etag = schema_cache.get_body(
+            self.new_item_schema, self.serializer)
+        self.update_schema_body, self.update_schema_etag = schema_cache.get_body(
+            self.update_item_schema, self.serializer)
 
     @classmethod
-    def load_raml_file(cls, raml_file_path):
-        with open(raml_file_path, "r") as raml_handle:
-            raml = yaml.load(raml_handle.read())
-            return raml
+    def load_raml_file(cls, raml_file_path, artifact=None):
+        with open(raml_file_path, "rb") as raml_handle:
+            data = raml_handle.read()
+        if artifact is not None:
+            raml = artifact.get_document(data)
+            if raml is not None:
+                return raml
+        return load_yaml(data)
 
     def parse_raml_collection(self, collection_raml):
         if "collection" in collection_raml["type"]:
             self.collection_type = "collection"
-            self.new_item_schema = json.loads(collection_raml["type"][self.collection_type]["newItemSchema"])
+            self.new_item_schema = self.load_schema(
+                collection_raml["type"][self.collection_type]["newItemSchema"])
+            self.new_item_validator = self.compile_validator(self.new_item_schema)
         elif "read-only-collection" in collection_raml["type"]:
             self.collection_type = "read-only-collection"
         else:
             raise ValueError("Must be of type 'collection' or 'read-only-collection")
-        
+        type_params = collection_raml["type"][self.collection_type] or {}
+        self.list_default_projection = self.parse_default_fields(type_params)
+        self.filter_fields = parse_field_list(type_params.get("filterFields"))
+        self.sort_fields = parse_field_list(type_params.get("sortFields"))
+        self.max_body_size = self.parse_max_body_size(type_params)
 
     def parse_raml_item(self, item_raml):
         if "collection-item" in item_raml["type"]:
             self.item_type = "collection-item"
-            self.update_item_schema = json.loads(item_raml["type"][self.item_type]["updateItemSchema"])
+            self.update_item_schema = self.load_schema(
+                item_raml["type"][self.item_type]["updateItemSchema"])
+            self.update_item_validator = self.compile_validator(self.update_item_schema)
         elif "read-only-collection-item" in item_raml["type"]:
             self.item_type = "read-only-collection-item"
         else:
             raise ValueError("Must be of type 'collection-item' or 'read-only-collection-item'")
+        self.item_default_projection = self.parse_default_fields(
+            item_raml["type"][self.item_type])
+        if self.max_body_size is None:
+            self.max_body_size = self.parse_max_body_size(item_raml["type"][self.item_type])
+
+    def load_schema(self, schema):
+        """Decodes a schema parameter, sharing one dictionary between equal schemas.
+
+        Compiled artifacts hold schemas already decoded.
+        """
+        if isinstance(schema, str):
+            schema = json.loads(schema)
+        return schema_cache.intern(schema)
+
+    def parse_default_fields(self, type_params):
+        """Returns the projection for the ``defaultFields`` parameter of a resource type.
+
+        ``defaultFields`` is a comma separated list of fields, like the ``fields``
+        query parameter, returned when clients do not ask for specific fields.
+        """
+        if not type_params or "defaultFields" not in type_params:
+            return None
+        return parse_fields(type_params["defaultFields"])
+
+    def parse_max_body_size(self, type_params):
+        """Returns the ``maxBodySize`` parameter of a resource type in bytes, or ``None``."""
+        if not type_params or type_params.get("maxBodySize") is None:
+            return None
+        return int(type_params["maxBodySize"])
+
+    def compile_validator(self, schema):
+        """Builds the validator for ``schema`` once, so requests only hit the cache."""
+        return get_validator(schema, generated=self.generated_validators)
 
     def get(self, item_id):
         if item_id is None:
@@ -271,10 +667,61 @@ class RAMLResource(MongoView):
         if not self.create_allowed(document):
             abort(401)
             return
+        self.number_document(document)
+        if self.buffers_creates():
+            return self.buffered_create(document)
         self.create_view(document)
-        response = self.json_response(document)
+        if "id" in document:
+            self.invalidate_item(document["id"])
+        self.record_change()
+        response = self.json_response(self.strip_sequence_field(document))
         return response
 
+    def buffers_creates(self):
+        """Returns whether creates are queued in ``write_behind``.
+
+        Resources overriding ``create_view`` call it as usual, without buffering.
+        """
+        return self.write_behind is not None and not self.needs_create_view()
+
+    def needs_create_view(self):
+        """Returns whether ``create_view`` is overridden, so creates can not be batched."""
+        return type(self).create_view is not RAMLResource.create_view
+
+    def buffered_create(self, document):
+        """Queues a validated document in ``write_behind`` instead of calling ``create_view``.
+
+        The document gets its ``_id`` right away.  The response is a 202 once it is
+        queued, or a 200 once its batch is written with ``wait_for_commit``.  A full
+        queue is answered with 503, a failed write with 409 for duplicate keys, and 500
+        otherwise.
+        """
+        document.setdefault("_id", ObjectId())
+        response_document = dict(document)
+        response_document["id"] = str(document["_id"])
+        response_document = self.strip_sequence_field(response_document)
+        try:
+            # Batches are written outside of requests, without the metrics proxy
+            mongo_collection = self._get_mongo_collection(self.mongo_collection_name)
+            pending = self.write_behind.submit(mongo_collection, document)
+        except BufferFull:
+            abort(503)
+        # Counts and list ETags change once the document can be read
+        pending.add_done_callback(lambda pending: self.record_change())
+        if not self.write_behind.wait_for_commit:
+            response = self.json_response(response_document)
+            response.status_code = 202
+            return response
+        try:
+            with self.timed("mongo_write"):
+                pending.result(self.write_behind.commit_timeout)
+        except concurrent.futures.TimeoutError:
+            abort(503)
+        except WriteFailed as error:
+            # 11000 is a duplicate key error
+            abort(409 if error.code == 11000 else 500)
+        return self.json_response(response_document)
+
     def create_allowed(self, document):
         return True
 
@@ -288,22 +735,306 @@ class RAMLResource(MongoView):
             class MyAPIResource(RAMLResource):
                 def list_view(self):
                     return [{"id":1, myfield":"foo"}, {"id":2, myfield":"bar"}]
+
+        Returning a ``pagination.PageQuery`` instead of a cursor pages it with one
+        aggregation, like ``page_engine = "aggregate"`` does for the default list.
         """
-        find_cursor = self.mongo_collection.find()
+        if self.page_engine == "aggregate":
+            return PageQuery(self.list_query(), self.list_projection())
+        find_cursor = self.mongo_collection.find(self.list_query(), self.list_projection())
         return find_cursor
 
+    def list_query(self):
+        """Returns the filter used by the default ``list_view``.
+
+        Overrides of ``list_view`` should include this filter when ``keyset_pagination``
+        is enabled, it holds the range query for the ``cursor`` token.
+        """
+        query = self.filter_query()
+        if self.keyset_pagination:
+            keyset_query = get_keyset_query(request)
+            if set(keyset_query) & set(query):
+                return {"$and":[query, keyset_query]}
+            query.update(keyset_query)
+        return query
+
+    def filter_query(self):
+        """Returns the query for the filter parameters of the request.
+
+        Only fields listed in the ``filterFields`` parameter of the collection RAML,
+        like ``filterFields: breed, age``, can be filtered.
+        """
+        if not self.filter_fields:
+            return {}
+        return get_filter_query(request.args, self.filter_fields, self.properties)
+
+    def startup_index_check(self, create=False):
+        try:
+            self.check_indexes(create=create)
+        except Exception:
+            self.logger.warning("Could not check the indexes of {0}".format(
+                self.mongo_collection_name or "the collection"), exc_info=True)
+
+    def check_indexes(self, create=False):
+        """Checks that an index supports every ``filterFields`` and ``sortFields`` combination.
+
+        Missing indexes are logged, or created when ``create`` is set.  Runs at startup
+        when ``index_check`` is ``warn`` or ``create``.  Returns the missing index keys.
+        """
+        mongo_collection = self.mongo_collection
+        missing = get_missing_indexes(
+            mongo_collection.index_information(), self.required_indexes())
+        for keys in missing:
+            if create:
+                self.logger.info("Creating index {0} on {1}".format(keys, mongo_collection.full_name))
+                mongo_collection.create_index([(field, pymongo.ASCENDING) for field in keys])
+            else:
+                self.warn_missing_index(mongo_collection, keys)
+        return missing
+
+    def required_indexes(self):
+        """Returns the index keys ``check_indexes`` looks for, see ``get_required_indexes``."""
+        required = get_required_indexes(self.filter_fields, self.sort_fields)
+        if self.change_feed is not None:
+            required.append([self.change_feed.sequence_field])
+        return required
+
+    def warn_missing_index(self, mongo_collection, keys):
+        self.logger.warning("No index on {0} starts with {1}, filtering or sorting "
+                            "on them scans the collection".format(mongo_collection.full_name, keys))
+
+    def list_projection(self):
+        """Returns the projection for the ``fields`` query parameter of list requests.
+
+        Defaults to the ``defaultFields`` of the collection RAML, ``None`` returns every field.
+        """
+        projection = get_projection(request, self.list_default_projection, self.allowed_fields)
+        if projection is not None and self.keyset_pagination:
+            # Cursor tokens are built from the sort field
+            projection = dict(projection)
+            projection[get_keyset_sort_field(request)] = 1
+        return self.hide_sequence_field(projection)
+
     def _list_view(self):
         if not self.list_allowed():
             abort(401)
             return
+        list_etag = self.get_list_etag()
+        if list_etag is not None and self.not_modified(list_etag):
+            return self.not_modified_response(list_etag)
+        self.check_sort_arg()
+        if self.single_flight is not None and not self.stream_lists:
+            body = self.single_flight.do(self.single_flight_key("list"), self.encode_list_page)
+            response = Response(response=body, mimetype="application/json")
+        else:
+            response = self.list_response()
+        if self.etags:
+            response = self.conditional_response(response, list_etag)
+        return response
+
+    def list_response(self):
+        """Reads the page from ``list_view`` and returns its response, streamed with ``stream_lists``."""
         find_cursor = self.list_view()
-        page = get_page(find_cursor)
-        response = self.json_response(page)
+        counter = self.count_entries
+        if self.metrics is not None:
+            counter = timed_function("mongo_count", counter)
+        start = time.perf_counter()
+        with self.timed("mongo_find"):
+            if isinstance(find_cursor, PageQuery):
+                page = self.get_query_page(find_cursor)
+            else:
+                page = get_page(find_cursor, keyset=self.keyset_pagination, counter=counter,
+                                stream=self.stream_lists, max_per_page=self.max_per_page,
+                                rename_id=False)
+        if self.diagnostics is not None and self.aggregates_page(find_cursor):
+            self.record_list_query(time.perf_counter() - start)
+        if self.stream_lists:
+            if hasattr(find_cursor, "batch_size"):
+                find_cursor.batch_size(self.stream_batch_size)
+            fragments = iter_page_json(page, serializer=self.serializer,
+                                       batch_size=self.stream_batch_size)
+            response = self.stream_response(fragments)
+        else:
+            response = self.page_response(page)
         return response
 
+    def encode_list_page(self):
+        return self.list_response().get_data()
+
+    def get_query_page(self, page_query):
+        """Returns the page of a ``PageQuery`` from ``list_view``.
+
+        Page numbers are answered by ``pagination.get_aggregate_page`` in one round
+        trip, counting in the same aggregation with the ``exact`` count strategy.
+        Keyset pages are read with ``find``, they are one query already.
+        """
+        mongo_collection = page_query.mongo_collection or self.mongo_collection
+        if self.keyset_pagination and "page" not in request.args:
+            find_cursor = mongo_collection.find(page_query.query, page_query.projection)
+            return get_page(find_cursor, keyset=True, max_per_page=self.max_per_page,
+                            rename_id=False)
+        count = get_count_arg(request)
+        total_entries = None
+        if count and self.count_strategy == "estimated" and not page_query.query:
+            total_entries = mongo_collection.estimated_document_count()
+            count = False
+        elif count and self.count_strategy == "cached":
+            count_key = {"collection":mongo_collection.full_name, "query":page_query.query}
+            total_entries = self.count_cache.get(
+                count_key, lambda: mongo_collection.count_documents(page_query.query))
+            count = False
+        return get_aggregate_page(mongo_collection, page_query.query, page_query.projection,
+                                  count=count, total_entries=total_entries,
+                                  max_per_page=self.max_per_page)
+
+    def check_sort_arg(self):
+        """Rejects a ``sort_by`` outside ``sortable_fields`` with a 400, when ``sort_allowlist`` is set.
+
+        With ``declared`` the ``sortFields`` of the collection RAML and ``id`` are
+        allowed, ``indexed`` also allows the first field of every index.  With
+        ``keyset_pagination`` the sort of a ``cursor`` token is checked too, and
+        without ``sort_allowlist`` keyset pages can only be sorted by ``id``,
+        ``sortFields`` and fields of the schemas, see ``is_sortable``.
+        """
+        if self.sortable_fields is None and not self.keyset_pagination:
+            return
+        sort_by = request.args.get("sort_by", "id")
+        if sort_by == "id":
+            sort_by = "_id"
+        if self.keyset_pagination:
+            try:
+                # Tokens carry the sort of the page they were made for
+                sort_by = get_keyset_sort_field(request)
+            except ValueError as error:
+                raise ValidationError([{"message":str(error)}], status_code=400,
+                                      description="Invalid cursor")
+        if not self.is_sortable(sort_by):
+            raise ValidationError([{"message":"can not sort by {0}".format(
+                "id" if sort_by == "_id" else sort_by)}], status_code=400, description="Invalid sort")
+
+    def is_sortable(self, field):
+        """Returns whether list pages can be sorted by ``field``.
+
+        Keyset pages add their sort field to the projection and to the query of
+        cursor tokens, so it must be a field clients can select with ``fields``.
+        """
+        if self.sortable_fields is not None:
+            return field in self.sortable_fields
+        if not self.keyset_pagination or field == "_id" or field in self.sort_fields:
+            return True
+        return not self.allowed_fields or field.split(".")[0] in self.allowed_fields
+
+    def startup_sortable_fields(self):
+        try:
+            self.refresh_sortable_fields()
+        except Exception:
+            self.logger.warning("Could not read the indexes of {0}, only declared sortFields "
+                                "are sortable".format(self.mongo_collection_name or "the collection"),
+                                exc_info=True)
+
+    def refresh_sortable_fields(self):
+        index_information = self._get_mongo_collection(self.mongo_collection_name).index_information()
+        self.sortable_fields = set(["_id"] + self.sort_fields)
+        self.sortable_fields.update(index["key"][0][0] for index in index_information.values())
+
+    def list_sort(self):
+        """Returns the sort of the list request as ``(field, direction)`` pairs."""
+        page_num, per_page, sort_by, order, order_arg = get_pagination_args(
+            request, max_per_page=self.max_per_page)
+        if self.keyset_pagination and "page" not in request.args and sort_by != "_id":
+            return [(sort_by, order), ("_id", order)]
+        return [(sort_by, order)]
+
+    def aggregates_page(self, find_cursor):
+        """Returns whether the page of what ``list_view`` returned is read with an aggregation."""
+        return (isinstance(find_cursor, PageQuery) and
+                not (self.keyset_pagination and "page" not in request.args))
+
+    def record_list_query(self, seconds, explain=True):
+        """Records the shape of the list query with ``diagnostics``.
+
+        Called for pages read with an aggregation, ``find`` cursors are recorded by
+        ``diagnostics.DiagnosticCollection``.
+        """
+        mongo_collection = self._get_mongo_collection(self.mongo_collection_name)
+        query = self.list_query()
+        projection = self.list_projection()
+        sort = self.list_sort()
+        explain_func = None
+        if explain:
+            per_page = get_pagination_args(request, max_per_page=self.max_per_page)[1]
+            explain_func = lambda: mongo_collection.find(query, projection).sort(
+                sort).limit(per_page).explain()
+        self.diagnostics.record(mongo_collection.full_name, "find", query, sort=sort,
+                                projection=projection, seconds=seconds, explain_func=explain_func)
+
+    def get_list_etag(self):
+        if self.etags and self.change_counter is not None:
+            return self.list_etag()
+        return None
+
+    def list_etag(self):
+        """Returns the ETag of the list page for the request, built from ``change_counter``.
+
+        The page is not queried, so the ETag only changes with writes through resources
+        sharing ``change_counter``.
+        """
+        collection_name = self.mongo_collection.full_name
+        change_count = self.change_counter.get(collection_name)
+        return key_etag(collection_name, change_count, request.query_string.decode("utf-8"))
+
+    def count_entries(self, find_cursor):
+        """Returns the total number of entries for the list page, or ``None`` to skip it.
+
+        Uses ``count_strategy``:
+
+        * ``exact`` counts ``find_cursor`` on every request.
+        * ``estimated`` uses the collection metadata when ``list_query`` is unfiltered,
+          and ``count_documents`` otherwise.
+        * ``cached`` reuses the ``count_documents`` of the same ``list_query`` for
+          ``count_cache_ttl`` seconds, writes through this resource clear the cache.
+
+        Clients can skip counting with the ``count=none`` query parameter.  Overrides of
+        ``list_view`` that filter beyond ``list_query`` should use ``exact``.
+        """
+        if not get_count_arg(request):
+            return None
+        if self.count_strategy == "exact":
+            return find_cursor.count()
+        query = self.list_query()
+        mongo_collection = self.mongo_collection
+        if self.count_strategy == "estimated":
+            if not query:
+                return mongo_collection.estimated_document_count()
+            return mongo_collection.count_documents(query)
+        count_key = {"collection":mongo_collection.full_name, "query":query}
+        return self.count_cache.get(count_key, lambda: mongo_collection.count_documents(query))
+
     def list_allowed(self):
         return True
 
+    def export_view(self):
+        """Returns the documents for the NDJSON export endpoint, every document by default.
+
+        Override this to limit or filter exports.  Only registered when ``export_route``
+        is set, documents are read in batches of ``stream_batch_size``.
+        """
+        find_cursor = self.mongo_collection.find({}, self.hide_sequence_field(None))
+        find_cursor.sort("_id", pymongo.ASCENDING).batch_size(self.stream_batch_size)
+        return find_cursor
+
+    def _export_view(self):
+        if not self.export_allowed():
+            abort(401)
+            return
+        documents = self.export_view()
+        fragments = iter_ndjson(documents, serializer=self.serializer,
+                                batch_size=self.stream_batch_size)
+        return self.stream_response(fragments, mimetype="application/x-ndjson")
+
+    def export_allowed(self):
+        return self.list_allowed()
+
 
     def item_view(self, document_id):
         """Responds with details about a specific item.
@@ -313,18 +1044,156 @@ class RAMLResource(MongoView):
         :param document_id string:  ID of the document to display, from url parameter
         """
         object_id = ObjectId(document_id)
-        return self.find_one_or_404({"_id":object_id})
+        return self.find_one_or_404({"_id":object_id}, self.item_projection())
+
+    def item_projection(self):
+        """Returns the projection for the ``fields`` query parameter of item requests.
+
+        Defaults to the ``defaultFields`` of the item RAML, ``None`` returns every field.
+        """
+        projection = get_projection(request, self.item_default_projection, self.allowed_fields)
+        return self.hide_sequence_field(projection)
 
     def _item_view(self, document_id):
         if not self.item_view_allowed(document_id):
             abort(401)
             return
+        response = self.cached_item_response(document_id)
+        if response is not None:
+            return response
+        if self.single_flight is not None:
+            entry = self.single_flight.do(self.single_flight_key("item", document_id),
+                                          lambda: self.read_item_entry(document_id))
+            return self.item_entry_response(entry)
+        generation = self.read_generation
+        document = self.item_view(document_id)
+        response = self.item_response(document_id, document)
+        self.store_item_response(document_id, response, generation)
+        return response
+
+    def item_cache_key(self, document_id):
+        return "{0}:{1}".format(self.mongo_collection.full_name, document_id)
+
+    def cached_item_response(self, document_id):
+        """Returns the response for ``document_id`` from ``item_cache``, or ``None`` on a miss.
+
+        Only requests without ``fields`` use the cache, the body is stored encoded so
+        hits skip mongo, BSON decoding and JSON encoding.  With ``compression`` the
+        compressed bodies are stored with it, so each is compressed once per encoding.
+        """
+        if self.item_cache is None or "fields" in request.args:
+            return None
+        cache_key = self.item_cache_key(document_id)
+        cached = self.item_cache.get(cache_key)
+        if cached is None:
+            return None
+        return self.item_entry_response(cached, cache_key)
+
+    def item_entry_response(self, entry, cache_key=None):
+        """Returns the response for an ``item_cache`` entry, answering conditional requests.
+
+        :param cache_key str: (Optional) Key ``entry`` is stored at, it is stored again
+            when a compressed body was added to it.
+        """
+        if entry is None:
+            return Response(status=404)
+        body, etag, last_modified, variants = entry
+        response = Response(response=body, mimetype="application/json")
+        if etag is not None:
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response = response.make_conditional(request)
+        if self.compression is not None:
+            variant_count = len(variants)
+            response = self.compress_response(response, variants)
+            if len(variants) != variant_count and cache_key is not None:
+                # Backends that copy values would not see the new variant otherwise
+                self.item_cache.set(cache_key, entry)
+        return response
+
+    def store_item_response(self, document_id, response, generation=None):
+        """Stores a 200 ``response`` in ``item_cache``.
+
+        :param generation int: (Optional) ``read_generation`` when the document was
+            read, nothing is stored when a write went through the resource since.
+        """
+        if self.item_cache is None or "fields" in request.args:
+            return
+        if generation is not None and generation != self.read_generation:
+            return
+        if response.status_code != 200:
+            return
+        etag = response.get_etag()[0] if self.etags else None
+        variants = {}
+        value = (response.get_data(), etag, response.last_modified, variants)
+        self.compress_response(response, variants)
+        self.item_cache.set(self.item_cache_key(document_id), value)
+
+    def read_item_entry(self, document_id):
+        """Reads ``document_id`` with ``item_view`` into an ``item_cache`` entry, stored in
+        ``item_cache``.  Returns ``None`` when ``item_view`` finds nothing.
+
+        Unlike ``item_response`` the entry does not depend on the request's validators,
+        so requests sharing it with ``single_flight`` each get their own 304 or 200.
+        """
+        generation = self.read_generation
         document = self.item_view(document_id)
+        if document is None:
+            return None
+        etag = None
+        last_modified = None
+        if self.etags:
+            if self.etag_version_field and self.etag_version_field in document:
+                etag = key_etag(document_id, document[self.etag_version_field],
+                                request.args.get("fields"))
+            if self.last_modified_field:
+                last_modified = document.get(self.last_modified_field)
+        body = self.document_response(document).get_data()
+        if etag is None and self.etags:
+            etag = body_etag(body)
+        entry = (body, etag, last_modified, {})
+        if (self.item_cache is not None and "fields" not in request.args and
+                generation == self.read_generation):
+            self.item_cache.set(self.item_cache_key(document_id), entry)
+        return entry
+
+    def single_flight_key(self, kind, document_id=None):
+        """Returns the key of a read shared by concurrent requests with ``single_flight``.
+
+        Requests share a read when they have the same query string and no write went
+        through the resource since the read started.  Override this to add what
+        ``list_view`` or ``item_view`` overrides depend on, like the user.
+
+        :param kind str: ``list`` or ``item``.
+        """
+        args = tuple(sorted(request.args.items(multi=True)))
+        return (id(self), self.read_generation, kind, document_id, args)
+
+    def invalidate_item(self, document_id):
+        """Removes ``document_id`` from ``item_cache``, called after every write to it."""
+        if self.item_cache is not None:
+            # Reads started before the write do not store what they read
+            self.read_generation += 1
+            self.item_cache.delete(self.item_cache_key(document_id))
+
+    def item_response(self, document_id, document):
+        """Encodes the ``document`` returned by ``item_view``, handling conditional requests."""
         if document is None:
             return Response(status=404)
-        document["id"] = document_id
-        del document["_id"]
-        response = self.json_response(document)
+        item_etag = None
+        last_modified = None
+        if self.etags:
+            if self.etag_version_field and self.etag_version_field in document:
+                item_etag = key_etag(document_id, document[self.etag_version_field],
+                                     request.args.get("fields"))
+                if self.not_modified(item_etag):
+                    return self.not_modified_response(item_etag)
+            if self.last_modified_field:
+                last_modified = document.get(self.last_modified_field)
+        response = self.document_response(document)
+        if self.etags:
+            response = self.conditional_response(response, item_etag, last_modified)
         return response
 
     def item_view_allowed(self, document_id):
@@ -344,18 +1213,94 @@ class RAMLResource(MongoView):
 
     def _update_view(self, document_id):
         object_id = ObjectId(document_id)
+        if self.atomic_updates and not self.needs_existing_document():
+            return self._atomic_update_view(object_id)
         existing_document = self.find_one_or_404({"_id":object_id})
         request_dict = self.get_request_json(self.update_item_schema)
         update_document = request_dict
         if not self.update_allowed(update_document, existing_document):
             abort(401)
             return
+        query, document = self.build_replacement(object_id, update_document, existing_document)
+        self.number_document(document)
+        replaced_document = self.mongo_collection.find_one_and_replace(query, document)
+        self.invalidate_item(document_id)
+        if self.version_field and replaced_document is None:
+            # Changed or deleted since it was read
+            abort(409)
+        self.record_change()
+        response = Response()
+        response.status_code = 204
+        return response
+
+    def build_replacement(self, object_id, update_document, existing_document):
+        """Returns the filter and the document from ``update_view`` replacing ``existing_document``.
+
+        With ``version_field`` the filter only matches the version that was read, and
+        a different version in ``update_document`` aborts with 409.
+        """
+        query = {"_id":object_id}
+        if self.version_field:
+            expected_version = update_document.pop(self.version_field, None)
+            current_version = existing_document.get(self.version_field)
+            if expected_version is not None and expected_version != current_version:
+                abort(409)
+            query[self.version_field] = current_version
         document = self.update_view(update_document, existing_document)
-        self.mongo_collection.find_one_and_replace({"_id":object_id}, document)
+        if self.version_field:
+            document[self.version_field] = (current_version or 0) + 1
+        return query, document
+
+    def needs_existing_document(self):
+        """Returns whether ``update_view`` or ``update_allowed`` are overridden.
+
+        Overrides are passed the existing document, so updates read it first even
+        when ``atomic_updates`` is set.
+        """
+        resource_class = type(self)
+        return (resource_class.update_view is not RAMLResource.update_view or
+                resource_class.update_allowed is not RAMLResource.update_allowed)
+
+    def _atomic_update_view(self, object_id):
+        """Applies the request body with a single ``$set``, without reading the document.
+
+        With ``version_field``, a version in the request body must match the stored
+        version or the update fails with 409, and every update increments it.
+        """
+        update_document = self.get_request_json(self.update_item_schema)
+        query, update = self.build_atomic_update(object_id, update_document)
+        if not update:
+            self.find_one_or_404(query, {"_id":1})
+        else:
+            if self.change_feed is not None:
+                self.number_document(update.setdefault("$set", {}))
+            result = self.mongo_collection.update_one(query, update)
+            if result.matched_count == 0:
+                if len(query) > 1 and self.mongo_collection.find_one({"_id":object_id}, {"_id":1}):
+                    abort(409)
+                abort(404)
+            self.invalidate_item(str(object_id))
+            self.record_change()
         response = Response()
         response.status_code = 204
         return response
 
+    def build_atomic_update(self, object_id, update_document):
+        """Returns the filter and the ``$set``/``$inc`` update applying ``update_document``.
+
+        The update is empty when there is nothing to write.
+        """
+        query = {"_id":object_id}
+        update = {}
+        if self.version_field:
+            expected_version = update_document.pop(self.version_field, None)
+            if expected_version is not None:
+                query[self.version_field] = expected_version
+            update["$inc"] = {self.version_field:1}
+        if update_document:
+            update["$set"] = update_document
+        return query, update
+
     def update_allowed(self, update_document, existing_document):
         return True
 
@@ -375,7 +1320,12 @@ class RAMLResource(MongoView):
             abort(404)
 
     def _delete_view(self, document_id):
-        self.delete_view(document_id)
+        try:
+            self.delete_view(document_id)
+        finally:
+            self.invalidate_item(document_id)
+        self.record_deletes([ObjectId(document_id)])
+        self.record_change()
         response = Response()
         response.status_code = 204
         return response
@@ -383,9 +1333,310 @@ class RAMLResource(MongoView):
     def delete_allowed(self, document_id):
         return True
 
+    def _bulk_view(self):
+        """Runs a batch of create, update and delete operations, see ``bulk.get_operation_errors``.
+
+        Each operation is validated and checked with the ``*_allowed`` hooks on its own,
+        then written with unordered ``bulk_write`` calls of ``bulk_batch_size``
+        operations.  The response lists a result for every operation in request order.
+        Bulk deletes do not call ``delete_view``.  When ``create_view`` is overridden it
+        is called for every bulk create instead of batching them.
+
+        NDJSON bodies are decoded line by line as they are received, so only one batch
+        is held in memory, lines over ``max_body_size`` bytes are rejected with 413.
+        Bodies over ``max_bulk_body_size`` bytes are rejected with 413, once batches
+        were written for NDJSON bodies without a ``Content-Length``.
+        """
+        if self.collection_type == "read-only-collection":
+            abort(405)
+        if request.mimetype in NDJSON_MIMETYPES:
+            lines = iter_lines(iter_body_chunks(request, self.max_bulk_body_size),
+                               self.max_body_size)
+            operations = iter_ndjson_operations(lines, loads=self.serializer.loads)
+        else:
+            operations = parse_operations(read_body(request, self.max_bulk_body_size),
+                                          request.mimetype, loads=self.serializer.loads)
+        results = []
+        for batch in iter_batches(operations, self.bulk_batch_size):
+            results.extend(self.bulk_write_batch(batch, len(results)))
+        error_count = sum(1 for result in results if result["status"] >= 400)
+        return self.json_response({"results":results, "errors":error_count})
+
+    def bulk_write_batch(self, operations, start_index=0):
+        """Validates and writes ``operations`` with one ``bulk_write``, returning their results."""
+        results = [None] * len(operations)
+        pending = []
+        for position, operation in enumerate(operations):
+            errors = get_operation_errors(operation)
+            if not errors and operation["op"] != "delete":
+                schema = self.new_item_schema if operation["op"] == "create" else self.update_item_schema
+                errors = self.get_request_errors(operation["document"], schema)
+            if errors:
+                results[position] = operation_result(
+                    start_index + position, operation, 422, errors=errors)
+            else:
+                pending.append(position)
+        existing_documents = self.get_bulk_existing_documents(
+            [operations[position] for position in pending])
+        sequences = iter(self.next_sequences(len(pending)))
+
+        write_ops = []
+        write_positions = []
+        # Version each update writes by position, None without version_field
+        update_versions = {}
+        created = False
+        for position in pending:
+            operation = operations[position]
+            index = start_index + position
+            op = operation["op"]
+            if op == "create":
+                document = operation["document"]
+                if not self.create_allowed(document):
+                    results[position] = operation_result(index, operation, 401)
+                    continue
+                self.number_document(document, next(sequences, None))
+                if self.needs_create_view():
+                    self.create_view(document)
+                    results[position] = operation_result(index, operation, 201, id=document.get("id"))
+                    created = True
+                    continue
+                document.setdefault("_id", ObjectId())
+                write_ops.append(InsertOne(document))
+                results[position] = operation_result(index, operation, 201, id=document["_id"])
+                write_positions.append(position)
+                continue
+            object_id = ObjectId(operation["id"])
+            existing_document = existing_documents.get(object_id)
+            if existing_document is None:
+                results[position] = operation_result(index, operation, 404, id=object_id)
+                continue
+            if op == "delete":
+                if not self.delete_allowed(operation["id"]):
+                    results[position] = operation_result(index, operation, 401, id=object_id)
+                    continue
+                write_ops.append(DeleteOne({"_id":object_id}))
+            else:
+                update_document = operation["document"]
+                if not self.update_allowed(update_document, existing_document):
+                    results[position] = operation_result(index, operation, 401, id=object_id)
+                    continue
+                if (not update_document and not self.version_field and
+                        not self.needs_existing_document()):
+                    # An empty $set is rejected by mongo
+                    results[position] = operation_result(index, operation, 204, id=object_id)
+                    continue
+                write_op = self.bulk_update_op(object_id, update_document, existing_document,
+                                               next(sequences, None))
+                if write_op is None:
+                    results[position] = operation_result(index, operation, 409, id=object_id)
+                    continue
+                write_ops.append(write_op)
+                update_versions[position] = None
+                if self.version_field:
+                    update_versions[position] = (existing_document.get(self.version_field) or 0) + 1
+            results[position] = operation_result(index, operation, 204, id=object_id)
+            write_positions.append(position)
+
+        if write_ops:
+            try:
+                matched_count = self.mongo_collection.bulk_write(write_ops, ordered=False).matched_count
+            except BulkWriteError as error:
+                matched_count = error.details.get("nMatched", 0)
+                for write_error in error.details.get("writeErrors", []):
+                    position = write_positions[write_error["index"]]
+                    # 11000 is a duplicate key error
+                    status = 409 if write_error.get("code") == 11000 else 500
+                    results[position] = operation_result(
+                        start_index + position, operations[position], status,
+                        errors=[{"message":write_error.get("errmsg", "write failed")}])
+            update_versions = dict((position, version) for position, version in update_versions.items()
+                                   if results[position]["status"] == 204)
+            if update_versions and matched_count < len(update_versions):
+                # Documents deleted or updated since they were read match nothing
+                for position, status in self.get_unmatched_updates(operations, update_versions).items():
+                    results[position] = operation_result(
+                        start_index + position, operations[position], status,
+                        id=ObjectId(operations[position]["id"]))
+            deleted_ids = []
+            for position in write_positions:
+                if operations[position]["op"] != "create":
+                    self.invalidate_item(operations[position]["id"])
+                if operations[position]["op"] == "delete" and results[position]["status"] == 204:
+                    deleted_ids.append(ObjectId(operations[position]["id"]))
+            self.record_deletes(deleted_ids)
+            self.record_change()
+        elif created:
+            self.record_change()
+        return results
+
+    def get_bulk_existing_documents(self, operations):
+        """Fetches the documents targeted by update and delete ``operations`` in one query.
+
+        Only ``_id`` and ``version_field`` are fetched, unless update overrides need
+        the whole document.
+        """
+        object_ids = [ObjectId(operation["id"]) for operation in operations
+                      if operation["op"] != "create"]
+        if not object_ids:
+            return {}
+        projection = None
+        if not self.needs_existing_document():
+            projection = {"_id":1}
+            if self.version_field:
+                projection[self.version_field] = 1
+        find_cursor = self.mongo_collection.find({"_id":{"$in":object_ids}}, projection)
+        with self.timed("mongo_find"):
+            return {document["_id"]:document for document in find_cursor}
+
+    def get_unmatched_updates(self, operations, update_versions):
+        """Returns the status of bulk updates that matched no document, by position.
+
+        Documents that are gone get a 404, and with ``version_field`` documents whose
+        version is not the one the update wrote get a 409.
+
+        :param update_versions dict: Version each update wrote by position in
+            ``operations``, ``None`` without ``version_field``.
+        """
+        object_ids = [ObjectId(operations[position]["id"]) for position in update_versions]
+        projection = {"_id":1}
+        if self.version_field:
+            projection[self.version_field] = 1
+        find_cursor = self.mongo_collection.find({"_id":{"$in":object_ids}}, projection)
+        with self.timed("mongo_find"):
+            documents = {document["_id"]:document for document in find_cursor}
+        statuses = {}
+        for position, version in update_versions.items():
+            document = documents.get(ObjectId(operations[position]["id"]))
+            if document is None:
+                statuses[position] = 404
+            elif self.version_field and document.get(self.version_field) != version:
+                statuses[position] = 409
+        return statuses
+
+    def bulk_update_op(self, object_id, update_document, existing_document, sequence=None):
+        """Returns the write for a bulk update, or ``None`` when its version conflicts.
+
+        :param sequence int: (Optional) Sequence number of the write, see ``number_document``.
+        """
+        query = {"_id":object_id}
+        current_version = None
+        if self.version_field:
+            expected_version = update_document.pop(self.version_field, None)
+            current_version = existing_document.get(self.version_field)
+            if expected_version is not None and expected_version != current_version:
+                return None
+            query[self.version_field] = current_version
+        if self.needs_existing_document():
+            document = self.update_view(update_document, existing_document)
+            if self.version_field:
+                document[self.version_field] = (current_version or 0) + 1
+            self.number_document(document, sequence)
+            return ReplaceOne(query, document)
+        update = {"$set":update_document}
+        if self.version_field:
+            update["$inc"] = {self.version_field:1}
+        self.number_document(update_document, sequence)
+        return UpdateOne(query, update)
+
+    def record_change(self):
+        """Called after every write through the resource.
+
+        Clears cached counts, updates can move documents in or out of filtered
+        counts, bumps ``change_counter`` so list ETags change, and starts new
+        ``single_flight`` reads.
+        """
+        self.count_cache.invalidate()
+        # Reads started before this write are not shared with later requests
+        self.read_generation += 1
+        if self.change_counter is not None:
+            self.change_counter.increment(self.mongo_collection.full_name)
+
+    def next_sequences(self, count=1):
+        """Reserves ``count`` sequence numbers of ``change_feed``, none without it."""
+        if self.change_feed is None or count == 0:
+            return []
+        return self.change_feed.next_sequences(self.mongo_collection.full_name, count)
+
+    def number_document(self, document, sequence=None):
+        """Stores the next sequence number of ``change_feed`` in a document about to be written.
+
+        Called before creates, replacements and updates, with the ``$set`` of updates.
+        """
+        if self.change_feed is None:
+            return
+        if sequence is None:
+            sequence = self.next_sequences()[0]
+        document[self.change_feed.sequence_field] = sequence
+
+    def hide_sequence_field(self, projection):
+        """Excludes the sequence numbers of ``change_feed`` from a projection of every field.
+
+        Projections of selected fields leave them out already.
+        """
+        if self.change_feed is None or projection is not None:
+            return projection
+        return {self.change_feed.sequence_field:0}
+
+    def strip_sequence_field(self, document):
+        """Returns a written document without the sequence number of ``change_feed``, to respond with."""
+        if self.change_feed is None or self.change_feed.sequence_field not in document:
+            return document
+        document = dict(document)
+        del document[self.change_feed.sequence_field]
+        return document
+
+    def record_deletes(self, object_ids):
+        """Stores tombstones in ``change_feed`` for documents deleted through the resource."""
+        if self.change_feed is not None:
+            self.change_feed.record_deletes(self.mongo_collection.full_name, object_ids)
+
+    def changes_projection(self):
+        """Returns the projection of documents in the changes feed, like ``list_projection``."""
+        return get_projection(request, self.list_default_projection, self.allowed_fields)
+
+    def _changes_view(self):
+        """Returns the documents created or updated and the ids deleted since the ``since``
+        sync token, see ``sync.ChangeFeed.changes``.
+
+        Without a token every numbered document is returned.  Clients pass ``next`` as
+        ``since`` until ``has_more`` is false, and keep it for their next sync.  Tokens
+        older than purged tombstones get a 410, the client must sync from the start.
+        """
+        if not self.changes_allowed():
+            abort(401)
+            return
+        try:
+            since = decode_sync_token(request.args.get("since"))
+            limit = int(request.args.get("limit", self.max_per_page))
+        except ValueError as error:
+            raise ValidationError([{"message":str(error)}], status_code=400,
+                                  description="Invalid changes request")
+        limit = max(1, min(limit, self.max_per_page))
+        try:
+            with self.timed("mongo_find"):
+                changes = self.change_feed.changes(
+                    self.mongo_collection, self.mongo_collection.full_name, since, limit,
+                    self.changes_projection())
+        except SyncTokenExpired:
+            raise ValidationError([{"message":"sync token expired, sync from the start"}],
+                                  status_code=410, description="Sync token expired")
+        return self.json_response(changes)
+
+    def changes_allowed(self):
+        return self.list_allowed()
+
 
     def new_schema_view(self):
-        return self.json_response(self.new_item_schema)
+        return self.schema_response(self.new_schema_body, self.new_schema_etag)
 
     def update_schema_view(self):
-        return self.json_response(self.update_item_schema)
\ No newline at end of file
+        return self.schema_response(self.update_schema_body, self.update_schema_etag)
+
+    def schema_response(self, schema_body, schema_etag):
+        if self.not_modified(schema_etag):
+            return self.not_modified_response(schema_etag)
+        response = Response(response=schema_body, mimetype="application/json")
+        response.set_etag(schema_etag)
+        if self.compression is not None:
+            response = self.compress_response(response, self.compression.variants(schema_etag))
+        return response
\ No newline at end of file
@@ -0,0 +1,210 @@
+import atexit
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Markers put in the queue among documents
+FLUSH = "flush"
+STOP = "stop"
+
+
+class BufferFull(Exception):
+    """The queue of a ``WriteBehind`` stayed full for ``enqueue_timeout`` seconds."""
+
+
+class WriteFailed(Exception):
+    """A buffered document could not be inserted.
+
+    :param code int: Mongo error code, ``11000`` for duplicate keys, ``None`` when
+        the whole batch failed.
+    """
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class WriteBehind(object):
+    """Buffers created documents and inserts them with ``insert_many`` from a background thread.
+
+    A batch is written once ``batch_size`` documents are queued, or ``flush_interval``
+    seconds after its first document.  Pass an instance to a resource with
+    ``RAMLResource(write_behind=...)``.  The thread is started by the first document
+    of each process, and the queue is flushed when the process exits.
+
+    :param batch_size int: (Optional) Most documents per ``insert_many``.
+    :param flush_interval float: (Optional) Seconds a document waits for others.
+    :param max_queue_size int: (Optional) Documents queued before ``submit`` blocks.
+    :param enqueue_timeout float: (Optional) Seconds ``submit`` blocks on a full queue
+        before raising ``BufferFull``.
+    :param wait_for_commit bool: (Optional) Resources respond once the batch is
+        written instead of once the document is queued.
+    :param commit_timeout float: (Optional) Seconds resources wait for the batch with
+        ``wait_for_commit``.
+    :param on_error function: (Optional) Called from the background thread with the
+        documents of a batch and the error when documents of it failed.
+    """
+    def __init__(self, batch_size=500, flush_interval=0.05, max_queue_size=10000,
+                 enqueue_timeout=0.5, wait_for_commit=False, commit_timeout=5.0, on_error=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self.wait_for_commit = wait_for_commit
+        self.commit_timeout = commit_timeout
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._exit_registered = False
+        self._stats = {"batches":0, "written":0, "failed":0, "failed_batches":0, "rejected":0}
+        self.last_error = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The parent's thread is not running in the child, its queue is left to the parent
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def submit(self, mongo_collection, document):
+        """Queues ``document`` for ``mongo_collection``, returning a ``Future`` of its ``_id``.
+
+        ``mongo_collection`` is used from the background thread, outside of requests.
+
+        The future fails with ``WriteFailed`` when the document is not written.
+        Raises ``BufferFull`` when the queue stays full.
+        """
+        future = concurrent.futures.Future()
+        try:
+            self.get_queue().put((mongo_collection, document, future), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise BufferFull()
+        return future
+
+    def get_queue(self):
+        """Returns the queue of the current process, starting its thread on first use."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._queue
+        with self._lock:
+            if self._pid != pid:
+                # Queues and threads of a parent process are not usable after fork
+                self._queue = queue.Queue(self.max_queue_size)
+                self._thread = threading.Thread(target=self.run, args=(self._queue,),
+                                                name="ramlschema-write-behind", daemon=True)
+                self._thread.start()
+                self._pid = pid
+                if not self._exit_registered:
+                    atexit.register(self.close)
+                    self._exit_registered = True
+            return self._queue
+
+    def run(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][0] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write_batch([item for item in batch if item[0] is not None])
+            for mongo_collection, marker, future in batch:
+                if mongo_collection is None:
+                    future.set_result(None)
+                    if marker == STOP:
+                        return
+
+    def write_batch(self, items):
+        """Inserts the queued ``(mongo_collection, document, future)`` items, one
+        ``insert_many`` per collection, and resolves their futures."""
+        collections = {}
+        for item in items:
+            # Collections compare equal by client, database and name
+            collections.setdefault(item[0], []).append(item)
+        for collection_items in collections.values():
+            mongo_collection = collection_items[0][0]
+            documents = [document for collection, document, future in collection_items]
+            errors = {}
+            try:
+                mongo_collection.insert_many(documents, ordered=False)
+            except BulkWriteError as error:
+                for write_error in error.details.get("writeErrors", []):
+                    errors[write_error["index"]] = WriteFailed(
+                        write_error.get("errmsg", "write failed"), write_error.get("code"))
+                self.report_error(documents, error)
+            except Exception as error:
+                errors = dict((index, WriteFailed(str(error))) for index in range(len(documents)))
+                self.report_error(documents, error)
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["written"] += len(documents) - len(errors)
+                self._stats["failed"] += len(errors)
+            for index, (collection, document, future) in enumerate(collection_items):
+                if index in errors:
+                    future.set_exception(errors[index])
+                else:
+                    future.set_result(document["_id"])
+
+    def report_error(self, documents, error):
+        self.last_error = str(error)
+        with self._lock:
+            self._stats["failed_batches"] += 1
+        logger.warning("Could not write {0} buffered documents".format(len(documents)),
+                       exc_info=error)
+        if self.on_error is not None:
+            try:
+                self.on_error(documents, error)
+            except Exception:
+                logger.exception("on_error failed")
+
+    def flush(self, timeout=None):
+        """Writes the documents queued so far, returning whether they were written in time."""
+        return self.send_marker(FLUSH, timeout)
+
+    def close(self, timeout=10.0):
+        """Writes the queued documents and stops the thread, called when the process exits."""
+        written = self.send_marker(STOP, timeout)
+        with self._lock:
+            if written:
+                self._pid = None
+                self._queue = None
+                self._thread = None
+        return written
+
+    def send_marker(self, marker, timeout):
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            return True
+        future = concurrent.futures.Future()
+        try:
+            self._queue.put((None, marker, future), timeout=timeout)
+            future.result(timeout)
+        except (queue.Full, concurrent.futures.TimeoutError):
+            return False
+        return True
+
+    def stats(self):
+        """Returns the number of queued documents, of ``batches``, of documents ``written``
+        and ``failed``, of batches with failures and of documents ``rejected`` as
+        ``BufferFull``."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize() if self._pid == os.getpid() else 0
+        stats["last_error"] = self.last_error
+        return stats
@@ -15,6 +15,11 @@ setup(
     author_email = "lwcolton@gmail.com",
     packages=find_packages(exclude=['tests']),
     install_requires = ["flask", "jsonschema", "pymongo", "pyyaml"],
+    extras_require = {"async": ["motor"], "orjson": ["orjson"], "brotli": ["brotli"],
+                      "zstd": ["zstandard"]},
+    entry_points = {
+        "console_scripts": ["flask-ramlschema-compile = flask_ramlschema.raml:main"],
+    },
 )
 
 
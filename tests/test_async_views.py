@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask, abort
+from flask_ramlschema.async_views import ASGIApp, AsyncRAMLResource
+from flask_ramlschema.errors import register_error_handlers
+
+
+class TestAsyncRAMLResource(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        self.collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        self.item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.flask_app = Flask("test_async_app")
+        register_error_handlers(self.flask_app)
+        self.resource = AsyncRAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=self.flask_app,
+            mongo_collection = self.mongo_collection
+            )
+        self.asgi_app = ASGIApp(self.flask_app)
+
+    def request(self, method, path, query_string=b"", body=b""):
+        messages = []
+        async def receive():
+            return {"type":"http.request", "body":body, "more_body":False}
+        async def send(message):
+            messages.append(message)
+        scope = {"type":"http", "method":method, "path":path, "query_string":query_string,
+                 "headers":[(b"content-type", b"application/json")]}
+        asyncio.run(self.asgi_app(scope, receive, send))
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        return messages[0]["status"], body
+
+    def test_list(self):
+        test_document_id = ObjectId()
+        find_cursor = self.mongo_collection.find.return_value
+        find_cursor.to_list = mock.AsyncMock(return_value=[{"_id":test_document_id, "name":"muffins"}])
+        self.mongo_collection.count_documents = mock.AsyncMock(return_value=1)
+        status, body = self.request("GET", "/cats", b"per_page=10")
+        self.assertEqual(status, 200)
+        response_dict = json.loads(body.decode("utf-8"))
+        self.assertEqual(response_dict["total_entries"], 1)
+        self.assertEqual(response_dict["items"], [{"id":str(test_document_id), "name":"muffins"}])
+        find_cursor.to_list.assert_called_once_with(10)
+        self.mongo_collection.count_documents.assert_called_once_with({})
+
+    def test_item_get(self):
+        test_document_id = ObjectId()
+        self.mongo_collection.find_one = mock.AsyncMock(
+            return_value={"_id":test_document_id, "name":"muffins"})
+        status, body = self.request("GET", "/cats/{0}".format(test_document_id))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode("utf-8")), {"id":str(test_document_id), "name":"muffins"})
+
+    def test_item_not_found(self):
+        self.mongo_collection.find_one = mock.AsyncMock(return_value=None)
+        status, body = self.request("GET", "/cats/{0}".format(ObjectId()))
+        self.assertEqual(status, 404)
+
+    def test_create(self):
+        test_document_id = ObjectId()
+        self.mongo_collection.insert_one = mock.AsyncMock()
+        self.mongo_collection.insert_one.return_value.inserted_id = test_document_id
+        status, body = self.request("POST", "/cats", body=json.dumps({"name":"muffins", "breed":"tabby"}).encode("utf-8"))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode("utf-8"))["id"], str(test_document_id))
+
+    def test_create_invalid(self):
+        self.mongo_collection.insert_one = mock.AsyncMock()
+        status, body = self.request("POST", "/cats", body=json.dumps({"name":"muffins"}).encode("utf-8"))
+        self.assertEqual(status, 422)
+        self.mongo_collection.insert_one.assert_not_called()
+
+    def test_update_and_delete(self):
+        test_document_id = ObjectId()
+        self.mongo_collection.find_one = mock.AsyncMock(
+            return_value={"_id":test_document_id, "name":"muffins"})
+        self.mongo_collection.find_one_and_replace = mock.AsyncMock()
+        status, body = self.request("POST", "/cats/{0}".format(test_document_id),
+                                    body=json.dumps({"name":"scone"}).encode("utf-8"))
+        self.assertEqual(status, 204)
+        self.mongo_collection.find_one_and_replace.assert_called_once_with(
+            {"_id":test_document_id}, {"_id":test_document_id, "name":"scone"})
+        self.mongo_collection.find_one_and_delete = mock.AsyncMock(return_value=None)
+        status, body = self.request("DELETE", "/cats/{0}".format(test_document_id))
+        self.assertEqual(status, 404)
+
+    def test_schema_endpoint(self):
+        status, body = self.request("GET", "/cats-new-schema.json")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode("utf-8")), self.resource.new_item_schema)
+
+    def test_before_request(self):
+        self.flask_app.before_request(lambda: abort(403))
+        self.mongo_collection.find_one = mock.AsyncMock()
+        status, body = self.request("GET", "/cats/{0}".format(ObjectId()))
+        self.assertEqual(status, 403)
+        self.mongo_collection.find_one.assert_not_called()
+
+    def test_automatic_options(self):
+        status, body = self.request("OPTIONS", "/cats")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"")
+
+    def test_max_body_size(self):
+        self.asgi_app = ASGIApp(self.flask_app, max_body_size=10)
+        self.mongo_collection.insert_one = mock.AsyncMock()
+        status, body = self.request("POST", "/cats", body=json.dumps({"name":"muffins", "breed":"tabby"}).encode("utf-8"))
+        self.assertEqual(status, 413)
+        self.mongo_collection.insert_one.assert_not_called()
+
+    def test_aggregate_page_engine(self):
+        self.resource.page_engine = "aggregate"
+        test_document_id = ObjectId()
+        aggregate_cursor = self.mongo_collection.aggregate.return_value
+        aggregate_cursor.to_list = mock.AsyncMock(return_value=[{
+            "items":[{"name":"muffins", "id":test_document_id}], "total":[{"count":1}]}])
+        status, body = self.request("GET", "/cats")
+        response_dict = json.loads(body.decode("utf-8"))
+        self.assertEqual(response_dict["items"], [{"name":"muffins", "id":str(test_document_id)}])
+        self.assertEqual(response_dict["total_entries"], 1)
+        self.mongo_collection.find.assert_not_called()
+
+    def test_unsupported_options(self):
+        with self.assertRaises(ValueError):
+            AsyncRAMLResource.from_files(
+                self.collection_raml_file, self.item_raml_file,
+                stream_lists=True, mongo_collection = self.mongo_collection
+                )
@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from flask_ramlschema.cache import MemoryCache
+
+
+class TestMemoryCache(TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), {"hits":3, "misses":1, "evictions":1, "expirations":0, "entries":2})
+
+    def test_ttl(self):
+        cache = MemoryCache(ttl=0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_delete(self):
+        cache = MemoryCache()
+        cache.set("a", 1)
+        cache.delete("a")
+        cache.delete("missing")
+        self.assertIsNone(cache.get("a"))
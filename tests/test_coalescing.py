@@ -0,0 +1,137 @@
+import json
+import os.path
+import sys
+import threading
+import time
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+
+from flask_ramlschema.coalescing import SingleFlight
+from flask_ramlschema.views import RAMLResource
+
+
+def wait_for_calls(single_flight, calls, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while single_flight.stats()["calls"] < calls and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def run_threads(count, target):
+    results = [None] * count
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as error:
+            results[index] = error
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+
+    def test_concurrent_calls_shared(self):
+        func = mock.Mock(side_effect=lambda: wait_for_calls(self.single_flight, 8) or "page")
+        results = run_threads(8, lambda: self.single_flight.do("key", func))
+        self.assertEqual(results, ["page"] * 8)
+        func.assert_called_once()
+        self.assertEqual(self.single_flight.stats()["shared"], 7)
+        self.assertEqual(self.single_flight.in_flight(), 0)
+
+    def test_errors_propagate(self):
+        def fail():
+            wait_for_calls(self.single_flight, 4)
+            raise KeyError("down")
+        results = run_threads(4, lambda: self.single_flight.do("key", fail))
+        self.assertTrue(all(isinstance(result, KeyError) for result in results))
+        self.assertEqual(self.single_flight.stats()["errors"], 1)
+
+    def test_sequential_calls_not_shared(self):
+        func = mock.Mock(return_value="page")
+        self.single_flight.do("key", func)
+        self.single_flight.do("key", func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_wait_timeout(self):
+        single_flight = SingleFlight(timeout=0.01)
+        release = threading.Event()
+        func = mock.Mock(side_effect=lambda: release.wait(5) and "slow")
+        leader = threading.Thread(target=single_flight.do, args=("key", func))
+        leader.start()
+        wait_for_calls(single_flight, 1)
+        self.assertEqual(single_flight.do("key", lambda: "own"), "own")
+        release.set()
+        leader.join()
+        self.assertEqual(single_flight.stats()["timeouts"], 1)
+
+
+class TestCoalescedResource(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.single_flight = SingleFlight()
+        self.flask_app = Flask("test_coalescing_app")
+        self.resource = RAMLResource.from_files(
+            collection_raml_file, item_raml_file,
+            url_path="/cats", flask_app=self.flask_app, etags=True,
+            single_flight=self.single_flight, mongo_collection = self.mongo_collection
+            )
+
+    def get(self, url, **kwargs):
+        return self.flask_app.test_client().get(url, **kwargs)
+
+    def test_item_read_once(self):
+        document_id = ObjectId()
+        def find_one(*args, **kwargs):
+            wait_for_calls(self.single_flight, 6)
+            return {"_id":document_id, "breed":"tabby", "name":"muffins"}
+        self.mongo_collection.find_one.side_effect = find_one
+        url = "/cats/{0}".format(document_id)
+        responses = run_threads(6, lambda: self.get(url))
+        self.assertEqual([response.status_code for response in responses], [200] * 6)
+        self.assertEqual(len(set(response.data for response in responses)), 1)
+        self.mongo_collection.find_one.assert_called_once()
+        etag = responses[0].get_etag()[0]
+        self.assertEqual(self.get(url, headers={"If-None-Match":etag}).status_code, 304)
+
+    def test_missing_item(self):
+        self.mongo_collection.find_one.return_value = None
+        response = self.get("/cats/{0}".format(ObjectId()))
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_read_once(self):
+        documents = [{"_id":ObjectId(), "breed":"tabby", "name":"muffins"}]
+        def count():
+            wait_for_calls(self.single_flight, 6)
+            return len(documents)
+        find_cursor = self.mongo_collection.find.return_value
+        find_cursor.count.side_effect = count
+        find_cursor.sort.return_value.skip.return_value.limit.return_value = find_cursor
+        find_cursor.__iter__ = mock.Mock(side_effect=lambda: iter(documents))
+        responses = run_threads(6, lambda: self.get("/cats?per_page=5"))
+        self.assertEqual([response.status_code for response in responses], [200] * 6)
+        self.assertEqual(json.loads(responses[0].data.decode("utf-8"))["total_entries"], 1)
+        self.mongo_collection.find.assert_called_once()
+
+    def test_different_args_not_shared(self):
+        keys = set()
+        with self.flask_app.test_request_context("/cats?page=1"):
+            keys.add(self.resource.single_flight_key("list"))
+        with self.flask_app.test_request_context("/cats?page=2"):
+            keys.add(self.resource.single_flight_key("list"))
+        self.assertEqual(len(keys), 2)
+
+    def test_writes_start_new_reads(self):
+        with self.flask_app.test_request_context("/cats"):
+            key = self.resource.single_flight_key("list")
+            self.resource.record_change()
+            self.assertNotEqual(self.resource.single_flight_key("list"), key)
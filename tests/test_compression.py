@@ -0,0 +1,146 @@
+import gzip
+import json
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask, Response
+from flask_ramlschema.cache import MemoryCache
+from flask_ramlschema.compression import Compression, GzipCodec
+from flask_ramlschema.views import RAMLResource
+
+
+class TestCompression(TestCase):
+    def setUp(self):
+        self.compression = Compression(min_size=100, encodings=["gzip"])
+        self.flask_app = Flask("test_compression_app")
+        self.body = json.dumps([{"name":"muffins", "breed":"tabby"}] * 20).encode("utf-8")
+
+    def test_negotiate(self):
+        with self.flask_app.test_request_context(headers={"Accept-Encoding":"br, gzip;q=0.5"}) as context:
+            self.assertEqual(self.compression.negotiate(context.request).name, "gzip")
+        with self.flask_app.test_request_context(headers={"Accept-Encoding":"identity"}) as context:
+            self.assertIsNone(self.compression.negotiate(context.request))
+        with self.flask_app.test_request_context() as context:
+            self.assertIsNone(self.compression.negotiate(context.request))
+
+    def test_unavailable_encoding(self):
+        with mock.patch("flask_ramlschema.compression.brotli", None):
+            with self.assertRaises(ValueError):
+                Compression(encodings=["br"])
+        with self.assertRaises(ValueError):
+            Compression(encodings=["lzma"])
+
+    def test_compress_response(self):
+        codec = GzipCodec(6)
+        response = Response(self.body, mimetype="application/json")
+        response.set_etag("abc")
+        self.compression.compress_response(response, codec)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(response.get_etag(), ("abc", True))
+        self.assertEqual(gzip.decompress(response.get_data()), self.body)
+        self.assertEqual(int(response.headers["Content-Length"]), len(response.get_data()))
+
+    def test_small_and_error_responses(self):
+        codec = GzipCodec(6)
+        response = self.compression.compress_response(Response(b"{}"), codec)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        response = self.compression.compress_response(Response(self.body, status=422), codec)
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_streamed_response(self):
+        chunks = [self.body[:50], self.body[50:], b""]
+        response = Response(iter(chunks), mimetype="application/json")
+        self.compression.compress_response(response, GzipCodec(6))
+        self.assertTrue(response.is_streamed)
+        compressed = list(response.response)
+        self.assertGreater(len(compressed), 1)
+        self.assertEqual(gzip.decompress(b"".join(compressed)), self.body)
+
+    def test_variants(self):
+        codec = GzipCodec(6)
+        variants = self.compression.variants("abc")
+        self.compression.compress_response(Response(self.body), codec, variants)
+        self.assertIs(self.compression.variants("abc"), variants)
+        with mock.patch.object(codec, "compress") as mock_compress:
+            response = self.compression.compress_response(Response(self.body), codec, variants)
+        mock_compress.assert_not_called()
+        self.assertEqual(gzip.decompress(response.get_data()), self.body)
+
+
+class TestCompressedResource(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.mongo_collection.full_name = "flask-ramlschema-test.cats"
+        self.flask_app = Flask("test_compression_app")
+        self.resource = RAMLResource.from_files(
+            collection_raml_file, item_raml_file,
+            url_path="/cats", flask_app=self.flask_app, etags=True,
+            compression=Compression(min_size=100, encodings=["gzip"]),
+            mongo_collection = self.mongo_collection
+            )
+        self.test_client = self.flask_app.test_client()
+        self.headers = {"Accept-Encoding":"gzip"}
+
+    def list_documents(self, count=20):
+        documents = [{"_id":ObjectId(), "breed":"tabby", "name":"muffins"} for num in range(count)]
+        find_cursor = self.mongo_collection.find.return_value
+        for method in ("sort", "skip", "limit"):
+            getattr(find_cursor, method).return_value = find_cursor
+        find_cursor.__iter__ = mock.Mock(return_value=iter(documents))
+        find_cursor.count.return_value = count
+
+    def test_list(self):
+        self.list_documents()
+        response = self.test_client.get("/cats", headers=self.headers)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        page = json.loads(gzip.decompress(response.data))
+        self.assertEqual(len(page["items"]), 20)
+        self.list_documents()
+        response = self.test_client.get("/cats")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+
+    def test_list_streaming(self):
+        self.resource.stream_lists = True
+        self.list_documents()
+        response = self.test_client.get("/cats", headers=self.headers)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))["items"]), 20)
+
+    def test_schema_compressed_once(self):
+        codec = self.resource.compression.codecs["gzip"]
+        with mock.patch.object(codec, "compress", wraps=codec.compress) as mock_compress:
+            first_response = self.test_client.get("/cats-new-schema.json", headers=self.headers)
+            second_response = self.test_client.get("/cats-new-schema.json", headers=self.headers)
+        self.assertEqual(mock_compress.call_count, 1)
+        self.assertEqual(first_response.data, second_response.data)
+        self.assertEqual(json.loads(gzip.decompress(second_response.data)),
+                         self.resource.new_item_schema)
+        response = self.test_client.get("/cats-new-schema.json", headers=dict(
+            self.headers, **{"If-None-Match":first_response.headers["ETag"]}))
+        self.assertEqual(response.status_code, 304)
+
+    def test_item_cache_compressed_once(self):
+        self.resource.item_cache = MemoryCache()
+        test_document_id = "827f1f77bcd86cd712439045"
+        self.mongo_collection.find_one.return_value = {
+            "_id":ObjectId(test_document_id), "name":"muffins " * 50}
+        codec = self.resource.compression.codecs["gzip"]
+        with mock.patch.object(codec, "compress", wraps=codec.compress) as mock_compress:
+            first_response = self.test_client.get("/cats/{0}".format(test_document_id), headers=self.headers)
+            second_response = self.test_client.get("/cats/{0}".format(test_document_id), headers=self.headers)
+        self.assertEqual(mock_compress.call_count, 1)
+        self.assertEqual(self.mongo_collection.find_one.call_count, 1)
+        self.assertEqual(second_response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(first_response.data)),
+                         json.loads(gzip.decompress(second_response.data)))
+        response = self.test_client.get("/cats/{0}".format(test_document_id))
+        self.assertEqual(json.loads(response.data)["id"], test_document_id)
@@ -0,0 +1,115 @@
+import json
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+from pymongo import monitoring
+
+from flask_ramlschema.connections import MongoClientManager, PoolStats
+from flask_ramlschema.views import RAMLResource
+
+
+class TestMongoClientManager(TestCase):
+    def setUp(self):
+        self.client_class = mock.MagicMock()
+        self.manager = MongoClientManager("127.0.0.1", max_pool_size=5, client_class=self.client_class)
+
+    def test_lazy_client(self):
+        self.client_class.assert_not_called()
+        client = self.manager.get_client()
+        self.assertIs(self.manager.get_client(), client)
+        self.client_class.assert_called_once()
+        args, kwargs = self.client_class.call_args
+        self.assertEqual(args, ("127.0.0.1",))
+        self.assertEqual(kwargs["maxPoolSize"], 5)
+        self.assertEqual(kwargs["event_listeners"], [self.manager.pool_stats])
+
+    def test_new_client_after_fork(self):
+        self.client_class.side_effect = lambda *args, **kwargs: mock.MagicMock()
+        collection = self.manager.get_collection("test", "cats")
+        self.assertIs(self.manager.get_collection("test", "cats"), collection)
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(self.manager.get_collection("test", "cats"), collection)
+        self.assertEqual(self.client_class.call_count, 2)
+
+    def test_after_fork_hook(self):
+        self.manager.get_client()
+        self.manager._after_fork()
+        self.assertFalse(self.manager.stats()["connected"])
+        self.manager.get_client()
+        self.assertEqual(self.client_class.call_count, 2)
+
+    def test_stats_route(self):
+        flask_app = Flask("test_connections_app")
+        self.manager.add_route(flask_app)
+        self.manager.get_client()
+        response = flask_app.test_client().get("/_diagnostics/mongo-pool")
+        stats = json.loads(response.data.decode("utf-8"))
+        self.assertTrue(stats["connected"])
+        self.assertEqual(stats["max_pool_size"], 5)
+
+
+class TestPoolStats(TestCase):
+    def test_counters(self):
+        pool_stats = PoolStats()
+        address = ("127.0.0.1", 27017)
+        pool_stats.pool_created(monitoring.PoolCreatedEvent(address, {}))
+        pool_stats.connection_created(monitoring.ConnectionCreatedEvent(address, 1))
+        for connection_id in (1, 2):
+            pool_stats.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+        pool_stats.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, 1, 0.1))
+        pool_stats.connection_check_out_failed(
+            monitoring.ConnectionCheckOutFailedEvent(address, "timeout", 0.1))
+        server = pool_stats.snapshot()["127.0.0.1:27017"]
+        self.assertEqual(server["open"], 1)
+        self.assertEqual(server["checked_out"], 1)
+        self.assertEqual(server["waiting"], 0)
+        self.assertEqual(server["checkout_failures"], 1)
+        pool_stats.connection_checked_in(monitoring.ConnectionCheckedInEvent(address, 1))
+        server = pool_stats.snapshot()["127.0.0.1:27017"]
+        self.assertEqual(server["checked_out"], 0)
+        self.assertEqual(server["max_checked_out"], 1)
+
+
+class TestCollectionScope(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        self.collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        self.item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.mongo_collection.find_one.return_value = {
+            "_id":ObjectId("827f1f77bcd86cd712439045"), "name":"muffins"}
+        self.collection_func = mock.Mock(return_value=self.mongo_collection)
+
+    def make_resource(self, collection_scope):
+        flask_app = Flask("test_scope_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, mongo_collection_func=self.collection_func,
+            mongo_collection_name="cats", collection_scope=collection_scope
+            )
+        return flask_app.test_client()
+
+    def test_request_scope(self):
+        test_client = self.make_resource("request")
+        test_client.post("/cats/827f1f77bcd86cd712439045", data=json.dumps({"name":"scone"}))
+        # The update reads the document and replaces it with one resolution
+        self.mongo_collection.find_one_and_replace.assert_called_once()
+        self.assertEqual(self.collection_func.call_count, 1)
+        test_client.post("/cats/827f1f77bcd86cd712439045", data=json.dumps({"name":"scone"}))
+        self.assertEqual(self.collection_func.call_count, 2)
+
+    def test_resource_scope(self):
+        test_client = self.make_resource("resource")
+        for num in range(2):
+            test_client.get("/cats/827f1f77bcd86cd712439045")
+        self.assertEqual(self.collection_func.call_count, 1)
+
+    def test_no_scope(self):
+        test_client = self.make_resource(None)
+        test_client.post("/cats/827f1f77bcd86cd712439045", data=json.dumps({"name":"scone"}))
+        self.assertEqual(self.collection_func.call_count, 2)
+        with self.assertRaises(ValueError):
+            self.make_resource("forever")
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+
+from flask_ramlschema.diagnostics import (
+    DiagnosticCollection, QueryDiagnostics, filter_shape, get_plan_problems, suggest_index
+)
+from flask_ramlschema.errors import register_error_handlers
+from flask_ramlschema.pagination import encode_cursor_token
+from flask_ramlschema.views import RAMLResource
+
+COLLSCAN_SORT_PLAN = {
+    "queryPlanner": {
+        "winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+    }
+}
+
+
+class TestShapes(TestCase):
+    def test_filter_shape(self):
+        shape = filter_shape({"breed": {"$in": ["tabby"]}, "age": {"$gte": 3}, "name": "muffins"})
+        self.assertEqual(shape, (("age", "range"), ("breed", "in"), ("name", "eq")))
+        self.assertEqual(filter_shape({"age": {"$gte": 9}}), filter_shape({"age": {"$gte": 3}}))
+
+    def test_suggest_index(self):
+        shape = (("age", "range"), ("breed", "in"))
+        self.assertEqual(suggest_index(shape, (("name", -1),)),
+                         [("breed", 1), ("name", -1), ("age", 1)])
+        self.assertIsNone(suggest_index((), (("_id", -1),)))
+
+    def test_plan_problems(self):
+        self.assertEqual(get_plan_problems(COLLSCAN_SORT_PLAN), (True, True))
+        index_plan = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+        self.assertEqual(get_plan_problems(index_plan), (False, False))
+
+    def test_record(self):
+        diagnostics = QueryDiagnostics(slow_ms=10, explain_sample_rate=1.0)
+        explain_func = mock.Mock(return_value=COLLSCAN_SORT_PLAN)
+        diagnostics.record("db.cats", "find", {"breed": "tabby"}, sort=[("name", 1)],
+                           seconds=0.001, explain_func=explain_func)
+        explain_func.assert_not_called()
+        diagnostics.record("db.cats", "find", {"breed": "siamese"}, sort=[("name", 1)],
+                           seconds=0.5, explain_func=explain_func)
+        report = diagnostics.report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]["count"], 2)
+        self.assertEqual(report[0]["slow_count"], 1)
+        self.assertTrue(report[0]["collection_scan"])
+        self.assertEqual(diagnostics.suggested_indexes(),
+                         [("db.cats", [("breed", 1), ("name", 1)])])
+
+
+class TestResourceDiagnostics(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        self.collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        self.item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.mongo_collection.full_name = "db.cats"
+        self.mongo_collection.index_information.return_value = {
+            "_id_": {"key": [("_id", 1)]},
+            "name_1": {"key": [("name", 1)]},
+        }
+        mock_cursor = self.mongo_collection.find.return_value
+        mock_cursor.__iter__ = mock.Mock(return_value=iter([]))
+        mock_cursor.count = mock.Mock(return_value=0)
+        self.diagnostics = QueryDiagnostics(slow_ms=0, explain_sample_rate=1.0)
+        self.flask_app = Flask("test_app")
+        self.flask_app.config['TESTING'] = True
+        register_error_handlers(self.flask_app)
+        self.diagnostics.add_route(self.flask_app)
+
+    def create_resource(self, **kwargs):
+        return RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file, url_path="/cats",
+            flask_app=self.flask_app, mongo_collection=self.mongo_collection,
+            diagnostics=self.diagnostics, **kwargs)
+
+    def test_list_and_item(self):
+        self.create_resource()
+        self.mongo_collection.find.return_value.sort.return_value.limit.return_value.explain.return_value = COLLSCAN_SORT_PLAN
+        self.mongo_collection.find_one.return_value = {"_id":ObjectId(), "name":"muffins"}
+        test_client = self.flask_app.test_client()
+        test_client.get("/cats?sort_by=breed&fields=name")
+        test_client.get("/cats/{0}".format(ObjectId()))
+        report = json.loads(test_client.get("/_diagnostics/queries").data.decode("utf-8"))
+        shapes = dict((shape["operation"], shape) for shape in report["shapes"])
+        self.assertEqual(shapes["find"]["sort"], [["breed", -1]])
+        self.assertEqual(shapes["find"]["projection"], ["name"])
+        self.assertTrue(shapes["find"]["in_memory_sort"])
+        self.assertEqual(shapes["find_one"]["filter"], [["_id", "eq"]])
+        self.assertEqual(report["suggested_indexes"], [{"collection":"db.cats", "keys":[["breed", -1]]}])
+
+    def test_declared_sort_allowlist(self):
+        self.create_resource(sort_allowlist="declared")
+        response = self.flask_app.test_client().get("/cats?sort_by=name")
+        self.assertEqual(response.status_code, 400)
+        self.mongo_collection.find.assert_not_called()
+        self.assertEqual(self.flask_app.test_client().get("/cats?sort_by=id").status_code, 200)
+
+    def test_indexed_sort_allowlist(self):
+        self.create_resource(sort_allowlist="indexed")
+        test_client = self.flask_app.test_client()
+        self.assertEqual(test_client.get("/cats?sort_by=name").status_code, 200)
+        self.assertEqual(test_client.get("/cats?sort_by=breed").status_code, 400)
+
+    def test_cursor_sort_allowlist(self):
+        self.create_resource(sort_allowlist="declared", keyset_pagination=True)
+        test_client = self.flask_app.test_client()
+        cursor = encode_cursor_token({"_id":ObjectId(), "name":"muffins"}, "next", "name", -1, "desc")
+        self.assertEqual(test_client.get("/cats?cursor={0}".format(cursor)).status_code, 400)
+        self.assertEqual(test_client.get("/cats?cursor=invalid").status_code, 400)
+        self.mongo_collection.find.assert_not_called()
+        cursor = encode_cursor_token({"_id":ObjectId()}, "next", "_id", -1, "desc")
+        self.assertEqual(test_client.get("/cats?cursor={0}".format(cursor)).status_code, 200)
+
+    def test_every_find_recorded(self):
+        self.create_resource(export_route=True, bulk_route=True)
+        test_client = self.flask_app.test_client()
+        test_client.get("/cats-export.ndjson").get_data()
+        test_client.post("/cats/_bulk", data=json.dumps([{"op":"delete", "id":str(ObjectId())}]))
+        report = self.diagnostics.report()
+        shapes = [(shape["operation"], shape["filter"], shape["sort"]) for shape in report]
+        self.assertIn(("find", [], [["_id", 1]]), shapes)
+        self.assertIn(("find", [["_id", "in"]], []), shapes)
+
+    def test_async_find_recorded(self):
+        mongo_collection = mock.MagicMock()
+        mongo_collection.full_name = "db.cats"
+        mongo_collection.find.return_value.sort.return_value.to_list = mock.AsyncMock(return_value=[])
+        collection = DiagnosticCollection(mongo_collection, self.diagnostics)
+        find_cursor = collection.find({"breed":"tabby"}).sort("name", -1)
+        self.assertEqual(asyncio.run(find_cursor.to_list(10)), [])
+        report = self.diagnostics.report()
+        self.assertEqual(report[0]["sort"], [["name", -1]])
+        self.assertEqual(report[0]["explained"], 0)
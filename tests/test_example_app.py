@@ -7,7 +7,11 @@ from unittest import TestCase, mock
 import uuid
 
 from bson.objectid import ObjectId
-from flask import Flask
+from flask import Flask, request
+from flask_ramlschema.cache import MemoryCache
+from flask_ramlschema.conditional import ChangeCounter
+from flask_ramlschema.errors import register_error_handlers
+from flask_ramlschema.pagination import encode_cursor_token
 from flask_ramlschema.views import RAMLResource
 import yaml
 
@@ -50,6 +54,17 @@ class TestExampleApp(TestCase):
             self.assertEquals(response_dict["items"], test_result_list)
             self.assertEquals(response_dict["total_entries"], len(test_result_list))
 
+    def test_list_documents_not_mutated(self):
+        test_list = [{"_id":ObjectId(), "breed":"tabby", "name":"muffins"}]
+        find_cursor = self.mongo_collection.find.return_value
+        find_cursor.count.return_value = 1
+        find_cursor.sort.return_value.skip.return_value.limit.return_value = find_cursor
+        find_cursor.__iter__ = mock.Mock(return_value=iter(test_list))
+        response = self.test_client.get("/cats")
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response_dict["items"][0]["id"], str(test_list[0]["_id"]))
+        self.assertIn("_id", test_list[0])
+
     def test_pagination(self):
         test_document_id = ObjectId()
         test_document = {"_id":test_document_id, "breed":"tabby", "name":"muffins"}
@@ -71,6 +86,78 @@ class TestExampleApp(TestCase):
             mock_cursor.limit.assert_called_once_with(25)
             mock_cursor.skip.assert_called_once_with(25)
 
+    def test_list_without_count(self):
+        test_list = [{"_id":ObjectId(), "breed":"tabby", "name":"muffins"}]
+        with mock.patch.object(self.resource, "list_view") as mock_list_view:
+            mock_cursor = mock.MagicMock()
+            mock_cursor.__iter__ = mock.Mock(return_value=iter(test_list))
+            mock_cursor.sort = mock.Mock(return_value=mock_cursor)
+            mock_cursor.limit = mock.Mock(return_value=mock_cursor)
+            mock_cursor.skip = mock.Mock(return_value=mock_cursor)
+            mock_list_view.return_value = mock_cursor
+            response = self.test_client.get("/cats?count=none")
+            response_dict = json.loads(response.data.decode("utf-8"))
+            mock_cursor.count.assert_not_called()
+            mock_cursor.limit.assert_called_once_with(26)
+            self.assertFalse(response_dict["has_more"])
+            self.assertNotIn("total_entries", response_dict)
+
+    def test_list_estimated_count(self):
+        self.resource.count_strategy = "estimated"
+        self.mongo_collection.estimated_document_count.return_value = 71
+        response = self.test_client.get("/cats")
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.mongo_collection.find.return_value.count.assert_not_called()
+        self.assertEqual(response_dict["total_entries"], 71)
+        self.mongo_collection.count_documents.return_value = 3
+        with mock.patch.object(self.resource, "list_query", return_value={"name":"muffins"}):
+            response = self.test_client.get("/cats")
+        self.assertEqual(json.loads(response.data.decode("utf-8"))["total_entries"], 3)
+        self.mongo_collection.count_documents.assert_called_once_with({"name":"muffins"})
+
+    def test_list_cached_count(self):
+        self.resource.count_strategy = "cached"
+        self.mongo_collection.full_name = "flask-ramlschema-test.cats"
+        self.mongo_collection.count_documents.return_value = 5
+        for num in range(2):
+            response = self.test_client.get("/cats")
+            self.assertEqual(json.loads(response.data.decode("utf-8"))["total_entries"], 5)
+        self.mongo_collection.count_documents.assert_called_once_with({})
+        self.mongo_collection.find.return_value.count.assert_not_called()
+
+    def test_list_streaming(self):
+        test_list = [{"_id":ObjectId(), "breed":"tabby", "name":"muffins"} for x in range(0,3)]
+        self.resource.stream_lists = True
+        with mock.patch.object(self.resource, "list_view") as mock_list_view:
+            mock_cursor = mock.MagicMock()
+            mock_cursor.__iter__ = mock.Mock(return_value=iter(test_list))
+            mock_cursor.count = mock.Mock(return_value = len(test_list))
+            mock_cursor.sort = mock.Mock(return_value=mock_cursor)
+            mock_cursor.limit = mock.Mock(return_value=mock_cursor)
+            mock_cursor.skip = mock.Mock(return_value=mock_cursor)
+            mock_list_view.return_value = mock_cursor
+            response = self.test_client.get("/cats")
+            self.assertTrue(response.is_streamed)
+            response_dict = json.loads(response.data.decode("utf-8"))
+            self.assertEqual(len(response_dict["items"]), 3)
+            self.assertEqual(response_dict["total_entries"], 3)
+
+    def test_export(self):
+        flask_app = Flask("test_export_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, export_route=True,
+            mongo_collection = self.mongo_collection
+            )
+        test_list = [{"_id":ObjectId(), "breed":"tabby", "name":"muffins"} for x in range(0,3)]
+        test_ids = [str(document["_id"]) for document in test_list]
+        find_cursor = self.mongo_collection.find.return_value
+        find_cursor.__iter__ = mock.Mock(return_value=iter(test_list))
+        response = flask_app.test_client().get("/cats-export.ndjson")
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.data.decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], test_ids)
+
     def test_item_get(self):
         test_document_id = ObjectId()
         test_document = {"_id":test_document_id, "breed":"tabby", "name":"muffins"}
@@ -83,6 +170,111 @@ class TestExampleApp(TestCase):
             response_dict = json.loads(response.data.decode("utf-8"))
             self.assertEquals(response_dict, result_document)
 
+    def test_item_get_fields(self):
+        test_document_id = ObjectId()
+        self.mongo_collection.find_one.return_value = {"_id":test_document_id, "name":"muffins"}
+        response = self.test_client.get("/cats/{0}?fields=name".format(test_document_id))
+        self.mongo_collection.find_one.assert_called_once_with({"_id":test_document_id}, {"name":1})
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response_dict, {"id":str(test_document_id), "name":"muffins"})
+
+    def test_list_fields(self):
+        self.mongo_collection.find.return_value.count.return_value = 0
+        self.test_client.get("/cats?fields=id,breed")
+        self.mongo_collection.find.assert_called_once_with({}, {"_id":1, "breed":1})
+
+    def test_default_fields(self):
+        collection_raml = RAMLResource.load_raml_file(self.collection_raml_file)
+        collection_raml["type"]["collection"]["defaultFields"] = "name"
+        item_raml = RAMLResource.load_raml_file(self.item_raml_file)
+        flask_app = Flask("test_default_fields_app")
+        resource = RAMLResource(collection_raml, item_raml, url_path="/cats",
+                                flask_app=flask_app, mongo_collection=self.mongo_collection)
+        self.assertEqual(resource.list_default_projection, {"name":1})
+        self.assertIsNone(resource.item_default_projection)
+        self.mongo_collection.find.return_value.count.return_value = 0
+        flask_app.test_client().get("/cats")
+        self.mongo_collection.find.assert_called_once_with({}, {"name":1})
+
+    def test_unknown_fields(self):
+        register_error_handlers(self.flask_app)
+        response = self.test_client.get("/cats?fields=password")
+        self.assertEqual(response.status_code, 400)
+        self.mongo_collection.find.assert_not_called()
+
+    def test_item_etag(self):
+        self.resource.etags = True
+        test_document_id = ObjectId()
+        self.mongo_collection.find_one.side_effect = lambda *args: {"_id":test_document_id, "name":"muffins"}
+        response = self.test_client.get("/cats/{0}".format(test_document_id))
+        etag = response.headers["ETag"]
+        self.assertEqual(response.status_code, 200)
+        response = self.test_client.get("/cats/{0}".format(test_document_id),
+                                        headers={"If-None-Match":etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+    def test_item_version_etag(self):
+        self.resource.etags = True
+        self.resource.etag_version_field = "version"
+        test_document_id = ObjectId()
+        self.mongo_collection.find_one.side_effect = lambda *args: {
+            "_id":test_document_id, "name":"muffins", "version":1}
+        etag = self.test_client.get("/cats/{0}".format(test_document_id)).headers["ETag"]
+        with mock.patch.object(self.resource, "json_response") as mock_json_response:
+            response = self.test_client.get("/cats/{0}".format(test_document_id),
+                                            headers={"If-None-Match":etag})
+            self.assertEqual(response.status_code, 304)
+            mock_json_response.assert_not_called()
+
+    def test_list_change_counter_etag(self):
+        self.resource.etags = True
+        self.resource.change_counter = ChangeCounter()
+        self.mongo_collection.full_name = "flask-ramlschema-test.cats"
+        self.mongo_collection.find.return_value.count.return_value = 0
+        etag = self.test_client.get("/cats").headers["ETag"]
+        self.mongo_collection.find.reset_mock()
+        response = self.test_client.get("/cats", headers={"If-None-Match":etag})
+        self.assertEqual(response.status_code, 304)
+        self.mongo_collection.find.assert_not_called()
+        self.test_client.delete("/cats/827f1f77bcd86cd712439045")
+        response = self.test_client.get("/cats", headers={"If-None-Match":etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_item_cache(self):
+        self.resource.item_cache = MemoryCache()
+        self.resource.etags = True
+        self.mongo_collection.full_name = "flask-ramlschema-test.cats"
+        test_document_id = "827f1f77bcd86cd712439045"
+        self.mongo_collection.find_one.side_effect = lambda *args: {
+            "_id":ObjectId(test_document_id), "name":"muffins"}
+        first_response = self.test_client.get("/cats/{0}".format(test_document_id))
+        second_response = self.test_client.get("/cats/{0}".format(test_document_id))
+        self.assertEqual(self.mongo_collection.find_one.call_count, 1)
+        self.assertEqual(first_response.data, second_response.data)
+        self.assertEqual(first_response.headers["ETag"], second_response.headers["ETag"])
+        response = self.test_client.get("/cats/{0}".format(test_document_id),
+                                        headers={"If-None-Match":first_response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.test_client.post("/cats/{0}".format(test_document_id), data=json.dumps({"name":"scone"}))
+        self.test_client.get("/cats/{0}".format(test_document_id))
+        # One read for the update, one after the cached body was invalidated
+        self.assertEqual(self.mongo_collection.find_one.call_count, 3)
+        self.assertEqual(self.resource.item_cache.stats()["hits"], 2)
+
+    def test_item_cache_write_during_read(self):
+        self.resource.item_cache = MemoryCache()
+        self.mongo_collection.full_name = "flask-ramlschema-test.cats"
+        test_document_id = "827f1f77bcd86cd712439045"
+        def find_one(*args):
+            # A write lands after the document was read, before it is cached
+            self.resource.invalidate_item(test_document_id)
+            return {"_id":ObjectId(test_document_id), "name":"muffins"}
+        self.mongo_collection.find_one.side_effect = find_one
+        self.test_client.get("/cats/{0}".format(test_document_id))
+        self.test_client.get("/cats/{0}".format(test_document_id))
+        self.assertEqual(self.mongo_collection.find_one.call_count, 2)
+
     def test_item_create(self):
         test_document_id = ObjectId()
         test_document = {"breed":"tabby", "name":"muffins"}
@@ -98,6 +290,13 @@ class TestExampleApp(TestCase):
             response_dict = json.loads(response.data.decode("utf-8"))
             self.assertEquals(response_dict, result_document)
 
+    def test_item_create_body_read_before(self):
+        self.flask_app.before_request(lambda: request.get_data() and None)
+        self.mongo_collection.insert_one.return_value.inserted_id = ObjectId()
+        response = self.test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.mongo_collection.insert_one.call_args[0][0]["name"], "muffins")
+
     def test_item_update(self):
         test_document_id = "827f1f77bcd86cd712439045"
         existing_document = {"_id":ObjectId(test_document_id), "breed":"tabby", "name":"muffins"}
@@ -107,12 +306,234 @@ class TestExampleApp(TestCase):
         self.mongo_collection.find_one_and_replace.assert_called_once_with({"_id":ObjectId(test_document_id)}, update_document)
         self.assertEquals(response.status_code, 204)
 
+    def test_item_atomic_update(self):
+        test_document_id = "827f1f77bcd86cd712439045"
+        self.resource.atomic_updates = True
+        self.mongo_collection.update_one.return_value.matched_count = 1
+        response = self.test_client.post("/cats/{0}".format(test_document_id), data=json.dumps({"name":"scone"}))
+        self.mongo_collection.update_one.assert_called_once_with(
+            {"_id":ObjectId(test_document_id)}, {"$set":{"name":"scone"}})
+        self.mongo_collection.find_one.assert_not_called()
+        self.assertEqual(response.status_code, 204)
+
+    def test_item_atomic_update_not_found(self):
+        self.resource.atomic_updates = True
+        self.mongo_collection.update_one.return_value.matched_count = 0
+        response = self.test_client.post("/cats/827f1f77bcd86cd712439045", data=json.dumps({"name":"scone"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_item_atomic_update_conflict(self):
+        test_document_id = "827f1f77bcd86cd712439045"
+        self.resource.atomic_updates = True
+        self.resource.version_field = "version"
+        self.mongo_collection.update_one.return_value.matched_count = 0
+        self.mongo_collection.find_one.return_value = {"_id":ObjectId(test_document_id)}
+        response = self.test_client.post("/cats/{0}".format(test_document_id),
+                                         data=json.dumps({"name":"scone", "version":3}))
+        self.mongo_collection.update_one.assert_called_once_with(
+            {"_id":ObjectId(test_document_id), "version":3},
+            {"$set":{"name":"scone"}, "$inc":{"version":1}})
+        self.assertEqual(response.status_code, 409)
+
+    def test_item_update_version_conflict(self):
+        test_document_id = "827f1f77bcd86cd712439045"
+        self.resource.version_field = "version"
+        self.mongo_collection.find_one.return_value = {
+            "_id":ObjectId(test_document_id), "name":"muffins", "version":4}
+        response = self.test_client.post("/cats/{0}".format(test_document_id),
+                                         data=json.dumps({"name":"scone", "version":3}))
+        self.assertEqual(response.status_code, 409)
+        self.mongo_collection.find_one_and_replace.assert_not_called()
+        response = self.test_client.post("/cats/{0}".format(test_document_id),
+                                         data=json.dumps({"name":"scone", "version":4}))
+        self.mongo_collection.find_one_and_replace.assert_called_once_with(
+            {"_id":ObjectId(test_document_id), "version":4},
+            {"_id":ObjectId(test_document_id), "name":"scone", "version":5})
+        self.assertEqual(response.status_code, 204)
+
     def test_item_delete(self):
         test_document_id = "827f1f77bcd86cd712439045"
         response = self.test_client.delete("/cats/{0}".format(test_document_id))
         self.mongo_collection.find_one_and_delete.assert_called_once_with({"_id":ObjectId(test_document_id)})
         self.assertEquals(response.status_code, 204)
 
+    def test_keyset_sort_fields(self):
+        register_error_handlers(self.flask_app)
+        self.resource.keyset_pagination = True
+        response = self.test_client.get("/cats?fields=name&sort_by=owner_ssn")
+        self.assertEqual(response.status_code, 400)
+        cursor = encode_cursor_token({"_id":ObjectId(), "owner_ssn":"1"}, "next", "owner_ssn", -1, "desc")
+        response = self.test_client.get("/cats?fields=name&cursor={0}".format(cursor))
+        self.assertEqual(response.status_code, 400)
+        self.mongo_collection.find.assert_not_called()
+
+    def test_bulk(self):
+        flask_app = Flask("test_bulk_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, bulk_route=True,
+            mongo_collection = self.mongo_collection
+            )
+        existing_id = ObjectId()
+        missing_id = ObjectId()
+        self.mongo_collection.find.return_value = [{"_id":existing_id}]
+        self.mongo_collection.bulk_write.return_value.matched_count = 1
+        operations = [
+            {"op":"create", "document":{"breed":"tabby", "name":"muffins"}},
+            {"op":"create", "document":{"breed":"tabby"}},
+            {"op":"update", "id":str(existing_id), "document":{"name":"scone"}},
+            {"op":"delete", "id":str(missing_id)},
+            {"op":"explode"},
+        ]
+        response = flask_app.test_client().post("/cats/_bulk", data=json.dumps(operations))
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual([result["status"] for result in response_dict["results"]],
+                         [201, 422, 204, 404, 422])
+        self.assertEqual(response_dict["errors"], 3)
+        self.mongo_collection.find.assert_called_once_with(
+            {"_id":{"$in":[existing_id, missing_id]}}, {"_id":1})
+        write_ops = self.mongo_collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(write_ops), 2)
+        self.assertEqual(self.mongo_collection.bulk_write.call_args[1], {"ordered":False})
+
+    def test_bulk_update_lost_race(self):
+        flask_app = Flask("test_bulk_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, bulk_route=True,
+            version_field="version", mongo_collection = self.mongo_collection
+            )
+        bumped_id, deleted_id, written_id = ObjectId(), ObjectId(), ObjectId()
+        # Read before the bulk write, then after it matched only one document
+        self.mongo_collection.find.side_effect = [
+            [{"_id":bumped_id, "version":1}, {"_id":deleted_id, "version":1},
+             {"_id":written_id, "version":1}],
+            [{"_id":bumped_id, "version":3}, {"_id":written_id, "version":2}],
+        ]
+        self.mongo_collection.bulk_write.return_value.matched_count = 1
+        operations = [{"op":"update", "id":str(object_id), "document":{"name":"scone"}}
+                      for object_id in (bumped_id, deleted_id, written_id)]
+        response = flask_app.test_client().post("/cats/_bulk", data=json.dumps(operations))
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual([result["status"] for result in response_dict["results"]], [409, 404, 204])
+        self.assertEqual(response_dict["errors"], 2)
+
+    def test_bulk_overridden_create_view(self):
+        class CreatingResource(RAMLResource):
+            def create_view(self, document):
+                document["id"] = document["name"]
+        flask_app = Flask("test_bulk_app")
+        CreatingResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, bulk_route=True,
+            mongo_collection = self.mongo_collection
+            )
+        operations = [{"op":"create", "document":{"breed":"tabby", "name":"muffins"}}]
+        response = flask_app.test_client().post("/cats/_bulk", data=json.dumps(operations))
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response_dict["results"], [{"index":0, "op":"create", "status":201, "id":"muffins"}])
+        self.mongo_collection.bulk_write.assert_not_called()
+
+    def test_bulk_ndjson_not_allowed(self):
+        flask_app = Flask("test_bulk_app")
+        resource = RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, bulk_route=True,
+            mongo_collection = self.mongo_collection
+            )
+        body = "\n".join(json.dumps({"op":"create", "document":{"breed":"tabby", "name":str(num)}})
+                         for num in range(3))
+        with mock.patch.object(resource, "create_allowed", return_value=False):
+            response = flask_app.test_client().post(
+                "/cats/_bulk", data=body, content_type="application/x-ndjson")
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual([result["status"] for result in response_dict["results"]], [401] * 3)
+        self.mongo_collection.bulk_write.assert_not_called()
+
+    def test_bulk_ndjson_batches(self):
+        flask_app = Flask("test_bulk_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, bulk_route=True, bulk_batch_size=2,
+            mongo_collection = self.mongo_collection
+            )
+        lines = [json.dumps({"op":"create", "document":{"breed":"tabby", "name":str(num)}})
+                 for num in range(3)]
+        lines.insert(1, "{not json")
+        response = flask_app.test_client().post(
+            "/cats/_bulk", data="\n".join(lines), content_type="application/x-ndjson")
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual([result["index"] for result in response_dict["results"]], [0, 1, 2, 3])
+        self.assertEqual([result["status"] for result in response_dict["results"]],
+                         [201, 422, 201, 201])
+        self.assertEqual(self.mongo_collection.bulk_write.call_count, 2)
+
+    def test_max_body_size(self):
+        flask_app = Flask("test_body_size_app")
+        register_error_handlers(flask_app)
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, bulk_route=True, max_body_size=40,
+            max_bulk_body_size=100, mongo_collection = self.mongo_collection
+            )
+        test_client = flask_app.test_client()
+        response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"x" * 40}))
+        self.assertEqual(response.status_code, 413)
+        response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 200)
+        body = "\n".join(json.dumps({"op":"delete", "id":str(ObjectId())}) for num in range(3))
+        response = test_client.post("/cats/_bulk", data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 413)
+        self.mongo_collection.insert_one.assert_called_once()
+
+    def test_max_body_size_from_raml(self):
+        collection_raml = RAMLResource.load_raml_file(self.collection_raml_file)
+        collection_raml = copy.deepcopy(collection_raml)
+        collection_raml["type"]["collection"]["maxBodySize"] = 1024
+        item_raml = RAMLResource.load_raml_file(self.item_raml_file)
+        resource = RAMLResource(collection_raml, item_raml, mongo_collection=self.mongo_collection)
+        self.assertEqual(resource.max_body_size, 1024)
+        resource = RAMLResource(collection_raml, item_raml, max_body_size=10,
+                                mongo_collection=self.mongo_collection)
+        self.assertEqual(resource.max_body_size, 10)
+        self.assertEqual(self.resource.max_body_size, 16 * 1024 * 1024)
+
+    def test_validation_modes(self):
+        register_error_handlers(self.flask_app)
+        body = json.dumps({"name":1, "breed":2})
+        response = self.test_client.post("/cats", data=body)
+        self.assertEqual(len(json.loads(response.data.decode("utf-8"))["errors"]), 2)
+        self.resource.validation_mode = "capped"
+        self.resource.max_errors = 1
+        response = self.test_client.post("/cats", data=body)
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(len(response_dict["errors"]), 1)
+        self.assertEqual(response_dict["truncated"], True)
+        self.resource.validation_mode = "fail-fast"
+        response = self.test_client.post("/cats", data=json.dumps([1, 2, 3]))
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response_dict["errors"], [{"message":"request body is not of type 'object'"}])
+        self.mongo_collection.insert_one.assert_not_called()
+
+    def test_aggregate_page_engine(self):
+        flask_app = Flask("test_aggregate_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, page_engine="aggregate",
+            mongo_collection = self.mongo_collection
+            )
+        test_document_id = ObjectId()
+        self.mongo_collection.aggregate.return_value = iter([{
+            "items":[{"name":"muffins", "id":test_document_id}], "total":[{"count":1}]}])
+        response = flask_app.test_client().get("/cats?fields=name")
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response_dict["items"], [{"name":"muffins", "id":str(test_document_id)}])
+        self.assertEqual(response_dict["total_entries"], 1)
+        pipeline = self.mongo_collection.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[1]["$facet"]["items"][-1], {"$project":{"name":1, "id":"$_id", "_id":0}})
+        self.mongo_collection.find.assert_not_called()
+
     def test_schema_endpoints(self):
         collection_raml = open(self.collection_raml_file).read()
         new_item_schema = yaml.load(collection_raml)["type"]["collection"]["newItemSchema"]
@@ -122,3 +543,6 @@ class TestExampleApp(TestCase):
         update_item_schema = yaml.load(item_raml)["type"]["collection-item"]["updateItemSchema"]
         update_schema_response = self.test_client.get("/cats-update-schema.json")
         self.assertEquals(json.loads(update_schema_response.data.decode("utf-8")), json.loads(update_item_schema))
+        cached_response = self.test_client.get("/cats-update-schema.json",
+            headers={"If-None-Match":update_schema_response.headers["ETag"]})
+        self.assertEqual(cached_response.status_code, 304)
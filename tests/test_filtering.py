@@ -0,0 +1,121 @@
+import copy
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+from werkzeug.datastructures import MultiDict
+
+from flask_ramlschema.errors import ValidationError, register_error_handlers
+from flask_ramlschema.filtering import (
+    get_filter_query, get_missing_indexes, get_required_indexes, parse_field_list
+)
+from flask_ramlschema.views import RAMLResource
+
+PROPERTIES = {
+    "name": {"type": "string"},
+    "breed": {"type": "string", "enum": ["tabby", "siamese"]},
+    "age": {"type": "integer"},
+    "indoor": {"type": "boolean"},
+}
+
+
+class TestFilterQuery(TestCase):
+    def get_query(self, args, filter_fields=("_id", "name", "breed", "age", "indoor")):
+        return get_filter_query(MultiDict(args), list(filter_fields), PROPERTIES)
+
+    def test_operators(self):
+        object_id = ObjectId()
+        query = self.get_query([("breed[in]", "tabby,siamese"), ("age[gte]", "3"),
+                                ("age[lt]", "10"), ("indoor", "true"), ("id", str(object_id)),
+                                ("page", "2")])
+        self.assertEqual(query, {
+            "breed": {"$in": ["tabby", "siamese"]},
+            "age": {"$gte": 3, "$lt": 10},
+            "indoor": True,
+            "_id": object_id,
+        })
+
+    def test_repeated_equality(self):
+        query = self.get_query([("name", "muffins"), ("name", "tiger")])
+        self.assertEqual(query, {"name": {"$in": ["muffins", "tiger"]}})
+
+    def test_invalid(self):
+        for args in ([("age", "old")], [("breed", "lion")], [("indoor[gt]", "true")],
+                     [("age[like]", "3")], [("id", "nope")]):
+            with self.assertRaises(ValidationError) as context:
+                self.get_query(args)
+            self.assertEqual(context.exception.status_code, 400)
+
+    def test_not_filterable(self):
+        with self.assertRaises(ValidationError):
+            self.get_query([("name", "muffins")], filter_fields=["breed"])
+        self.assertEqual(self.get_query([("_", "123")], filter_fields=["breed"]), {})
+
+    def test_parse_field_list(self):
+        self.assertEqual(parse_field_list("id, breed,"), ["_id", "breed"])
+
+
+class TestIndexes(TestCase):
+    def test_required(self):
+        self.assertEqual(get_required_indexes(["breed", "_id"], []), [["breed", "_id"]])
+        self.assertEqual(get_required_indexes(["breed"], ["name", "breed"]),
+                         [["name"], ["breed", "name"], ["breed"]])
+
+    def test_missing(self):
+        index_information = {
+            "_id_": {"key": [("_id", 1)]},
+            "breed_1_name_-1": {"key": [("breed", 1), ("name", -1), ("age", 1)]},
+        }
+        self.assertEqual(get_missing_indexes(index_information, [["breed", "name"], ["age"]]),
+                         [["age"]])
+
+
+class TestFilteredResource(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.collection_raml = copy.deepcopy(RAMLResource.load_raml_file(collection_raml_file))
+        self.collection_raml["type"]["collection"]["filterFields"] = "breed, name"
+        self.item_raml = RAMLResource.load_raml_file(item_raml_file)
+        self.mongo_collection = mock.MagicMock()
+        self.mongo_collection.index_information.return_value = {
+            "_id_": {"key": [("_id", 1)]},
+            "breed_1__id_1": {"key": [("breed", 1), ("_id", 1)]},
+        }
+        self.flask_app = Flask("test_app")
+        self.flask_app.config['TESTING'] = True
+        register_error_handlers(self.flask_app)
+
+    def create_resource(self, **kwargs):
+        return RAMLResource(self.collection_raml, self.item_raml, url_path="/cats",
+                            flask_app=self.flask_app, mongo_collection=self.mongo_collection,
+                            **kwargs)
+
+    def test_list_filter(self):
+        self.create_resource(index_check=None)
+        mock_cursor = self.mongo_collection.find.return_value
+        mock_cursor.__iter__ = mock.Mock(return_value=iter([]))
+        mock_cursor.count = mock.Mock(return_value=0)
+        response = self.flask_app.test_client().get("/cats?breed[in]=tabby,siamese&name=muffins")
+        self.assertEqual(response.status_code, 200)
+        query = self.mongo_collection.find.call_args[0][0]
+        self.assertEqual(query, {"breed": {"$in": ["tabby", "siamese"]}, "name": "muffins"})
+
+    def test_unknown_filter_field(self):
+        self.collection_raml["type"]["collection"]["filterFields"] = "color"
+        with self.assertRaises(ValueError):
+            self.create_resource(index_check=None)
+
+    def test_index_warning(self):
+        with self.assertLogs("flask_ramlschema.views", "WARNING") as logs:
+            self.create_resource()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("['name', '_id']", logs.output[0])
+        self.mongo_collection.create_index.assert_not_called()
+
+    def test_index_create(self):
+        self.create_resource(index_check="create")
+        self.mongo_collection.create_index.assert_called_once_with([("name", 1), ("_id", 1)])
@@ -0,0 +1,83 @@
+import io
+import json
+from unittest import TestCase
+
+from flask import Flask
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+
+from flask_ramlschema.bulk import UndecodableOperation, iter_ndjson_operations
+from flask_ramlschema.ingestion import iter_body_chunks, iter_lines, read_body
+
+
+class UnsizedStream(io.BytesIO):
+    """Request stream that fails the test when read past ``limit`` bytes."""
+    def __init__(self, data, limit):
+        super().__init__(data)
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.tell() > self.limit:
+            raise AssertionError("read past the limit")
+        return super().read(size)
+
+
+class TestIngestion(TestCase):
+    def setUp(self):
+        self.flask_app = Flask("test_ingestion_app")
+
+    def request_context(self, body, content_length=True, limit=None):
+        environ = EnvironBuilder(method="POST", data=body).get_environ()
+        if not content_length:
+            # Chunked bodies have no Content-Length, the server terminates the stream
+            del environ["CONTENT_LENGTH"]
+            environ["wsgi.input_terminated"] = True
+        if limit is not None:
+            environ["wsgi.input"] = UnsizedStream(body, limit)
+        return self.flask_app.request_context(environ)
+
+    def test_read_body(self):
+        with self.request_context(b'{"name": "muffins"}') as context:
+            body = read_body(context.request, max_body_size=100, chunk_size=4)
+        self.assertEqual(json.loads(body), {"name":"muffins"})
+
+    def test_content_length_rejected_before_reading(self):
+        with self.request_context(b"x" * 100, limit=0) as context:
+            with self.assertRaises(RequestEntityTooLarge):
+                read_body(context.request, max_body_size=10)
+
+    def test_unsized_body_rejected_while_streaming(self):
+        with self.request_context(b"x" * 1000, content_length=False, limit=20) as context:
+            self.assertIsNone(context.request.content_length)
+            with self.assertRaises(RequestEntityTooLarge):
+                read_body(context.request, max_body_size=10, chunk_size=4)
+
+    def test_body_chunks(self):
+        with self.request_context(b"abcdefghij", content_length=False) as context:
+            chunks = list(iter_body_chunks(context.request, chunk_size=4))
+        self.assertEqual(chunks, [b"abcd", b"efgh", b"ij"])
+
+    def test_body_already_read(self):
+        with self.request_context(b'{"name": "muffins"}', content_length=False) as context:
+            context.request.get_data()
+            body = read_body(context.request, max_body_size=100, chunk_size=4)
+            self.assertEqual(json.loads(body), {"name":"muffins"})
+            with self.assertRaises(RequestEntityTooLarge):
+                read_body(context.request, max_body_size=10)
+
+    def test_lines(self):
+        chunks = [b'{"a": 1}\n{"b"', b': 2}\n\n', b'  \n{"c": 3}']
+        self.assertEqual(list(iter_lines(chunks)), [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}'])
+
+    def test_long_line_rejected(self):
+        lines = iter_lines([b"short\n", b"x" * 10, b"x" * 10])
+        self.assertEqual(next(lines), b"short")
+        lines = iter_lines([b"short\n", b"x" * 10, b"x" * 10], max_line_size=15)
+        self.assertEqual(next(lines), b"short")
+        with self.assertRaises(RequestEntityTooLarge):
+            next(lines)
+
+    def test_ndjson_operations(self):
+        operations = list(iter_ndjson_operations([b'{"op": "delete"}', b"{not json"]))
+        self.assertEqual(operations[0], {"op":"delete"})
+        self.assertIsInstance(operations[1], UndecodableOperation)
@@ -0,0 +1,96 @@
+import json
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+from flask_ramlschema.errors import register_error_handlers
+from flask_ramlschema.metrics import Histogram, Metrics, RequestTimings
+from flask_ramlschema.views import RAMLResource
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        self.collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        self.item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.forward = mock.MagicMock()
+        self.metrics = Metrics(forward=self.forward)
+        self.flask_app = Flask("test_app")
+        self.flask_app.config['TESTING'] = True
+        register_error_handlers(self.flask_app)
+        self.resource = RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=self.flask_app,
+            mongo_collection=self.mongo_collection, metrics=self.metrics
+            )
+        self.metrics.add_route(self.flask_app)
+        self.test_client = self.flask_app.test_client()
+
+    def get_phases(self, response):
+        server_timing = response.headers["Server-Timing"]
+        return [metric.split(";")[0] for metric in server_timing.split(", ")]
+
+    def test_list(self):
+        mock_cursor = mock.MagicMock()
+        mock_cursor.__iter__ = mock.Mock(return_value=iter([{"_id":ObjectId(), "name":"muffins"}]))
+        mock_cursor.count = mock.Mock(return_value=1)
+        self.mongo_collection.find.return_value = mock_cursor
+        response = self.test_client.get("/cats")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_phases(response), ["mongo_count", "mongo_find", "encode", "total"])
+        endpoint, method, status, total_seconds, phases = self.forward.call_args[0]
+        self.assertEqual((endpoint, method, status), ("cats_collection", "GET", 200))
+        self.assertLessEqual(sum(phases.values()), total_seconds)
+
+    def test_create(self):
+        self.mongo_collection.insert_one.return_value.inserted_id = ObjectId()
+        response = self.test_client.post(
+            "/cats", data=json.dumps({"name":"muffins", "breed":"tabby"}),
+            content_type="application/json")
+        self.assertEqual(self.get_phases(response),
+                         ["read", "decode", "validate", "mongo_insert_one", "encode", "total"])
+
+    def test_errors(self):
+        self.mongo_collection.find_one.return_value = None
+        self.test_client.get("/cats/{0}".format(ObjectId()))
+        self.assertEqual(self.forward.call_args[0][:3], ("cats_item", "GET", 404))
+        self.test_client.post("/cats", data=json.dumps({"name":1}), content_type="application/json")
+        self.assertEqual(self.forward.call_args[0][:3], ("cats_collection", "POST", 422))
+
+    def test_exposition(self):
+        self.test_client.get("/cats-new-schema.json")
+        body = self.test_client.get("/metrics").data.decode("utf-8")
+        self.assertIn("# TYPE ramlschema_request_duration_seconds histogram", body)
+        self.assertIn('ramlschema_request_duration_seconds_bucket{endpoint="cats_new_schema",method="GET",le="+Inf"} 1', body)
+        self.assertIn('ramlschema_request_duration_seconds_count{endpoint="cats_new_schema",method="GET"} 1', body)
+        self.assertIn('ramlschema_responses_total{endpoint="cats_new_schema",method="GET",status="200"} 1', body)
+
+    def test_disabled(self):
+        flask_app = Flask("test_app")
+        resource = RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file, url_path="/cats",
+            flask_app=flask_app, mongo_collection=self.mongo_collection)
+        self.assertEqual(flask_app.view_functions["cats_collection"], resource.dispatch_request)
+        self.assertIs(resource.mongo_collection, self.mongo_collection)
+        response = flask_app.test_client().get("/cats-new-schema.json")
+        self.assertNotIn("Server-Timing", response.headers)
+
+
+class TestRequestTimings(TestCase):
+    def test_nested_phases(self):
+        timings = RequestTimings()
+        timings.enter()
+        timings.enter()
+        timings.exit("inner", 1.0)
+        timings.exit("outer", 3.0)
+        self.assertEqual(timings.phases, {"inner":1.0, "outer":2.0})
+
+    def test_histogram(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative_counts()), [2, 3, 4])
+        self.assertEqual(histogram.count, 4)
@@ -0,0 +1,197 @@
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+import pymongo
+
+from flask_ramlschema.pagination import (
+    CountCache, create_page_wrapper, decode_cursor_token, encode_cursor_token, get_aggregate_page,
+    get_keyset_query, get_page, get_page_pipeline
+)
+
+
+class PageRequest(object):
+    def __init__(self, **args):
+        self.args = args
+
+
+def mock_cursor(documents):
+    find_cursor = mock.MagicMock()
+    find_cursor.__iter__ = mock.Mock(return_value=iter(documents))
+    find_cursor.sort = mock.Mock(return_value=find_cursor)
+    find_cursor.limit = mock.Mock(return_value=find_cursor)
+    find_cursor.skip = mock.Mock(return_value=find_cursor)
+    return find_cursor
+
+
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        self.documents = [{"_id":ObjectId(), "name":"cat {0}".format(num)} for num in range(3)]
+
+    def test_token_round_trip(self):
+        document = self.documents[0]
+        token = encode_cursor_token(document, "next", "name", pymongo.ASCENDING, "-1")
+        decoded = decode_cursor_token(token)
+        self.assertEqual(decoded["id"], document["_id"])
+        self.assertEqual(decoded["value"], "cat 0")
+        self.assertEqual(decoded["order_arg"], "-1")
+
+    def test_invalid_token(self):
+        with self.assertRaises(ValueError):
+            decode_cursor_token("not a token")
+
+    def test_keyset_query(self):
+        document = self.documents[1]
+        token = encode_cursor_token(document, "next", "name", pymongo.DESCENDING, 1)
+        query = get_keyset_query(PageRequest(cursor=token))
+        self.assertEqual(query, {"$or":[
+            {"name":{"$lt":"cat 1"}},
+            {"name":"cat 1", "_id":{"$lt":document["_id"]}},
+            {"name":None}
+            ]})
+        self.assertEqual(get_keyset_query(PageRequest()), {})
+
+    def test_keyset_query_null_values(self):
+        document = {"_id":ObjectId()}
+        token = encode_cursor_token(document, "next", "name", pymongo.DESCENDING, 1)
+        query = get_keyset_query(PageRequest(cursor=token))
+        self.assertEqual(query, {"name":None, "_id":{"$lt":document["_id"]}})
+        token = encode_cursor_token(document, "next", "name", pymongo.ASCENDING, 1)
+        query = get_keyset_query(PageRequest(cursor=token))
+        self.assertEqual(query, {"$or":[
+            {"name":{"$ne":None}},
+            {"name":None, "_id":{"$gt":document["_id"]}}
+            ]})
+        token = encode_cursor_token(self.documents[1], "next", "name", pymongo.ASCENDING, 1)
+        self.assertEqual(len(get_keyset_query(PageRequest(cursor=token))["$or"]), 2)
+
+    def test_first_page(self):
+        find_cursor = mock_cursor(self.documents)
+        page = get_page(find_cursor, PageRequest(per_page=2), keyset=True)
+        find_cursor.sort.assert_called_once_with([("_id", pymongo.DESCENDING)])
+        find_cursor.limit.assert_called_once_with(3)
+        find_cursor.skip.assert_not_called()
+        self.assertEqual(len(page["items"]), 2)
+        self.assertIsNone(page["prev"])
+        self.assertEqual(decode_cursor_token(page["next"])["id"], page["items"][-1]["id"])
+
+    def test_page_out_of_range(self):
+        with self.assertRaisesRegex(ValueError, "invalid page number: 5"):
+            create_page_wrapper(5, 10, "_id", pymongo.DESCENDING, 20)
+
+    def test_page_number_still_supported(self):
+        find_cursor = mock_cursor(self.documents)
+        find_cursor.count = mock.Mock(return_value=len(self.documents))
+        page = get_page(find_cursor, PageRequest(page=2, per_page=2), keyset=True)
+        find_cursor.skip.assert_called_once_with(2)
+        self.assertEqual(page["page"], 2)
+
+
+class TestCounting(TestCase):
+    def setUp(self):
+        self.documents = [{"_id":ObjectId(), "name":"cat {0}".format(num)} for num in range(3)]
+
+    def test_has_more_without_count(self):
+        find_cursor = mock_cursor(self.documents)
+        page = get_page(find_cursor, PageRequest(per_page=2), counter=lambda find_cursor: None)
+        find_cursor.limit.assert_called_once_with(3)
+        find_cursor.count.assert_not_called()
+        self.assertTrue(page["has_more"])
+        self.assertEqual(len(page["items"]), 2)
+        self.assertNotIn("total_entries", page)
+        self.assertNotIn("total_pages", page)
+
+    def test_count_cache(self):
+        count_cache = CountCache(ttl=60)
+        count_func = mock.Mock(return_value=3)
+        self.assertEqual(count_cache.get({"breed":"tabby"}, count_func), 3)
+        self.assertEqual(count_cache.get({"breed":"tabby"}, count_func), 3)
+        count_func.assert_called_once_with()
+        count_cache.get({"breed":"siamese"}, count_func)
+        self.assertEqual(count_func.call_count, 2)
+        count_cache.invalidate()
+        count_cache.get({"breed":"tabby"}, count_func)
+        self.assertEqual(count_func.call_count, 3)
+
+    def test_count_cache_expires(self):
+        count_cache = CountCache(ttl=0)
+        count_func = mock.Mock(return_value=3)
+        count_cache.get({}, count_func)
+        count_cache.get({}, count_func)
+        self.assertEqual(count_func.call_count, 2)
+
+
+class TestAggregatePage(TestCase):
+    def setUp(self):
+        self.documents = [{"_id":ObjectId(), "name":"cat {0}".format(num)} for num in range(5)]
+
+    def mock_collection(self, items, total=None):
+        # Documents as mongo returns them from the pipeline, already renamed
+        renamed = [{"name":document["name"], "id":document["_id"]} for document in items]
+        result = {"items":renamed}
+        if total is not None:
+            result["total"] = [{"count":total}] if total else []
+        mongo_collection = mock.MagicMock()
+        mongo_collection.aggregate.return_value = iter([result])
+        return mongo_collection
+
+    def test_pipeline(self):
+        pipeline = get_page_pipeline({"breed":"tabby"}, {"name":1, "_id":1}, "name",
+                                     pymongo.ASCENDING, 20, 10)
+        self.assertEqual(pipeline, [
+            {"$match":{"breed":"tabby"}},
+            {"$facet":{
+                "items":[
+                    {"$sort":{"name":pymongo.ASCENDING}},
+                    {"$skip":20},
+                    {"$limit":10},
+                    {"$project":{"name":1, "id":"$_id", "_id":0}},
+                ],
+                "total":[{"$count":"count"}],
+            }},
+        ])
+        pipeline = get_page_pipeline({}, None, "_id", pymongo.DESCENDING, 0, 10, count=False)
+        self.assertEqual(pipeline[1]["$facet"], {"items":[
+            {"$sort":{"_id":pymongo.DESCENDING}},
+            {"$limit":10},
+            {"$addFields":{"id":"$_id"}},
+            {"$project":{"_id":0}},
+        ]})
+        pipeline = get_page_pipeline({}, {"_seq":0}, "_id", pymongo.DESCENDING, 0, 10)
+        self.assertEqual(pipeline[1]["$facet"]["items"][-2:], [
+            {"$addFields":{"id":"$_id"}},
+            {"$project":{"_seq":0, "_id":0}},
+        ])
+
+    def test_same_envelope_as_find(self):
+        page_request = PageRequest(page=2, per_page=2)
+        find_cursor = mock_cursor([dict(document) for document in self.documents[2:4]])
+        find_cursor.count = mock.Mock(return_value=5)
+        find_page = get_page(find_cursor, page_request)
+        mongo_collection = self.mock_collection(self.documents[2:4], total=5)
+        aggregate_page = get_aggregate_page(mongo_collection, {}, page_request=page_request)
+        self.assertEqual(aggregate_page, find_page)
+        mongo_collection.aggregate.assert_called_once()
+        mongo_collection.find.assert_not_called()
+
+    def test_has_more_without_count(self):
+        mongo_collection = self.mock_collection(self.documents[:3])
+        page = get_aggregate_page(mongo_collection, {}, page_request=PageRequest(per_page=2),
+                                  count=False)
+        pipeline = mongo_collection.aggregate.call_args[0][0]
+        self.assertNotIn("total", pipeline[1]["$facet"])
+        self.assertIn({"$limit":3}, pipeline[1]["$facet"]["items"])
+        self.assertTrue(page["has_more"])
+        self.assertEqual(len(page["items"]), 2)
+
+    def test_known_total(self):
+        mongo_collection = self.mock_collection(self.documents[:2])
+        page = get_aggregate_page(mongo_collection, {}, page_request=PageRequest(per_page=2),
+                                  count=False, total_entries=5)
+        self.assertEqual(page["total_pages"], 3)
+        self.assertNotIn("has_more", page)
+
+    def test_empty_collection(self):
+        mongo_collection = self.mock_collection([], total=0)
+        page = get_aggregate_page(mongo_collection, {}, page_request=PageRequest())
+        self.assertEqual(page["total_entries"], 0)
+        self.assertEqual(page["items"], [])
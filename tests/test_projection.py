@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from flask_ramlschema.errors import ValidationError
+from flask_ramlschema.projection import get_schema_fields, parse_fields
+
+
+class TestProjection(TestCase):
+    def setUp(self):
+        self.allowed_fields = get_schema_fields(
+            {"properties":{"name":{"type":"string"}, "breed":{"type":"string"}}},
+            None,
+            {"properties":{"owner":{"type":"object"}}}
+            )
+
+    def test_schema_fields(self):
+        self.assertEqual(self.allowed_fields, set(["name", "breed", "owner"]))
+
+    def test_parse_fields(self):
+        projection = parse_fields("id, name,owner.email", self.allowed_fields)
+        self.assertEqual(projection, {"_id":1, "name":1, "owner.email":1})
+        self.assertIsNone(parse_fields("*", self.allowed_fields))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValidationError) as context:
+            parse_fields("name,password", self.allowed_fields)
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(context.exception.errors, [{"message":"unknown field: password"}])
+
+    def test_any_field_without_schema(self):
+        self.assertEqual(parse_fields("password", set()), {"password":1})
@@ -0,0 +1,161 @@
+import os.path
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, mock
+
+from flask import Flask
+from flask_ramlschema.raml import (
+    APILoader, compile_api, iter_resource_pairs, load_artifact, load_yaml, main, write_artifact
+)
+from flask_ramlschema.validation import validator_cache
+from flask_ramlschema.views import RAMLResource
+
+tests_dir = os.path.dirname(os.path.abspath(sys.modules[__name__].__file__))
+raml_dir = os.path.join(tests_dir, "../raml")
+
+
+class TestRAML(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.api_raml_file = os.path.join(raml_dir, "api.raml")
+        self.collection_raml_file = os.path.join(raml_dir, "resources/cats-collection.raml")
+        self.item_raml_file = os.path.join(raml_dir, "resources/cats-item.raml")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_artifact(self, **kwargs):
+        artifact_path = os.path.join(self.temp_dir, "api.ramlc")
+        write_artifact(compile_api(self.api_raml_file, **kwargs), artifact_path)
+        return artifact_path
+
+    def test_includes(self):
+        api = APILoader().load(self.api_raml_file)
+        self.assertIn("collection", api["/cats"]["type"])
+        self.assertIsInstance(api["resourceTypes"], list)
+
+    def test_include_not_allowed(self):
+        with self.assertRaises(Exception):
+            load_yaml("type: !include other.raml")
+
+    def test_compile_decodes_schemas(self):
+        artifact = compile_api(self.api_raml_file)
+        schema = artifact["api"]["/cats"]["type"]["collection"]["newItemSchema"]
+        self.assertEqual(schema["required"], ["name", "breed"])
+
+    def test_from_artifact(self):
+        artifact = load_artifact(self.write_artifact())
+        resource = RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            mongo_collection=mock.MagicMock(), artifact=artifact)
+        self.assertIs(resource.new_item_schema,
+                      artifact.api["/cats"]["type"]["collection"]["newItemSchema"])
+        self.assertEqual(resource.update_item_schema["required"], ["name"])
+
+    def test_artifact_path(self):
+        artifact_path = self.write_artifact()
+        self.assertIs(load_artifact(artifact_path), load_artifact(artifact_path))
+        flask_app = Flask("test_app")
+        RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file, url_path="/cats",
+            flask_app=flask_app, mongo_collection=mock.MagicMock(), artifact=artifact_path)
+        self.assertIn("cats_collection", flask_app.view_functions)
+
+    def test_missing_artifact(self):
+        self.assertIsNone(load_artifact(os.path.join(self.temp_dir, "missing.ramlc")))
+        resource = RAMLResource.from_files(
+            self.collection_raml_file, self.item_raml_file, mongo_collection=mock.MagicMock(),
+            artifact=os.path.join(self.temp_dir, "missing.ramlc"))
+        self.assertEqual(resource.new_item_schema["required"], ["name", "breed"])
+
+    def test_changed_file_is_parsed(self):
+        artifact = load_artifact(self.write_artifact())
+        changed_file = os.path.join(self.temp_dir, "cats-collection.raml")
+        with open(self.collection_raml_file) as raml_handle:
+            raml = raml_handle.read()
+        with open(changed_file, "w") as raml_handle:
+            raml_handle.write(raml.replace('"breed"\n', '"name"\n'))
+        resource = RAMLResource.from_files(
+            changed_file, self.item_raml_file, mongo_collection=mock.MagicMock(),
+            artifact=artifact)
+        self.assertEqual(resource.new_item_schema["required"], ["name", "name"])
+
+    def test_generated_validators(self):
+        artifact = load_artifact(self.write_artifact(generated_validators=True))
+        schema = artifact.api["/cats"]["type"]["collection"]["newItemSchema"]
+        validator = validator_cache.get(schema, generated=True)
+        self.assertTrue(hasattr(validator.is_valid, "code"))
+        self.assertFalse(hasattr(validator.is_valid, "source"))
+        self.assertEqual(list(validator.iter_errors({"name":"muffins", "breed":"tabby"})), [])
+        self.assertEqual(len(list(validator.iter_errors({"name":1}))), 2)
+
+    def test_cli(self):
+        artifact_path = os.path.join(self.temp_dir, "cli.ramlc")
+        with mock.patch("builtins.print"):
+            main([self.api_raml_file, "-o", artifact_path])
+        with open(self.item_raml_file, "rb") as raml_handle:
+            item_raml = raml_handle.read()
+        self.assertIsNotNone(load_artifact(artifact_path).get_document(item_raml))
+
+
+class TestFromAPI(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.raml_dir = os.path.join(self.temp_dir, "raml")
+        shutil.copytree(raml_dir, self.raml_dir)
+        self.api_raml_file = os.path.join(self.raml_dir, "api.raml")
+        with open(self.api_raml_file, "a") as raml_handle:
+            raml_handle.write("/dogs:\n    !include resources/cats-collection.raml\n"
+                              "/dogs/{dogId}:\n    !include resources/cats-item.raml\n")
+        self.flask_app = Flask("test_app")
+        self.mongo_database = {"cats":mock.MagicMock(), "dogs":mock.MagicMock()}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_mount(self):
+        resources = RAMLResource.from_api(self.api_raml_file, self.flask_app,
+                                          mongo_database=self.mongo_database)
+        self.assertEqual(sorted(resources), ["/cats", "/dogs"])
+        self.assertIs(resources["/dogs"].mongo_collection, self.mongo_database["dogs"])
+        self.assertIn("dogs_item", self.flask_app.view_functions)
+        cats, dogs = resources["/cats"], resources["/dogs"]
+        self.assertIs(cats.new_item_schema, dogs.new_item_schema)
+        self.assertIs(cats.new_item_validator, dogs.new_item_validator)
+        self.assertIs(cats.new_schema_body, dogs.new_schema_body)
+
+    def test_collection_func(self):
+        collection_func = mock.MagicMock()
+        resources = RAMLResource.from_api(self.api_raml_file, self.flask_app,
+                                          mongo_collection_func=collection_func)
+        self.assertIs(resources["/dogs"].mongo_collection, collection_func.return_value)
+        collection_func.assert_called_with("dogs")
+
+    def test_artifact(self):
+        artifact_path = os.path.join(self.temp_dir, "api.ramlc")
+        write_artifact(compile_api(self.api_raml_file), artifact_path)
+        artifact = load_artifact(artifact_path)
+        self.assertTrue(artifact.is_current(self.api_raml_file))
+        resources = RAMLResource.from_api(self.api_raml_file, self.flask_app,
+                                          mongo_database=self.mongo_database, artifact=artifact)
+        self.assertIs(resources["/cats"].new_item_schema,
+                      artifact.api["/cats"]["type"]["collection"]["newItemSchema"])
+        with open(os.path.join(self.raml_dir, "resources/cats-item.raml"), "a") as raml_handle:
+            raml_handle.write("\n")
+        self.assertFalse(artifact.is_current(self.api_raml_file))
+
+    def test_nested_resources(self):
+        api = {
+            "/cats":{"type":{"collection":{}}, "/{catId}":{"type":{"collection-item":{}}}},
+            "/cats/{catId}/toys/{toyId}":{},
+        }
+        with self.assertLogs("flask_ramlschema.raml", "WARNING"):
+            pairs = list(iter_resource_pairs(api))
+        self.assertEqual(pairs, [("/cats", api["/cats"], api["/cats"]["/{catId}"])])
+
+    def test_missing_item(self):
+        api = {"/health":{"get":{}}, "/cats":{"type":{"collection":{}}, "/{catId}":{}}}
+        with self.assertLogs("flask_ramlschema.raml", "WARNING"):
+            pairs = list(iter_resource_pairs(api))
+        self.assertEqual([pair[0] for pair in pairs], ["/cats"])
@@ -0,0 +1,73 @@
+import datetime
+import json
+import uuid
+from unittest import TestCase, skipIf
+
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+
+from flask_ramlschema.serialization import (
+    OrjsonSerializer, StdlibSerializer, get_serializer, orjson, rename_id
+)
+
+
+class SerializerTests(object):
+    def test_rename_id(self):
+        object_id = ObjectId()
+        document = {"_id":object_id, "name":"muffins"}
+        body = json.loads(self.serializer.dumps_document(document))
+        self.assertEqual(body, {"id":str(object_id), "name":"muffins"})
+        self.assertEqual(document, {"_id":object_id, "name":"muffins"})
+
+    def test_page(self):
+        object_id = ObjectId()
+        items = [{"_id":object_id, "name":"muffins"}]
+        body = json.loads(self.serializer.dumps_page({"page":1, "items":items}))
+        self.assertEqual(body, {"page":1, "items":[{"id":str(object_id), "name":"muffins"}]})
+        self.assertIn("_id", items[0])
+
+    def test_bson_types(self):
+        value = {
+            "created":datetime.datetime(2020, 1, 1),
+            "price":Decimal128("1.50"),
+            "data":Binary(b"\x00\x01"),
+            "uuid":uuid.UUID(int=1),
+        }
+        body = json.loads(self.serializer.dumps(value))
+        self.assertEqual(body["created"], int(value["created"].timestamp()))
+        self.assertEqual(body["price"], "1.50")
+        self.assertEqual(body["data"], "AAE=")
+        self.assertEqual(body["uuid"], str(uuid.UUID(int=1)))
+
+    def test_loads_bytes(self):
+        self.assertEqual(self.serializer.loads(b'{"name": "m\xc3\xbcffins"}'), {"name":"müffins"})
+
+    def test_unknown_type(self):
+        with self.assertRaises(TypeError):
+            self.serializer.dumps({"value":object()})
+
+
+class TestStdlibSerializer(SerializerTests, TestCase):
+    def setUp(self):
+        self.serializer = StdlibSerializer()
+
+
+@skipIf(orjson is None, "orjson is not installed")
+class TestOrjsonSerializer(SerializerTests, TestCase):
+    def setUp(self):
+        self.serializer = OrjsonSerializer()
+
+
+class TestGetSerializer(TestCase):
+    def test_auto(self):
+        expected = "stdlib" if orjson is None else "orjson"
+        self.assertEqual(get_serializer("auto").name, expected)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            get_serializer("unknown")
+
+    def test_rename_id_without_id(self):
+        document = {"name":"muffins"}
+        self.assertIs(rename_id(document), document)
@@ -0,0 +1,45 @@
+import json
+from unittest import TestCase
+
+from bson.objectid import ObjectId
+
+from flask_ramlschema.streaming import iter_batches, iter_ndjson, iter_page_json
+
+
+class TestStreaming(TestCase):
+    def setUp(self):
+        self.documents = [{"_id":ObjectId(), "name":"cat {0}".format(num)} for num in range(5)]
+
+    def test_batches(self):
+        self.assertEqual(list(iter_batches(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_page_json(self):
+        items = [{"id":str(document["_id"]), "name":document["name"]} for document in self.documents]
+        page_wrapper = {"page":1, "per_page":25, "items":iter(items)}
+        fragments = list(iter_page_json(page_wrapper, batch_size=2))
+        self.assertEqual(len(fragments), 5)
+        self.assertEqual(json.loads(b"".join(fragments)), {"page":1, "per_page":25, "items":items})
+
+    def test_page_json_late_keys(self):
+        page_wrapper = {"page":1, "items":[]}
+        def items():
+            yield {"id":1}
+            page_wrapper["has_more"] = False
+        page_wrapper["items"] = items()
+        body = json.loads(b"".join(iter_page_json(page_wrapper)))
+        self.assertEqual(body, {"page":1, "items":[{"id":1}], "has_more":False})
+
+    def test_empty_page_json(self):
+        body = json.loads(b"".join(iter_page_json({"page":1, "items":iter([])})))
+        self.assertEqual(body, {"page":1, "items":[]})
+
+    def test_ndjson(self):
+        lines = b"".join(iter_ndjson(self.documents, batch_size=2)).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])["name"], "cat 0")
+        self.assertIn("id", json.loads(lines[0]))
+
+    def test_ndjson_does_not_mutate(self):
+        list(iter_ndjson(self.documents))
+        self.assertIn("_id", self.documents[0])
+        self.assertNotIn("id", self.documents[0])
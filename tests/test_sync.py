@@ -0,0 +1,198 @@
+import json
+import os.path
+import sys
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+
+from flask_ramlschema.errors import register_error_handlers
+from flask_ramlschema.sync import (
+    ChangeFeed, SyncTokenExpired, decode_sync_token, encode_sync_token
+)
+from flask_ramlschema.views import RAMLResource
+
+
+def mock_find(collection, documents):
+    collection.find.return_value.sort.return_value.limit.return_value = documents
+
+
+class TestSyncTokens(TestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_sync_token(encode_sync_token(42)), 42)
+        self.assertEqual(decode_sync_token(None), 0)
+        self.assertEqual(decode_sync_token(""), 0)
+
+    def test_invalid(self):
+        for token in ["not a token", encode_sync_token(-1), encode_sync_token("1")]:
+            with self.assertRaises(ValueError):
+                decode_sync_token(token)
+
+
+class TestChangeFeed(TestCase):
+    def setUp(self):
+        self.counters = mock.MagicMock()
+        self.counters.find_one.return_value = {"_id":"test.cats", "seq":10}
+        self.tombstones = mock.MagicMock()
+        self.mongo_collection = mock.MagicMock()
+        self.feed = ChangeFeed(self.counters, self.tombstones)
+
+    def test_next_sequences(self):
+        self.counters.find_one_and_update.return_value = {"_id":"test.cats", "seq":12}
+        self.assertEqual(self.feed.next_sequences("test.cats", 3), [10, 11, 12])
+        args, kwargs = self.counters.find_one_and_update.call_args
+        self.assertEqual(args, ({"_id":"test.cats"}, {"$inc":{"seq":3}}))
+        self.assertTrue(kwargs["upsert"])
+
+    def test_changes_merged_in_order(self):
+        first_id, second_id, deleted_id = ObjectId(), ObjectId(), ObjectId()
+        mock_find(self.mongo_collection, [
+            {"_id":first_id, "name":"muffins", "_seq":4},
+            {"_id":second_id, "name":"tom", "_seq":7},
+        ])
+        mock_find(self.tombstones, [{"_id":ObjectId(), "id":deleted_id, "_seq":5}])
+        changes = self.feed.changes(self.mongo_collection, "test.cats", since=3, limit=2)
+        self.assertEqual(changes["changes"], [{"id":first_id, "name":"muffins"}])
+        self.assertEqual(changes["deleted"], [deleted_id])
+        self.assertTrue(changes["has_more"])
+        self.assertEqual(decode_sync_token(changes["next"]), 5)
+        query = self.mongo_collection.find.call_args[0][0]
+        self.assertEqual(query, {"_seq":{"$gt":3}})
+        query = self.tombstones.find.call_args[0][0]
+        self.assertEqual(query, {"_seq":{"$gt":3}, "collection":"test.cats"})
+
+    def test_no_changes(self):
+        mock_find(self.mongo_collection, [])
+        mock_find(self.tombstones, [])
+        changes = self.feed.changes(self.mongo_collection, "test.cats", since=8)
+        self.assertEqual(changes["changes"], [])
+        self.assertFalse(changes["has_more"])
+        self.assertEqual(decode_sync_token(changes["next"]), 8)
+
+    def test_inclusion_projection_keeps_sequence(self):
+        mock_find(self.mongo_collection, [])
+        mock_find(self.tombstones, [])
+        self.feed.changes(self.mongo_collection, "test.cats", projection={"name":1})
+        projection = self.mongo_collection.find.call_args[0][1]
+        self.assertEqual(projection, {"name":1, "_seq":1})
+
+    def test_expired_token(self):
+        self.counters.find_one.return_value = {"_id":"test.cats", "seq":10, "purged":6}
+        with self.assertRaises(SyncTokenExpired):
+            self.feed.changes(self.mongo_collection, "test.cats", since=5)
+
+    def test_record_deletes(self):
+        self.counters.find_one_and_update.return_value = {"_id":"test.cats", "seq":2}
+        object_ids = [ObjectId(), ObjectId()]
+        self.feed.record_deletes("test.cats", object_ids)
+        tombstones = self.tombstones.insert_many.call_args[0][0]
+        self.assertEqual([(tombstone["id"], tombstone["_seq"]) for tombstone in tombstones],
+                         list(zip(object_ids, [1, 2])))
+        self.feed.record_deletes("test.cats", [])
+        self.tombstones.insert_many.assert_called_once()
+
+    def test_backfill(self):
+        object_ids = [ObjectId(), ObjectId()]
+        self.mongo_collection.find.return_value.limit.side_effect = [
+            [{"_id":object_id} for object_id in object_ids], []]
+        self.counters.find_one_and_update.return_value = {"_id":"test.cats", "seq":2}
+        self.assertEqual(self.feed.backfill(self.mongo_collection, "test.cats"), 2)
+        write_ops = self.mongo_collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(write_ops), 2)
+
+
+class TestChangesRoute(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.mongo_collection.full_name = "test.cats"
+        self.counters = mock.MagicMock()
+        self.counters.find_one.return_value = {"_id":"test.cats", "seq":10}
+        self.counters.find_one_and_update.return_value = {"_id":"test.cats", "seq":11}
+        self.tombstones = mock.MagicMock()
+        self.flask_app = Flask("test_sync_app")
+        register_error_handlers(self.flask_app)
+        self.resource = RAMLResource.from_files(
+            collection_raml_file, item_raml_file,
+            url_path="/cats", flask_app=self.flask_app, bulk_route=True,
+            change_feed=ChangeFeed(self.counters, self.tombstones), index_check=None,
+            mongo_collection = self.mongo_collection
+            )
+        self.test_client = self.flask_app.test_client()
+
+    def test_create_numbered(self):
+        response = self.test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 200)
+        document = self.mongo_collection.insert_one.call_args[0][0]
+        self.assertEqual(document["_seq"], 11)
+        self.assertNotIn("_seq", json.loads(response.data.decode("utf-8")))
+
+    def test_reads_hide_sequence(self):
+        self.mongo_collection.find_one.return_value = {"_id":ObjectId(), "name":"muffins"}
+        self.test_client.get("/cats/{0}".format(ObjectId()))
+        self.assertEqual(self.mongo_collection.find_one.call_args[0][1], {"_seq":0})
+        self.test_client.get("/cats/{0}?fields=name".format(ObjectId()))
+        self.assertEqual(self.mongo_collection.find_one.call_args[0][1], {"name":1})
+        self.test_client.get("/cats")
+        self.assertEqual(self.mongo_collection.find.call_args[0][1], {"_seq":0})
+
+    def test_update_numbered(self):
+        self.resource.atomic_updates = True
+        response = self.test_client.post("/cats/{0}".format(ObjectId()), data=json.dumps({"name":"tom"}))
+        self.assertEqual(response.status_code, 204)
+        update = self.mongo_collection.update_one.call_args[0][1]
+        self.assertEqual(update["$set"], {"name":"tom", "_seq":11})
+
+    def test_delete_records_tombstone(self):
+        object_id = ObjectId()
+        response = self.test_client.delete("/cats/{0}".format(object_id))
+        self.assertEqual(response.status_code, 204)
+        tombstones = self.tombstones.insert_many.call_args[0][0]
+        self.assertEqual([tombstone["id"] for tombstone in tombstones], [object_id])
+
+    def test_failed_delete_records_nothing(self):
+        self.mongo_collection.find_one_and_delete.return_value = None
+        response = self.test_client.delete("/cats/{0}".format(ObjectId()))
+        self.assertEqual(response.status_code, 404)
+        self.tombstones.insert_many.assert_not_called()
+
+    def test_bulk_numbered(self):
+        deleted_id = ObjectId()
+        self.mongo_collection.find.return_value = [{"_id":deleted_id}]
+        self.counters.find_one_and_update.return_value = {"_id":"test.cats", "seq":12}
+        body = "\n".join(json.dumps(operation) for operation in [
+            {"op":"create", "document":{"breed":"tabby", "name":"muffins"}},
+            {"op":"delete", "id":str(deleted_id)},
+        ])
+        response = self.test_client.post("/cats/_bulk", data=body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 200)
+        write_ops = self.mongo_collection.bulk_write.call_args[0][0]
+        self.assertEqual(write_ops[0]._doc["_seq"], 11)
+        tombstones = self.tombstones.insert_many.call_args[0][0]
+        self.assertEqual([tombstone["id"] for tombstone in tombstones], [deleted_id])
+
+    def test_changes(self):
+        document_id, deleted_id = ObjectId(), ObjectId()
+        mock_find(self.mongo_collection, [{"_id":document_id, "name":"muffins", "_seq":9}])
+        mock_find(self.tombstones, [{"_id":ObjectId(), "id":deleted_id, "_seq":10}])
+        response = self.test_client.get("/cats/_changes?since={0}".format(encode_sync_token(8)))
+        self.assertEqual(response.status_code, 200)
+        response_dict = json.loads(response.data.decode("utf-8"))
+        self.assertEqual(response_dict["changes"], [{"id":str(document_id), "name":"muffins"}])
+        self.assertEqual(response_dict["deleted"], [str(deleted_id)])
+        self.assertEqual(decode_sync_token(response_dict["next"]), 10)
+        self.assertFalse(response_dict["has_more"])
+
+    def test_invalid_token(self):
+        response = self.test_client.get("/cats/_changes?since=garbage")
+        self.assertEqual(response.status_code, 400)
+
+    def test_expired_token(self):
+        self.counters.find_one.return_value = {"_id":"test.cats", "seq":10, "purged":5}
+        response = self.test_client.get("/cats/_changes?since={0}".format(encode_sync_token(2)))
+        self.assertEqual(response.status_code, 410)
+
+    def test_index_required(self):
+        self.assertIn(["_seq"], self.resource.required_indexes())
@@ -0,0 +1,123 @@
+from unittest import TestCase
+
+from jsonschema import Draft4Validator
+from flask_ramlschema.errors import ValidationError
+from flask_ramlschema.validation import (
+    GeneratedValidator, SchemaCompileError, SchemaValidator, ValidatorCache,
+    collect_errors, compile_schema, get_structure_errors
+)
+
+CAT_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "minLength": 1, "maxLength": 10},
+        "breed": {"enum": ["tabby", "siamese"]},
+        "age": {"type": "integer", "minimum": 0, "maximum": 30, "exclusiveMaximum": True},
+        "code": {"type": "string", "pattern": "^[A-Z]{3}$"},
+        "toys": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "properties": {"kind": {"type": ["string", "null"]}},
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["name", "breed"],
+    "additionalProperties": {"type": "number"}
+}
+
+INSTANCES = [
+    {"name": "muffins", "breed": "tabby"},
+    {"name": "muffins", "breed": "tabby", "age": 3, "code": "ABC", "weight": 4.5,
+     "toys": [{"kind": "mouse"}, {"kind": None}]},
+    {"name": "", "breed": "dog"},
+    {"name": "a very long name", "breed": "siamese", "age": 30},
+    {"name": 1, "age": -1, "code": "abc"},
+    {"breed": "tabby", "toys": []},
+    {"name": "muffins", "breed": "tabby", "toys": [{"kind": 1, "extra": True}]},
+    {"name": "muffins", "breed": "tabby", "weight": "heavy"},
+    {"name": "muffins", "breed": True, "age": True},
+    [],
+    "muffins",
+    None,
+]
+
+
+class TestValidation(TestCase):
+    def test_generated_errors_match_draft4(self):
+        generated = GeneratedValidator(CAT_SCHEMA)
+        draft4 = Draft4Validator(CAT_SCHEMA)
+        for instance in INSTANCES:
+            expected = [error.message for error in draft4.iter_errors(instance)]
+            self.assertEqual(list(generated.iter_errors(instance)), expected)
+            self.assertEqual(generated.is_valid(instance), not expected)
+
+    def test_unsupported_keyword(self):
+        with self.assertRaises(SchemaCompileError):
+            compile_schema({"type": "object", "anyOf": [{"required": ["a"]}]})
+
+    def test_cache_by_identity(self):
+        cache = ValidatorCache()
+        schema = {"type": "object"}
+        validator = cache.get(schema)
+        self.assertIs(cache.get(schema), validator)
+        self.assertIsNot(cache.get(dict(schema)), validator)
+        self.assertIsInstance(cache.get(schema, generated=True), GeneratedValidator)
+
+    def test_cache_falls_back_when_not_compilable(self):
+        cache = ValidatorCache()
+        schema = {"oneOf": [{"type": "string"}, {"type": "integer"}]}
+        validator = cache.get(schema, generated=True)
+        self.assertIs(type(validator), SchemaValidator)
+        self.assertEqual(list(validator.iter_errors("muffins")), [])
+
+
+class TestValidationModes(TestCase):
+    def setUp(self):
+        self.validator = SchemaValidator({"type": "array", "items": {"type": "string"}})
+        self.instance = list(range(50))
+
+    def test_full(self):
+        messages, error_count = collect_errors(self.validator, self.instance)
+        self.assertEqual(len(messages), 50)
+        self.assertEqual(error_count, 50)
+
+    def test_capped(self):
+        messages, error_count = collect_errors(self.validator, self.instance, "capped", 10)
+        self.assertEqual(messages, ["{0} is not of type 'string'".format(num) for num in range(10)])
+        self.assertEqual(error_count, 11)
+        messages, error_count = collect_errors(self.validator, self.instance[:10], "capped", 10)
+        self.assertEqual(error_count, 10)
+
+    def test_fail_fast(self):
+        messages, error_count = collect_errors(self.validator, self.instance, "fail-fast")
+        self.assertEqual(messages, ["0 is not of type 'string'"])
+        self.assertEqual(error_count, 1)
+
+    def test_truncated_error(self):
+        error = ValidationError([{"message":"0 is not of type 'string'"}], error_count=2)
+        self.assertEqual(error.to_dict()["truncated"], True)
+        self.assertEqual(error.to_dict()["error_count"], 2)
+        self.assertNotIn("truncated", ValidationError([{"message":"bad"}], error_count=1).to_dict())
+
+    def test_structure_type(self):
+        self.assertEqual(get_structure_errors(list(range(1000)), CAT_SCHEMA),
+                         ["request body is not of type 'object'"])
+        self.assertEqual(get_structure_errors({"name": "muffins"}, CAT_SCHEMA), [])
+        self.assertEqual(get_structure_errors(True, {"type": ["integer", "null"]}), [])
+
+    def test_structure_required(self):
+        self.assertEqual(get_structure_errors({"name": "muffins"}, CAT_SCHEMA, check_required=True),
+                         ["'breed' is a required property"])
+
+    def test_structure_limits(self):
+        nested = {"a": {"b": {"c": [1, 2]}}}
+        self.assertEqual(get_structure_errors(nested, {}, max_depth=3), [])
+        self.assertEqual(get_structure_errors(nested, {}, max_depth=2),
+                         ["request body is nested deeper than 2 levels"])
+        self.assertEqual(get_structure_errors(nested, {}, max_nodes=6), [])
+        self.assertEqual(get_structure_errors(nested, {}, max_nodes=5),
+                         ["request body has more than 5 values"])
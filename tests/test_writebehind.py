@@ -0,0 +1,157 @@
+import json
+import os.path
+import sys
+import threading
+from unittest import TestCase, mock
+
+from bson.objectid import ObjectId
+from flask import Flask
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from flask_ramlschema.errors import register_error_handlers
+from flask_ramlschema.metrics import Metrics
+from flask_ramlschema.views import RAMLResource
+from flask_ramlschema.writebehind import BufferFull, WriteBehind, WriteFailed
+
+
+class TestWriteBehind(TestCase):
+    def setUp(self):
+        self.mongo_collection = mock.MagicMock()
+        self.writer = WriteBehind(batch_size=3, flush_interval=0.01)
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_batches(self):
+        futures = [self.writer.submit(self.mongo_collection, {"_id":ObjectId(), "num":num})
+                   for num in range(7)]
+        self.assertTrue(self.writer.flush(5))
+        self.assertTrue(all(future.done() for future in futures))
+        written = [document["num"] for call in self.mongo_collection.insert_many.call_args_list
+                   for document in call[0][0]]
+        self.assertEqual(written, list(range(7)))
+        self.assertTrue(all(len(call[0][0]) <= 3 for call in self.mongo_collection.insert_many.call_args_list))
+        self.assertEqual(self.writer.stats()["written"], 7)
+
+    def test_per_document_errors(self):
+        self.mongo_collection.insert_many.side_effect = BulkWriteError({"writeErrors":[
+            {"index":1, "code":11000, "errmsg":"duplicate key"}]})
+        on_error = mock.Mock()
+        self.writer.on_error = on_error
+        futures = [self.writer.submit(self.mongo_collection, {"_id":ObjectId()}) for num in range(2)]
+        self.assertTrue(self.writer.flush(5))
+        self.assertIsInstance(futures[0].result(), ObjectId)
+        with self.assertRaises(WriteFailed) as context:
+            futures[1].result()
+        self.assertEqual(context.exception.code, 11000)
+        on_error.assert_called_once()
+        stats = self.writer.stats()
+        self.assertEqual((stats["written"], stats["failed"], stats["failed_batches"]), (1, 1, 1))
+
+    def test_batch_errors(self):
+        self.mongo_collection.insert_many.side_effect = AutoReconnect("down")
+        future = self.writer.submit(self.mongo_collection, {"_id":ObjectId()})
+        with self.assertRaises(WriteFailed):
+            future.result(5)
+        self.assertEqual(self.writer.stats()["last_error"], "down")
+
+    def test_backpressure(self):
+        release = threading.Event()
+        self.mongo_collection.insert_many.side_effect = lambda documents, ordered: release.wait(5)
+        writer = WriteBehind(batch_size=1, flush_interval=0, max_queue_size=1, enqueue_timeout=0.01)
+        try:
+            writer.submit(self.mongo_collection, {"_id":ObjectId()})
+            with self.assertRaises(BufferFull):
+                for num in range(3):
+                    writer.submit(self.mongo_collection, {"_id":ObjectId()})
+            self.assertEqual(writer.stats()["rejected"], 1)
+        finally:
+            release.set()
+            writer.close()
+
+    def test_close_flushes(self):
+        future = self.writer.submit(self.mongo_collection, {"_id":ObjectId()})
+        self.assertTrue(self.writer.close())
+        self.assertTrue(future.done())
+        self.assertEqual(self.writer.stats()["queued"], 0)
+
+
+class TestBufferedCreates(TestCase):
+    def setUp(self):
+        tests_dir = os.path.dirname(sys.modules[__name__].__file__)
+        self.collection_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-collection.raml"))
+        self.item_raml_file = os.path.abspath(os.path.join(tests_dir, "../raml/resources/cats-item.raml"))
+        self.mongo_collection = mock.MagicMock()
+        self.writers = []
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.close()
+
+    def create_client(self, metrics=None, resource_class=RAMLResource, **kwargs):
+        writer = WriteBehind(flush_interval=0.01, **kwargs)
+        self.writers.append(writer)
+        flask_app = Flask("test_write_behind_app")
+        register_error_handlers(flask_app)
+        resource_class.from_files(
+            self.collection_raml_file, self.item_raml_file,
+            url_path="/cats", flask_app=flask_app, write_behind=writer, metrics=metrics,
+            mongo_collection = self.mongo_collection
+            )
+        return writer, flask_app.test_client()
+
+    def test_acknowledged_when_queued(self):
+        writer, test_client = self.create_client()
+        response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 202)
+        document_id = json.loads(response.data.decode("utf-8"))["id"]
+        self.assertTrue(writer.flush(5))
+        documents = self.mongo_collection.insert_many.call_args[0][0]
+        self.assertEqual(documents, [{"_id":ObjectId(document_id), "breed":"tabby", "name":"muffins"}])
+        self.mongo_collection.insert_one.assert_not_called()
+
+    def test_metrics_not_used_in_batches(self):
+        writer, test_client = self.create_client(metrics=Metrics())
+        for num in range(2):
+            response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+            self.assertEqual(response.status_code, 202)
+        self.assertTrue(writer.flush(5))
+        self.mongo_collection.insert_many.assert_called_once()
+        self.assertEqual(writer.stats()["written"], 2)
+
+    def test_acknowledged_when_written(self):
+        writer, test_client = self.create_client(wait_for_commit=True)
+        response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 200)
+        self.mongo_collection.insert_many.assert_called_once()
+
+    def test_duplicate_key(self):
+        self.mongo_collection.insert_many.side_effect = BulkWriteError({"writeErrors":[
+            {"index":0, "code":11000, "errmsg":"duplicate key"}]})
+        writer, test_client = self.create_client(wait_for_commit=True)
+        response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 409)
+
+    def test_overridden_create_view(self):
+        class CreatingResource(RAMLResource):
+            def create_view(self, document):
+                document["id"] = "custom"
+        writer, test_client = self.create_client(resource_class=CreatingResource)
+        response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode("utf-8"))["id"], "custom")
+        self.assertTrue(writer.flush(5))
+        self.mongo_collection.insert_many.assert_not_called()
+
+    def test_full_queue(self):
+        writer, test_client = self.create_client()
+        with mock.patch.object(writer, "submit", side_effect=BufferFull()):
+            response = test_client.post("/cats", data=json.dumps({"breed":"tabby", "name":"muffins"}))
+        self.assertEqual(response.status_code, 503)
+
+    def test_invalid_not_queued(self):
+        writer, test_client = self.create_client()
+        response = test_client.post("/cats", data=json.dumps({"breed":1}))
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(writer.flush(5))
+        self.mongo_collection.insert_many.assert_not_called()